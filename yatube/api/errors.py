@@ -0,0 +1,8 @@
+class ApiError(Exception):
+    """Ошибка запроса к API: отдается клиенту как {"detail": ...}."""
+
+    def __init__(self, status, detail, **extra):
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+        self.extra = extra
@@ -0,0 +1,11 @@
+from django import forms
+
+from posts import forms as post_forms
+from posts.models import Group
+
+
+class PostForm(post_forms.PostForm):
+    """Форма поста, в которой группа задается адресом, а не id."""
+    group = forms.ModelChoiceField(
+        Group.objects.all(), to_field_name='slug', required=False
+    )
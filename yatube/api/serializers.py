@@ -0,0 +1,92 @@
+"""
+Представление объектов в ответах API.
+
+Поле — функция от объекта. Функции читают только то, что выборки
+for_feed() и for_list() уже подтянули JOIN-ом, поэтому сериализация
+страницы не делает запросов. Параметр ?fields=id,text оставляет
+в ответе только перечисленные поля.
+"""
+from operator import attrgetter
+
+from .errors import ApiError
+
+
+def _slug(related):
+    return related.slug if related is not None else None
+
+
+def _image(post):
+    return post.image.url if post.image else None
+
+
+class Serializer:
+    fields = {}
+
+    def __init__(self, names=None):
+        if not names:
+            names = list(self.fields)
+        unknown = [name for name in names if name not in self.fields]
+        if unknown:
+            raise ApiError(400, f'Неизвестные поля: {", ".join(unknown)}.')
+        self.selected = [(name, self.fields[name]) for name in names]
+
+    @classmethod
+    def from_request(cls, request):
+        fields = request.GET.get('fields', '')
+        return cls([name for name in fields.split(',') if name])
+
+    def __call__(self, obj):
+        return {name: value(obj) for name, value in self.selected}
+
+    def many(self, objects):
+        return [self(obj) for obj in objects]
+
+
+class PostSerializer(Serializer):
+    fields = {
+        'id': attrgetter('pk'),
+        'text': attrgetter('text'),
+        'pub_date': attrgetter('pub_date'),
+        'author': attrgetter('author.username'),
+        'group': lambda post: _slug(post.group),
+        'image': _image,
+        'comment_count': attrgetter('comment_count'),
+    }
+
+
+class GroupSerializer(Serializer):
+    fields = {
+        'id': attrgetter('pk'),
+        'slug': attrgetter('slug'),
+        'title': attrgetter('title'),
+        'description': attrgetter('description'),
+        'post_count': attrgetter('post_count'),
+    }
+
+
+class CommentSerializer(Serializer):
+    fields = {
+        'id': attrgetter('pk'),
+        'post': attrgetter('post_id'),
+        'author': attrgetter('author.username'),
+        'text': attrgetter('text'),
+        'pub_date': attrgetter('pub_date'),
+    }
+
+
+class FollowSerializer(Serializer):
+    fields = {
+        'user': attrgetter('user.username'),
+        'author': attrgetter('author.username'),
+    }
+
+
+class ProfileSerializer(Serializer):
+    fields = {
+        'username': attrgetter('username'),
+        'first_name': attrgetter('first_name'),
+        'last_name': attrgetter('last_name'),
+        'post_count': attrgetter('stats.post_count'),
+        'follower_count': attrgetter('stats.follower_count'),
+        'following_count': attrgetter('stats.following_count'),
+    }
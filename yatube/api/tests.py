@@ -0,0 +1,378 @@
+import shutil
+import tempfile
+from http import HTTPStatus
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.models import Comment, Follow, Group, Post
+from posts.paginator import encode_cursor
+
+User = get_user_model()
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media = tempfile.mkdtemp()
+        cls.media_settings = override_settings(MEDIA_ROOT=cls.media)
+        cls.media_settings.enable()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.author = User.objects.create_user(username='TestAuthor')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        # Каждый пост — от своего автора, чтобы N+1 был заметен.
+        for i in range(settings.POST_PER_PAGE + 3):
+            cls.post = Post.objects.create(
+                author=User.objects.create_user(username=f'TestWriter{i}'),
+                text=f'Тестовый пост #{i}',
+                group=cls.group,
+            )
+        cls.own_post = Post.objects.create(
+            author=cls.author,
+            text='Пост автора',
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.media_settings.disable()
+        shutil.rmtree(cls.media, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(ApiTests.user)
+        self.author_client = Client()
+        self.author_client.force_login(ApiTests.author)
+
+    def test_post_list_cursor_pagination(self):
+        """
+        Лента отдается страницами по курсору, как HTML-лента.
+        """
+        response = self.client.get(reverse('api:v1:post_list'))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        first = response.json()
+        self.assertEqual(len(first['results']), settings.POST_PER_PAGE)
+        self.assertEqual(first['results'][0]['id'], ApiTests.own_post.pk)
+        self.assertIsNone(first['previous'])
+        second = self.client.get(first['next']).json()
+        self.assertEqual(len(second['results']), 4)
+        self.assertIsNone(second['next'])
+        previous = self.client.get(second['previous']).json()
+        self.assertEqual(previous['results'], first['results'])
+
+    def test_cursor_out_of_range(self):
+        """Курсор с id за пределами bigint — первая страница, не 500."""
+        token = encode_cursor(timezone.now(), 2 ** 64, 2)
+        response = self.client.get(
+            reverse('api:v1:post_list'), {'cursor': token}
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertIsNone(response.json()['previous'])
+
+    def test_feeds_do_not_query_authors_and_groups(self):
+        """
+        Страница ленты — один запрос, сколько бы ни было авторов,
+        и чтение поколения кэша лент.
+        """
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('api:v1:post_list'))
+        post = response.json()['results'][1]
+        self.assertEqual(post['group'], ApiTests.group.slug)
+        self.assertEqual(post['author'], ApiTests.post.author.username)
+        urls = (
+            reverse(
+                'api:v1:group_posts', kwargs={'slug': ApiTests.group.slug}
+            ),
+            reverse(
+                'api:v1:profile_posts',
+                kwargs={'username': ApiTests.author.username}
+            ),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                with self.assertNumQueries(3):
+                    self.client.get(url)
+
+    def test_post_batch(self):
+        """
+        Пачка постов читается одним запросом в порядке id из запроса,
+        отсутствующие id перечислены отдельно.
+        """
+        deleted = Post.objects.create(author=ApiTests.user, text='Удален')
+        Post.objects.filter(pk=deleted.pk).delete()
+        ids = [ApiTests.post.pk, 2 ** 63 - 1, ApiTests.own_post.pk, deleted.pk]
+        url = reverse('api:v1:post_batch')
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                f'{url}?ids={",".join(map(str, ids))},{ids[0]}&fields=id'
+            )
+        self.assertEqual(
+            response.json(),
+            {
+                'results': [
+                    {'id': ApiTests.post.pk}, {'id': ApiTests.own_post.pk}
+                ],
+                'missing': [2 ** 63 - 1, deleted.pk],
+            }
+        )
+
+    @override_settings(API_BATCH_SIZE=2)
+    def test_post_batch_limits(self):
+        """
+        Пустой, неверный или слишком длинный список id — ошибка 400.
+        """
+        url = reverse('api:v1:post_batch')
+        for ids in ('', '1,x', '1,2,3', '0', '-1', str(2 ** 63)):
+            with self.subTest(ids=ids):
+                response = self.client.get(f'{url}?ids={ids}')
+                self.assertEqual(
+                    response.status_code, HTTPStatus.BAD_REQUEST
+                )
+
+    def test_sparse_fields(self):
+        """
+        ?fields= оставляет в ответе только перечисленные поля.
+        """
+        url = reverse(
+            'api:v1:post_detail', kwargs={'post_id': ApiTests.post.pk}
+        )
+        response = self.client.get(f'{url}?fields=id,author')
+        self.assertEqual(
+            response.json(),
+            {'id': ApiTests.post.pk, 'author': ApiTests.post.author.username}
+        )
+        response = self.client.get(f'{url}?fields=id,password')
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        page = self.client.get(
+            reverse('api:v1:post_list') + '?fields=id'
+        ).json()
+        self.assertIn('fields=id', page['next'])
+        self.assertEqual(set(page['results'][0]), {'id'})
+
+    def test_guest_cannot_write(self):
+        """
+        Писать может только вошедший пользователь.
+        """
+        post_url = reverse(
+            'api:v1:post_detail', kwargs={'post_id': ApiTests.own_post.pk}
+        )
+        requests = (
+            ('post', reverse('api:v1:post_list')),
+            ('patch', post_url),
+            ('post', reverse(
+                'api:v1:post_comments',
+                kwargs={'post_id': ApiTests.own_post.pk}
+            )),
+            ('get', reverse('api:v1:follow_feed')),
+            ('get', reverse('api:v1:follow_list')),
+        )
+        for method, url in requests:
+            with self.subTest(method=method, url=url):
+                response = getattr(self.client, method)(
+                    url, {'text': 'Текст'}, content_type='application/json'
+                )
+                self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
+        self.assertEqual(Post.objects.count(), settings.POST_PER_PAGE + 4)
+        self.assertFalse(Comment.objects.exists())
+
+    def test_create_and_edit_post(self):
+        """
+        Пост создается вошедшим пользователем, править может только автор.
+        """
+        response = self.authorized_client.post(
+            reverse('api:v1:post_list'),
+            {'text': 'Новый пост', 'group': ApiTests.group.slug},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        post = Post.objects.get(pk=response.json()['id'])
+        self.assertEqual(post.author, ApiTests.user)
+        self.assertEqual(post.group, ApiTests.group)
+
+        response = self.authorized_client.post(
+            reverse('api:v1:post_list'), {'text': ''},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertIn('text', response.json()['errors'])
+
+        url = reverse(
+            'api:v1:post_detail', kwargs={'post_id': ApiTests.own_post.pk}
+        )
+        response = self.authorized_client.patch(
+            url, {'text': 'Чужая правка'}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
+        response = self.author_client.patch(
+            url, {'group': ApiTests.group.slug},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.json()['text'], ApiTests.own_post.text)
+        self.assertEqual(response.json()['group'], ApiTests.group.slug)
+
+    def test_patch_with_form_body(self):
+        """
+        PATCH принимает форму и multipart с картинкой, а не только JSON;
+        прочие типы тела — 415.
+        """
+        url = reverse(
+            'api:v1:post_detail', kwargs={'post_id': ApiTests.own_post.pk}
+        )
+        response = self.author_client.patch(
+            url, urlencode({'text': 'Правка формой'}),
+            content_type='application/x-www-form-urlencoded',
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.json()['text'], 'Правка формой')
+        image = SimpleUploadedFile(
+            'small.gif', SMALL_GIF, content_type='image/gif'
+        )
+        response = self.author_client.patch(
+            url, encode_multipart(BOUNDARY, {'image': image}),
+            content_type=MULTIPART_CONTENT,
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertTrue(
+            Post.objects.get(pk=ApiTests.own_post.pk).image.name
+        )
+        response = self.author_client.patch(
+            url, 'text=x', content_type='text/plain'
+        )
+        self.assertEqual(
+            response.status_code, HTTPStatus.UNSUPPORTED_MEDIA_TYPE
+        )
+        self.assertIn('detail', response.json())
+
+    def test_csrf_errors_are_json(self):
+        """
+        Без CSRF-токена вошедший пользователь получает JSON 403,
+        гость — JSON 401.
+        """
+        client = Client(enforce_csrf_checks=True)
+        url = reverse('api:v1:post_list')
+        response = client.post(
+            url, {'text': 'Текст'}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
+        client.force_login(ApiTests.user)
+        response = client.post(
+            url, {'text': 'Текст'}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
+        self.assertIn('CSRF', response.json()['detail'])
+        self.assertEqual(Post.objects.count(), settings.POST_PER_PAGE + 4)
+
+    def test_comments(self):
+        """
+        Комментарии добавляются и читаются страницами.
+        """
+        url = reverse(
+            'api:v1:post_comments', kwargs={'post_id': ApiTests.own_post.pk}
+        )
+        response = self.authorized_client.post(
+            url, {'text': 'Комментарий'}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        results = self.client.get(url).json()['results']
+        self.assertEqual(
+            [(comment['author'], comment['text']) for comment in results],
+            [(ApiTests.user.username, 'Комментарий')]
+        )
+
+    def test_follows(self):
+        """
+        Подписка, список подписок, лента подписок и отписка.
+        """
+        response = self.authorized_client.post(
+            reverse('api:v1:follow_list'),
+            {'author': ApiTests.author.username},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        response = self.authorized_client.post(
+            reverse('api:v1:follow_list'),
+            {'author': ApiTests.user.username},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        follows = self.authorized_client.get(
+            reverse('api:v1:follow_list')
+        ).json()['results']
+        self.assertEqual(
+            follows,
+            [{'user': ApiTests.user.username,
+              'author': ApiTests.author.username}]
+        )
+        feed = self.authorized_client.get(
+            reverse('api:v1:follow_feed')
+        ).json()['results']
+        self.assertEqual(
+            [post['id'] for post in feed], [ApiTests.own_post.pk]
+        )
+        url = reverse(
+            'api:v1:follow_detail',
+            kwargs={'username': ApiTests.author.username}
+        )
+        response = self.authorized_client.delete(url)
+        self.assertEqual(response.status_code, HTTPStatus.NO_CONTENT)
+        self.assertFalse(Follow.objects.exists())
+        self.assertEqual(
+            self.authorized_client.get(url).status_code, HTTPStatus.NOT_FOUND
+        )
+
+    def test_errors_are_json(self):
+        """
+        Ошибки отдаются JSON-ом, а не HTML-страницами.
+        """
+        response = self.client.get(
+            reverse('api:v1:post_detail', kwargs={'post_id': 0})
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        self.assertIn('detail', response.json())
+        response = self.client.delete(reverse('api:v1:post_list'))
+        self.assertEqual(response.status_code, HTTPStatus.METHOD_NOT_ALLOWED)
+        self.assertEqual(response['Allow'], 'GET, POST')
+
+    def test_groups_and_profiles(self):
+        """
+        Группы и профили отдаются со счетчиками.
+        """
+        groups = self.client.get(reverse('api:v1:group_list')).json()
+        self.assertEqual(
+            [group['slug'] for group in groups['results']],
+            [ApiTests.group.slug]
+        )
+        group = self.client.get(
+            reverse('api:v1:group_detail', kwargs={'slug': 'test-slug'})
+        ).json()
+        self.assertEqual(group['post_count'], settings.POST_PER_PAGE + 3)
+        profile = self.client.get(
+            reverse(
+                'api:v1:profile',
+                kwargs={'username': ApiTests.author.username}
+            )
+        ).json()
+        self.assertEqual(profile['post_count'], 1)
@@ -0,0 +1,37 @@
+from django.urls import include, path
+
+from . import views
+
+app_name = 'api'
+
+v1_patterns = [
+    path('posts/', views.post_list, name='post_list'),
+    path('posts/batch/', views.post_batch, name='post_batch'),
+    path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.post_comments,
+        name='post_comments'
+    ),
+    path('groups/', views.group_list, name='group_list'),
+    path('groups/<slug:slug>/', views.group_detail, name='group_detail'),
+    path('groups/<slug:slug>/posts/', views.group_posts, name='group_posts'),
+    path('profiles/<str:username>/', views.profile, name='profile'),
+    path(
+        'profiles/<str:username>/posts/',
+        views.profile_posts,
+        name='profile_posts'
+    ),
+    path('hot/', views.hot, name='hot'),
+    path('follow/', views.follow_feed, name='follow_feed'),
+    path('follows/', views.follow_list, name='follow_list'),
+    path(
+        'follows/<str:username>/',
+        views.follow_detail,
+        name='follow_detail'
+    ),
+]
+
+urlpatterns = [
+    path('v1/', include((v1_patterns, 'v1'))),
+]
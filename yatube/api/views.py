@@ -0,0 +1,364 @@
+"""
+JSON API первой версии.
+
+Правила доступа те же, что у HTML-страниц posts: ленты и посты
+открыты всем, писать может только вошедший пользователь, править
+пост — только его автор. Ленты выбираются теми же паджинаторами
+и делят с HTML-страницами кэш строк страницы.
+"""
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.db import transaction
+from django.http import Http404, HttpResponse, JsonResponse, QueryDict
+from django.middleware.csrf import CsrfViewMiddleware
+from django.shortcuts import get_object_or_404
+from django.views.decorators.csrf import csrf_exempt
+
+from posts import graph
+from posts import hot as hot_posts
+from posts.feed_cache import feed_cache
+from posts.forms import CommentForm
+from posts.models import Comment, Follow, Group, Post, User
+from posts.paginator import CursorPaginator, KeyPaginator
+from posts.timeline import timeline_entries, timeline_paginator
+from posts.views import pagination
+
+from .errors import ApiError
+from .forms import PostForm
+from .serializers import (CommentSerializer, FollowSerializer,
+                          GroupSerializer, PostSerializer, ProfileSerializer)
+
+FORM_CONTENT_TYPES = [
+    'application/x-www-form-urlencoded', 'multipart/form-data',
+]
+# Наибольший id, который помещается в bigint базы.
+MAX_ID = 2 ** 63 - 1
+
+
+def _error(status, detail, **extra):
+    return JsonResponse({'detail': detail, **extra}, status=status)
+
+
+class _CsrfCheck(CsrfViewMiddleware):
+    def _reject(self, request, reason):
+        raise ApiError(403, f'Проверка CSRF не пройдена: {reason}')
+
+
+def _check_csrf(request, view):
+    # CSRF защищает только сессию: гостю без нее незачем проверять
+    # токен — его запись на изменение все равно получит 401.
+    if request.user.is_authenticated:
+        _CsrfCheck().process_view(request, view, (), {})
+
+
+def api_view(*methods):
+    """
+    Пропускает только methods и отвечает на ошибки JSON-ом,
+    а не HTML-страницей или редиректом на вход. CSRF проверяется
+    здесь же, чтобы и отказ пришел JSON-ом.
+    """
+    def decorator(view):
+        @csrf_exempt
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                response = _error(405, 'Метод не поддерживается.')
+                response['Allow'] = ', '.join(methods)
+                return response
+            try:
+                _check_csrf(request, view)
+                return view(request, *args, **kwargs)
+            except ApiError as error:
+                return _error(error.status, error.detail, **error.extra)
+            except Http404:
+                return _error(404, 'Не найдено.')
+        return wrapper
+    return decorator
+
+
+def _login_required(request):
+    if not request.user.is_authenticated:
+        raise ApiError(401, 'Нужно войти.')
+
+
+def _data(request):
+    """
+    Тело запроса: JSON-объект или форма и файлы. Django разбирает
+    форму только у POST, поэтому тело PATCH разбирается здесь.
+    """
+    content_type = request.content_type
+    if content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            raise ApiError(400, 'Тело запроса — не JSON.')
+        if not isinstance(data, dict):
+            raise ApiError(400, 'Ожидается JSON-объект.')
+        return data, {}
+    if content_type not in FORM_CONTENT_TYPES:
+        if not request.body:
+            return {}, {}
+        raise ApiError(
+            415, 'Тело запроса — JSON или форма.',
+            supported=['application/json', *FORM_CONTENT_TYPES],
+        )
+    if request.method == 'POST':
+        return request.POST, request.FILES
+    if content_type == 'multipart/form-data':
+        return request.parse_file_upload(request.META, request)
+    return QueryDict(request.body, encoding=request.encoding), {}
+
+
+def _valid(form):
+    if not form.is_valid():
+        raise ApiError(
+            400, 'Неверные данные.', errors=form.errors.get_json_data()
+        )
+    return form
+
+
+def _link(request, cursor):
+    query = request.GET.copy()
+    query.pop('page', None)
+    query['cursor'] = cursor
+    return request.build_absolute_uri(f'{request.path}?{query.urlencode()}')
+
+
+def _page(request, objects, serializer_class,
+          paginator_class=CursorPaginator, cache_key=None, per_page=None):
+    serializer = serializer_class.from_request(request)
+    page = pagination(request, objects, paginator_class, cache_key, per_page)
+    return JsonResponse({
+        'results': serializer.many(page),
+        'next': (
+            _link(request, page.next_cursor) if page.has_next() else None
+        ),
+        'previous': (
+            _link(request, page.previous_cursor)
+            if page.has_previous() else None
+        ),
+    })
+
+
+def _post(request, post, status=200):
+    return JsonResponse(
+        PostSerializer.from_request(request)(post), status=status
+    )
+
+
+@api_view('GET', 'POST')
+def post_list(request):
+    if request.method == 'POST':
+        return _create_post(request)
+    cache_context = feed_cache(request, 'index')
+    return _page(
+        request, Post.objects.for_feed(), PostSerializer,
+        cache_key=cache_context['feed_cache_key'],
+    )
+
+
+@transaction.atomic
+def _create_post(request):
+    _login_required(request)
+    data, files = _data(request)
+    form = _valid(PostForm(data, files=files or None))
+    post = form.save(commit=False)
+    post.author = request.user
+    post.save()
+    return _post(request, post, status=201)
+
+
+def _ids(request):
+    """Id из ?ids=3,1,2 без повторов, в порядке запроса."""
+    try:
+        ids = [int(value) for value in request.GET.get('ids', '').split(',')
+               if value.strip()]
+    except ValueError:
+        raise ApiError(400, 'ids — список чисел через запятую.')
+    # Большее число не влезает в целое базы: SQLite ответит
+    # OverflowError уже внутри запроса.
+    if any(not 0 < pk <= MAX_ID for pk in ids):
+        raise ApiError(400, f'ids — числа от 1 до {MAX_ID}.')
+    ids = list(dict.fromkeys(ids))
+    if not ids:
+        raise ApiError(400, 'Укажите ids.')
+    if len(ids) > settings.API_BATCH_SIZE:
+        raise ApiError(
+            400, f'Не больше {settings.API_BATCH_SIZE} постов за запрос.'
+        )
+    return ids
+
+
+@api_view('GET')
+def post_batch(request):
+    """
+    Посты по списку id одним запросом, в порядке запроса. Удаленные
+    и несуществующие id перечисляются в missing.
+    """
+    ids = _ids(request)
+    serializer = PostSerializer.from_request(request)
+    posts = Post.objects.for_feed().in_bulk(ids)
+    return JsonResponse({
+        'results': [serializer(posts[pk]) for pk in ids if pk in posts],
+        'missing': [pk for pk in ids if pk not in posts],
+    })
+
+
+@api_view('GET', 'PATCH')
+def post_detail(request, post_id):
+    if request.method == 'PATCH':
+        return _edit_post(request, post_id)
+    return _post(
+        request, get_object_or_404(Post.objects.for_feed(), pk=post_id)
+    )
+
+
+@transaction.atomic
+def _edit_post(request, post_id):
+    _login_required(request)
+    post = get_object_or_404(
+        Post.objects.select_related('author', 'group'), pk=post_id
+    )
+    if post.author_id != request.user.pk:
+        raise ApiError(403, 'Изменять пост может только автор.')
+    data = {'text': post.text, 'group': post.group and post.group.slug}
+    changes, files = _data(request)
+    data.update(changes.items())
+    form = _valid(PostForm(data, files=files or None, instance=post))
+    post = form.save()
+    return _post(request, post)
+
+
+@api_view('GET', 'POST')
+def post_comments(request, post_id):
+    if request.method == 'POST':
+        return _add_comment(request, post_id)
+    get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    return _page(
+        request,
+        Comment.objects.filter(post_id=post_id).for_list(),
+        CommentSerializer,
+        per_page=settings.COMMENTS_PER_PAGE,
+    )
+
+
+@transaction.atomic
+def _add_comment(request, post_id):
+    _login_required(request)
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    data, _ = _data(request)
+    comment = _valid(CommentForm(data)).save(commit=False)
+    comment.author = request.user
+    comment.post = post
+    comment.save()
+    return JsonResponse(
+        CommentSerializer.from_request(request)(comment), status=201
+    )
+
+
+@api_view('GET')
+def group_list(request):
+    # Групп немного, их заводит администратор: отдаем списком целиком.
+    serializer = GroupSerializer.from_request(request)
+    return JsonResponse(
+        {'results': serializer.many(Group.objects.order_by('title'))}
+    )
+
+
+@api_view('GET')
+def group_detail(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return JsonResponse(GroupSerializer.from_request(request)(group))
+
+
+@api_view('GET')
+def group_posts(request, slug):
+    group = get_object_or_404(Group.objects.only('pk'), slug=slug)
+    cache_context = feed_cache(request, 'group_list', slug)
+    return _page(
+        request, group.posts.for_feed(), PostSerializer,
+        cache_key=cache_context['feed_cache_key'],
+    )
+
+
+@api_view('GET')
+def profile(request, username):
+    user = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+    return JsonResponse(ProfileSerializer.from_request(request)(user))
+
+
+@api_view('GET')
+def profile_posts(request, username):
+    user = get_object_or_404(User.objects.only('pk'), username=username)
+    cache_context = feed_cache(request, 'profile', username)
+    return _page(
+        request, user.posts.for_feed(), PostSerializer,
+        cache_key=cache_context['feed_cache_key'],
+    )
+
+
+@api_view('GET')
+def hot(request):
+    cache_context = feed_cache(request, 'hot', hot_posts.version())
+    return _page(
+        request, Post.objects.for_feed(), PostSerializer,
+        hot_posts.HotPaginator, cache_context['feed_cache_key'],
+    )
+
+
+@api_view('GET')
+def follow_feed(request):
+    _login_required(request)
+    return _page(
+        request, timeline_entries(request.user), PostSerializer,
+        timeline_paginator(request.user),
+    )
+
+
+@api_view('GET', 'POST')
+def follow_list(request):
+    _login_required(request)
+    if request.method == 'POST':
+        return _follow(request)
+    return _page(
+        request,
+        graph.following(request.user).select_related('user'),
+        FollowSerializer,
+        KeyPaginator,
+    )
+
+
+@transaction.atomic
+def _follow(request):
+    data, _ = _data(request)
+    username = data.get('author')
+    if not username:
+        raise ApiError(400, 'Укажите автора.')
+    author = get_object_or_404(User, username=username)
+    if author == request.user:
+        raise ApiError(400, 'Нельзя подписаться на себя.')
+    follow, created = author.following.get_or_create(
+        user=request.user, author=author
+    )
+    return JsonResponse(
+        FollowSerializer.from_request(request)(follow),
+        status=201 if created else 200,
+    )
+
+
+@api_view('GET', 'DELETE')
+def follow_detail(request, username):
+    _login_required(request)
+    follows = Follow.objects.filter(
+        user=request.user, author__username=username
+    )
+    if request.method == 'DELETE':
+        with transaction.atomic():
+            follows.delete()
+        return HttpResponse(status=204)
+    follow = get_object_or_404(follows.select_related('user', 'author'))
+    return JsonResponse(FollowSerializer.from_request(request)(follow))
@@ -0,0 +1,175 @@
+"""
+Нагрузочный прогон страниц сайта.
+
+Запросы выполняются тестовым клиентом Django в нескольких потоках,
+без HTTP-сервера: так измеряется время самого приложения и число
+SQL-запросов на страницу. Результат — словарь, который можно сохранить
+в JSON и сравнить с прогоном на другом коммите.
+"""
+import math
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+
+from django.db import connections
+from django.test import Client
+
+Scenario = namedtuple('Scenario', 'name method paths data user')
+Scenario.__new__.__defaults__ = ('get', (), None, None)
+
+Sample = namedtuple('Sample', 'seconds queries status first_byte')
+Sample.__new__.__defaults__ = (None,)
+
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(values, rank):
+    """Перцентиль по методу ближайшего ранга; values отсортированы."""
+    if not values:
+        return 0.0
+    index = max(math.ceil(rank / 100 * len(values)) - 1, 0)
+    return values[index]
+
+
+def _request(client, scenario, number):
+    queries = []
+
+    def count(execute, sql, params, many, context):
+        queries.append(sql)
+        return execute(sql, params, many, context)
+
+    path = scenario.paths[number % len(scenario.paths)]
+    method = getattr(client, scenario.method)
+    with ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(count))
+        start = time.perf_counter()
+        first_byte = None
+        try:
+            response = method(path, scenario.data or {})
+            if response.streaming:
+                # Первый байт — первая часть потокового ответа.
+                content = iter(response.streaming_content)
+                next(content, None)
+                first_byte = time.perf_counter() - start
+                for _ in content:
+                    pass
+            status = response.status_code
+        except Exception:
+            # Тестовый клиент пробрасывает исключения представления.
+            status = 500
+        seconds = time.perf_counter() - start
+    return Sample(seconds, len(queries), status, first_byte or seconds)
+
+
+def _clients(scenario, concurrency):
+    """
+    Клиенты для потоков прогона. Вход выполняется заранее, в текущем
+    потоке: он пишет сессию и не должен мешать замерам.
+    """
+    clients = [Client() for _ in range(concurrency)]
+    if scenario.user is not None:
+        for client in clients:
+            client.force_login(scenario.user)
+    return clients
+
+
+def _worker(client, scenario, numbers):
+    try:
+        return [_request(client, scenario, number) for number in numbers]
+    finally:
+        # У каждого потока свои соединения с базами — закрываем их.
+        if threading.current_thread() is not threading.main_thread():
+            connections.close_all()
+
+
+def run_scenario(scenario, requests, concurrency=1, clients=None):
+    """
+    Выполняет requests запросов сценария в concurrency потоков.
+    Возвращает (замеры, время прогона в секундах).
+    """
+    clients = clients or _clients(scenario, concurrency)
+    chunks = [range(i, requests, concurrency) for i in range(concurrency)]
+    start = time.perf_counter()
+    if concurrency == 1:
+        samples = _worker(clients[0], scenario, chunks[0])
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = executor.map(
+                lambda args: _worker(args[0], scenario, args[1]),
+                zip(clients, chunks),
+            )
+            samples = [sample for chunk in results for sample in chunk]
+    return samples, time.perf_counter() - start
+
+
+def summarize(samples, elapsed):
+    """Сводка прогона: перцентили в миллисекундах, RPS и запросы к БД."""
+    seconds = sorted(sample.seconds for sample in samples)
+    queries = [sample.queries for sample in samples]
+    summary = {
+        'requests': len(samples),
+        'errors': sum(sample.status >= 500 for sample in samples),
+        'rps': round(len(samples) / elapsed, 2) if elapsed else 0.0,
+        'queries': round(sum(queries) / len(queries), 2) if queries else 0,
+        'max_queries': max(queries, default=0),
+    }
+    first_bytes = sorted(
+        sample.first_byte or sample.seconds for sample in samples
+    )
+    for rank in PERCENTILES:
+        summary[f'p{rank}'] = round(percentile(seconds, rank) * 1000, 2)
+        summary[f'ttfb_p{rank}'] = round(
+            percentile(first_bytes, rank) * 1000, 2
+        )
+    return summary
+
+
+def run(scenarios, requests, concurrency=1, warmup=0):
+    """Прогоняет сценарии по очереди и возвращает сводку по каждому."""
+    results = {}
+    for scenario in scenarios:
+        if warmup:
+            run_scenario(scenario, warmup)
+        results[scenario.name] = summarize(
+            *run_scenario(scenario, requests, concurrency)
+        )
+    return results
+
+
+def run_mixed(scenarios, requests, concurrency=1, warmup=0):
+    """
+    Прогоняет сценарии одновременно, по concurrency потоков на каждый:
+    так видно, как запись мешает чтению. Возвращает сводку по каждому.
+    """
+    if warmup:
+        for scenario in scenarios:
+            run_scenario(scenario, warmup)
+    clients = [_clients(scenario, concurrency) for scenario in scenarios]
+    with ThreadPoolExecutor(max_workers=len(scenarios)) as executor:
+        runs = list(executor.map(
+            lambda args: run_scenario(
+                args[0], requests, concurrency, clients=args[1]
+            ),
+            zip(scenarios, clients),
+        ))
+    return {
+        scenario.name: summarize(*result)
+        for scenario, result in zip(scenarios, runs)
+    }
+
+
+def compare(current, baseline, tolerance, metric='p95'):
+    """
+    Сценарии, у которых metric хуже базового прогона больше чем на
+    tolerance процентов: [(имя, было, стало)].
+    """
+    regressions = []
+    for name, summary in current.items():
+        before = baseline.get(name, {}).get(metric)
+        after = summary[metric]
+        if before and after > before * (1 + tolerance / 100):
+            regressions.append((name, before, after))
+    return regressions
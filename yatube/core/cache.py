@@ -0,0 +1,61 @@
+"""
+Чтение из кэша с защитой от «шторма» запросов.
+
+Когда горячий ключ истекает, все процессы одновременно идут в базу за
+одним и тем же значением. get_or_compute этого не допускает:
+значение заранее пересчитывается с вероятностью, растущей к концу
+срока жизни (probabilistic early expiration, XFetch), а пересчитывает
+только тот, кто взял блокировку, — остальные отдают старое значение
+или ждут нового.
+"""
+import math
+import random
+import time
+
+from django.core.cache import cache
+
+from .routers import use_primary
+
+LOCK_TIMEOUT = 10
+LOCK_POLL_INTERVAL = 0.05
+
+
+def _recompute_early(delta, expires, beta):
+    gap = -delta * beta * math.log(1 - random.random())
+    return time.time() + gap >= expires
+
+
+def get_or_compute(key, compute, timeout, beta=1.0):
+    """
+    Значение ключа key из кэша; при промахе — результат compute().
+    beta > 1 заставляет пересчитывать раньше, beta < 1 — позже.
+    """
+    lock_key = f'{key}:lock'
+    entry = cache.get(key)
+    if entry is not None:
+        value, delta, expires = entry
+        if not _recompute_early(delta, expires, beta):
+            return value
+        if not cache.add(lock_key, 1, LOCK_TIMEOUT):
+            return value
+    elif not cache.add(lock_key, 1, LOCK_TIMEOUT):
+        deadline = time.monotonic() + LOCK_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(LOCK_POLL_INTERVAL)
+            entry = cache.get(key)
+            if entry is not None:
+                return entry[0]
+        # Владелец блокировки не справился — считаем сами.
+        with use_primary():
+            return compute()
+    try:
+        started = time.time()
+        # Значение увидят все читатели до конца срока: реплика
+        # могла еще не получить последнюю запись.
+        with use_primary():
+            value = compute()
+        delta = time.time() - started
+        cache.set(key, (value, delta, time.time() + timeout), timeout)
+    finally:
+        cache.delete(lock_key)
+    return value
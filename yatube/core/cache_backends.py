@@ -0,0 +1,65 @@
+import os
+import tempfile
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+
+from .metrics import record_cache
+
+try:
+    from django_redis.cache import RedisCache as BaseRedisCache
+except ImportError:
+    # django-redis нужен только при CACHE_BACKEND=redis.
+    BaseRedisCache = None
+
+_missing = object()
+
+
+class MetricsMixin:
+    """Считает попадания и промахи кэша для метрик запроса."""
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _missing, version)
+        if value is _missing:
+            record_cache(0, 1)
+            return default
+        record_cache(1, 0)
+        return value
+
+
+class MemoryCache(MetricsMixin, LocMemCache):
+    """Кэш в памяти процесса."""
+
+
+class FileCache(MetricsMixin, FileBasedCache):
+    """
+    Файловый кэш, общий для всех процессов на машине.
+    Замена Redis для разработки и тестов.
+
+    В отличие от FileBasedCache, add() атомарен: файл ключа появляется
+    через os.link, который не перезаписывает существующий файл.
+    Это нужно для блокировок в core.cache.get_or_compute.
+    """
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        if self.has_key(key, version):
+            return False
+        fname = self._key_to_file(key, version)
+        self._createdir()
+        fd, tmp_path = tempfile.mkstemp(dir=self._dir)
+        try:
+            with open(fd, 'wb') as f:
+                self._write_content(f, timeout, value)
+            os.link(tmp_path, fname)
+        except FileExistsError:
+            return False
+        finally:
+            os.remove(tmp_path)
+        self._cull()
+        return True
+
+
+if BaseRedisCache is not None:
+    class RedisCache(MetricsMixin, BaseRedisCache):
+        """Общий кэш на Redis."""
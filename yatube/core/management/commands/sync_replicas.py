@@ -0,0 +1,46 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную базу SQLite в файлы реплик из DATABASE_REPLICAS: '
+        'локальная замена репликации для проверки чтения с реплик.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=0,
+            help='Повторять копирование раз в столько секунд.',
+        )
+
+    def handle(self, *args, **options):
+        primary = connections[DEFAULT_DB_ALIAS]
+        if primary.vendor != 'sqlite':
+            raise CommandError(
+                'Копировать можно только базу SQLite, остальные СУБД '
+                'реплицируют данные сами.'
+            )
+        if not settings.REPLICA_DATABASES:
+            raise CommandError('Реплики не заданы: укажите DATABASE_REPLICAS.')
+        while True:
+            self.sync(primary)
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    def sync(self, primary):
+        primary.ensure_connection()
+        for alias in settings.REPLICA_DATABASES:
+            target = sqlite3.connect(connections[alias].settings_dict['NAME'])
+            try:
+                primary.connection.backup(target)
+            finally:
+                target.close()
+            self.stdout.write(f'{alias}: скопирована.')
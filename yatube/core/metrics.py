@@ -0,0 +1,202 @@
+"""
+Метрики запросов по представлениям.
+
+RequestMetricsMiddleware собирает для каждого запроса число и время
+SQL-запросов, время отрисовки шаблонов и попадания в кэш. Сводка по
+представлениям копится в памяти процесса и отдается в текстовом формате
+Prometheus; каждый процесс сервера нужно опрашивать отдельно.
+"""
+import re
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from time import perf_counter
+
+BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_local = threading.local()
+
+_IN_LIST = re.compile(r'\bIN \((?:%s, )*%s\)')
+_QUOTED = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_SPACES = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """SQL без значений: одинаковые запросы с разными id совпадают."""
+    sql = _IN_LIST.sub('IN (...)', sql)
+    sql = _QUOTED.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    return _SPACES.sub(' ', sql).strip()
+
+
+class RequestMetrics:
+    """Метрики одного запроса."""
+
+    def __init__(self):
+        self.queries = []
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def execute(self, execute, sql, params, many, context):
+        """Обертка для connection.execute_wrapper."""
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += perf_counter() - start
+            self.queries.append(sql)
+
+    def fingerprints(self):
+        return Counter(fingerprint(sql) for sql in self.queries)
+
+    def server_timing(self, duration):
+        """Значение заголовка Server-Timing, время в миллисекундах."""
+        return ', '.join((
+            f'db;dur={self.sql_time * 1000:.1f};'
+            f'desc="{len(self.queries)} queries"',
+            f'tpl;dur={self.template_time * 1000:.1f}',
+            f'cache;desc="hit={self.cache_hits} miss={self.cache_misses}"',
+            f'total;dur={duration * 1000:.1f}',
+        ))
+
+
+def current():
+    """Метрики текущего запроса или None вне запроса."""
+    return getattr(_local, 'metrics', None)
+
+
+@contextmanager
+def collect(metrics=None):
+    """Собирает метрики запроса; metrics — продолжить начатый сбор."""
+    _local.metrics = metrics or RequestMetrics()
+    try:
+        yield _local.metrics
+    finally:
+        _local.metrics = None
+
+
+def record_cache(hits, misses):
+    metrics = current()
+    if metrics is not None:
+        metrics.cache_hits += hits
+        metrics.cache_misses += misses
+
+
+@contextmanager
+def template_timer():
+    """Засекает отрисовку; вложенные шаблоны не считаются дважды."""
+    metrics = current()
+    if metrics is None:
+        yield
+        return
+    metrics.template_depth += 1
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        metrics.template_depth -= 1
+        if not metrics.template_depth:
+            metrics.template_time += perf_counter() - start
+
+
+class ViewStats:
+    def __init__(self):
+        self.requests = 0
+        self.duration = 0.0
+        self.buckets = [0] * len(BUCKETS)
+        self.queries = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def observe(self, duration, metrics):
+        self.requests += 1
+        self.duration += duration
+        for index, bound in enumerate(BUCKETS):
+            if duration <= bound:
+                self.buckets[index] += 1
+        self.queries += len(metrics.queries)
+        self.sql_time += metrics.sql_time
+        self.template_time += metrics.template_time
+        self.cache_hits += metrics.cache_hits
+        self.cache_misses += metrics.cache_misses
+
+
+COUNTERS = (
+    ('requests', 'yatube_requests_total', 'Число запросов.'),
+    ('queries', 'yatube_db_queries_total', 'Число SQL-запросов.'),
+    ('sql_time', 'yatube_db_seconds_total', 'Время SQL-запросов.'),
+    ('template_time', 'yatube_template_seconds_total',
+     'Время отрисовки шаблонов.'),
+    ('cache_hits', 'yatube_cache_hits_total', 'Попадания в кэш.'),
+    ('cache_misses', 'yatube_cache_misses_total', 'Промахи кэша.'),
+)
+
+
+class Registry:
+    """Сводка метрик по представлениям в памяти процесса."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+        self._connections = Counter()
+
+    def observe(self, view, duration, metrics):
+        with self._lock:
+            self._views.setdefault(view, ViewStats()).observe(
+                duration, metrics
+            )
+
+    def observe_connection(self, alias, event):
+        """Событие соединения с базой: opened, reused или unusable."""
+        with self._lock:
+            self._connections[alias, event] += 1
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+            self._connections.clear()
+
+    def prometheus(self):
+        """Сводка в текстовом формате Prometheus."""
+        with self._lock:
+            views = sorted(self._views.items())
+            lines = []
+            for attr, name, help_text in COUNTERS:
+                lines += [f'# HELP {name} {help_text}',
+                          f'# TYPE {name} counter']
+                lines += [
+                    f'{name}{{view="{view}"}} {getattr(stats, attr)}'
+                    for view, stats in views
+                ]
+            name = 'yatube_request_duration_seconds'
+            lines += [f'# HELP {name} Время ответа.',
+                      f'# TYPE {name} histogram']
+            for view, stats in views:
+                for bound, count in zip(BUCKETS, stats.buckets):
+                    lines.append(
+                        f'{name}_bucket{{view="{view}",le="{bound}"}} {count}'
+                    )
+                lines += [
+                    f'{name}_bucket{{view="{view}",le="+Inf"}} '
+                    f'{stats.requests}',
+                    f'{name}_sum{{view="{view}"}} {stats.duration}',
+                    f'{name}_count{{view="{view}"}} {stats.requests}',
+                ]
+            name = 'yatube_db_connections_total'
+            lines += [f'# HELP {name} Открытые, повторно использованные '
+                      f'и отброшенные проверкой соединения с базой.',
+                      f'# TYPE {name} counter']
+            lines += [
+                f'{name}{{alias="{alias}",event="{event}"}} {count}'
+                for (alias, event), count in sorted(self._connections.items())
+            ]
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
@@ -0,0 +1,113 @@
+import logging
+from contextlib import ExitStack, contextmanager, nullcontext
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connections
+
+from . import metrics, routers
+
+logger = logging.getLogger(__name__)
+
+
+def view_name(request):
+    match = request.resolver_match
+    return match.view_name if match is not None else 'unresolved'
+
+
+class RequestMetricsMiddleware:
+    """
+    Считает SQL-запросы, время шаблонов и попадания в кэш для каждого
+    запроса. Отдает их в заголовке Server-Timing, копит сводку для
+    /metrics/ и пишет в лог запросы дольше SLOW_REQUEST_MS. Потоковые
+    ответы учитываются целиком, когда отдана последняя часть; заголовок
+    Server-Timing у них не ставится — он уходит раньше тела.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = perf_counter()
+        with self.collect() as collected:
+            response = self.get_response(request)
+        if response.streaming:
+            response.streaming_content = self.stream(
+                request, response.streaming_content, start, collected
+            )
+            return response
+        duration = self.observe(request, start, collected)
+        response['Server-Timing'] = collected.server_timing(duration)
+        return response
+
+    @contextmanager
+    def collect(self, collected=None):
+        with metrics.collect(collected) as collected, ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(
+                    connections[alias].execute_wrapper(collected.execute)
+                )
+            yield collected
+
+    def stream(self, request, content, start, collected):
+        with self.collect(collected):
+            yield from content
+        self.observe(request, start, collected)
+
+    def observe(self, request, start, collected):
+        duration = perf_counter() - start
+        view = view_name(request)
+        metrics.registry.observe(view, duration, collected)
+        if duration * 1000 >= settings.SLOW_REQUEST_MS:
+            self.log_slow_request(request, view, duration, collected)
+        return duration
+
+    def log_slow_request(self, request, view, duration, collected):
+        fingerprints = collected.fingerprints().most_common(
+            settings.SLOW_REQUEST_QUERIES
+        )
+        logger.warning(
+            'Медленный запрос %s %s (%s): %.0f мс, SQL: %d запросов '
+            'за %.0f мс\n%s',
+            request.method, request.get_full_path(), view, duration * 1000,
+            len(collected.queries), collected.sql_time * 1000,
+            '\n'.join(f'{count} × {sql}' for sql, count in fingerprints),
+        )
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Разрешает чтение с реплик запросам, которые не меняют данные.
+    После записи ставит cookie на REPLICA_STICKY_SECONDS: пока реплики
+    догоняют основную базу, пользователь читает из нее и видит свои
+    изменения.
+    """
+    cookie_name = 'use_primary'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        replicas = (
+            request.method in ('GET', 'HEAD', 'OPTIONS')
+            and self.cookie_name not in request.COOKIES
+        )
+        routers.reset_writes()
+        with routers.use_replicas() if replicas else nullcontext():
+            response = self.get_response(request)
+        if replicas and response.streaming:
+            response.streaming_content = self.stream(
+                response.streaming_content
+            )
+        if routers.has_written():
+            response.set_cookie(
+                self.cookie_name, '1',
+                max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True, samesite='Lax',
+            )
+        return response
+
+    def stream(self, content):
+        # Потоковый ответ читает ленту уже после выхода из представления.
+        with routers.use_replicas():
+            yield from content
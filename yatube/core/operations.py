@@ -0,0 +1,38 @@
+from django.db.migrations.operations import AddIndex
+
+
+class AddIndexConcurrently(AddIndex):
+    """
+    AddIndex, который на PostgreSQL строит индекс через
+    CREATE INDEX CONCURRENTLY и не блокирует запись в таблицу.
+    На остальных СУБД работает как обычный AddIndex.
+    Миграция с этой операцией должна объявлять atomic = False.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return super().database_forwards(
+                app_label, schema_editor, from_state, to_state
+            )
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            sql = str(self.index.create_sql(model, schema_editor))
+            schema_editor.execute(sql.replace(
+                'CREATE INDEX', 'CREATE INDEX CONCURRENTLY', 1
+            ))
+
+    def database_backwards(self, app_label, schema_editor, from_state,
+                           to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return super().database_backwards(
+                app_label, schema_editor, from_state, to_state
+            )
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.execute('DROP INDEX CONCURRENTLY IF EXISTS %s' % (
+                schema_editor.quote_name(self.index.name)
+            ))
+
+    def describe(self):
+        return super().describe() + ' concurrently'
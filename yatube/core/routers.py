@@ -0,0 +1,82 @@
+"""
+Чтение с реплик, запись в основную базу.
+
+Реплики из settings.REPLICA_DATABASES читаются только внутри
+use_replicas(): его включает ReplicaRoutingMiddleware для запросов,
+которые не меняют данные. Команды, фоновые потоки и запросы на запись
+читают из default. Внутри use_replicas() чтение тоже уходит в default,
+если поток уже писал в базу или открыта транзакция: так запрос видит
+свои изменения, которые еще не дошли до реплик. Значения для общего
+кэша считаются внутри use_primary() и тоже читаются из default.
+"""
+import random
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_local = threading.local()
+
+
+@contextmanager
+def use_replicas():
+    """
+    Разрешает чтение с реплик внутри блока. Реплика выбирается одна
+    на весь блок, чтобы запрос не смешивал данные с разным отставанием.
+    """
+    previous = getattr(_local, 'replica', None)
+    replicas = settings.REPLICA_DATABASES
+    _local.replica = random.choice(replicas) if replicas else None
+    try:
+        yield
+    finally:
+        _local.replica = previous
+
+
+@contextmanager
+def use_primary():
+    """
+    Читает только из default внутри блока — для значений, которые
+    надолго уходят в общий кэш: с отстающей реплики туда попали бы
+    старые данные, и их видели бы все до конца срока кэша.
+    """
+    previous = getattr(_local, 'replica', None)
+    _local.replica = None
+    try:
+        yield
+    finally:
+        _local.replica = previous
+
+
+def reset_writes():
+    _local.wrote = False
+
+
+def has_written():
+    """Писал ли поток в базу с последнего reset_writes()."""
+    return getattr(_local, 'wrote', False)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replica = getattr(_local, 'replica', None)
+        if (
+            replica is None
+            or has_written()
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        return replica
+
+    def db_for_write(self, model, **hints):
+        _local.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # На всех базах одни и те же данные.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Реплики получают схему вместе с данными основной базы.
+        return db not in settings.REPLICA_DATABASES
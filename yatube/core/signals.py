@@ -0,0 +1,31 @@
+from django.core.signals import request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from .metrics import registry
+
+
+@receiver(connection_created)
+def count_new_connection(sender, connection, **kwargs):
+    registry.observe_connection(connection.alias, 'opened')
+
+
+@receiver(request_started)
+def check_reused_connections(sender, **kwargs):
+    """
+    Проверяет постоянные соединения, оставшиеся у потока от прошлых
+    запросов. Оборванное соединение закрывается, и Django откроет
+    новое при первом запросе к базе, вместо ошибки посреди страницы.
+    """
+    for connection in connections.all():
+        if connection.connection is None or connection.in_atomic_block:
+            continue
+        if (
+            connection.settings_dict.get('CONN_HEALTH_CHECKS')
+            and not connection.is_usable()
+        ):
+            connection.close()
+            registry.observe_connection(connection.alias, 'unusable')
+        else:
+            registry.observe_connection(connection.alias, 'reused')
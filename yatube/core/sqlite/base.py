@@ -0,0 +1,34 @@
+"""
+SQLite с настройкой каждого нового соединения.
+
+В OPTIONS, как в Django 5.1, понимаются два ключа:
+
+- init_command — SQL через точку с запятой, обычно PRAGMA, который
+  выполняется сразу после открытия соединения;
+- transaction_mode — режим BEGIN для transaction.atomic(). IMMEDIATE
+  берет блокировку на запись в начале транзакции: писатели ждут друг
+  друга busy_timeout, а не получают «database is locked», когда
+  читающая транзакция пытается начать запись.
+"""
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        self.init_command = params.pop('init_command', '')
+        self.transaction_mode = params.pop('transaction_mode', None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for statement in self.init_command.split(';'):
+            if statement.strip():
+                conn.execute(statement)
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        if self.transaction_mode:
+            self.cursor().execute(f'BEGIN {self.transaction_mode}')
+        else:
+            super()._start_transaction_under_autocommit()
@@ -0,0 +1,19 @@
+from django.template.backends import django
+
+from .metrics import template_timer
+
+
+class Template(django.Template):
+    def render(self, context=None, request=None):
+        with template_timer():
+            return super().render(context, request)
+
+
+class DjangoTemplates(django.DjangoTemplates):
+    """Шаблоны Django, время отрисовки которых попадает в метрики."""
+
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        return Template(super().get_template(template_name).template, self)
@@ -1,6 +1,29 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
 from http import HTTPStatus
+from unittest import mock
 
-from django.test import Client, TestCase
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.signals import request_started
+from django.http import HttpResponse
+from django.test import (Client, RequestFactory, SimpleTestCase, TestCase,
+                         override_settings)
+
+from posts.models import Post
+
+from . import routers
+from .cache import get_or_compute
+from .metrics import fingerprint, registry
+from .middleware import ReplicaRoutingMiddleware
+from .sqlite.base import DatabaseWrapper as SqliteWrapper
+
+User = get_user_model()
 
 
 class CustomErrorTestClass(TestCase):
@@ -14,3 +37,300 @@ class CustomErrorTestClass(TestCase):
         response = self.guest_client.get('/nonexist-page/')
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+class RequestMetricsTestClass(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_server_timing_header(self):
+        """
+        Ответ содержит время SQL, шаблонов и попадания в кэш.
+        """
+        response = self.client.get('/')
+        self.assertRegex(
+            response['Server-Timing'],
+            r'db;dur=[\d.]+;desc="\d+ queries", tpl;dur=[\d.]+, '
+            r'cache;desc="hit=\d+ miss=[1-9]\d*", total;dur=[\d.]+'
+        )
+
+    def test_metrics_endpoint(self):
+        """
+        /metrics/ отдает сводку по представлениям в формате Prometheus.
+        """
+        self.client.get('/')
+        self.client.force_login(
+            User.objects.create_user('staff', is_staff=True)
+        )
+        response = self.client.get('/metrics/')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertIn(
+            'yatube_requests_total{view="posts:index"}',
+            response.content.decode()
+        )
+        self.assertIn(
+            'yatube_request_duration_seconds_bucket{view="posts:index",'
+            'le="+Inf"}',
+            response.content.decode()
+        )
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_endpoint_is_private(self):
+        """
+        Сводка доступна только сотрудникам и по токену: адрес
+        127.0.0.1 за прокси есть у всех запросов.
+        """
+        for headers in ({}, {'HTTP_AUTHORIZATION': 'Bearer wrong'}):
+            with self.subTest(headers=headers):
+                response = self.client.get(
+                    '/metrics/', REMOTE_ADDR='127.0.0.1', **headers
+                )
+                self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
+        response = self.client.get(
+            '/metrics/', HTTP_AUTHORIZATION='Bearer secret'
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.client.force_login(User.objects.create_user('reader'))
+        response = self.client.get('/metrics/')
+        self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
+
+    @override_settings(SLOW_REQUEST_MS=0)
+    def test_slow_request_is_logged(self):
+        """
+        Медленный запрос пишется в лог вместе с отпечатками SQL.
+        """
+        with self.assertLogs('core.middleware', 'WARNING') as logs:
+            self.client.get('/', {'page': 2})
+        self.assertIn('posts:index', logs.output[0])
+        self.assertIn('FROM "posts_post"', logs.output[0])
+
+    def test_fingerprint(self):
+        """
+        Отпечаток не зависит от значений в запросе.
+        """
+        self.assertEqual(
+            fingerprint(
+                "SELECT *  FROM t WHERE id IN (%s, %s, %s) "
+                "AND name = 'x' LIMIT 21"
+            ),
+            'SELECT * FROM t WHERE id IN (...) AND name = ? LIMIT ?'
+        )
+
+
+class GetOrComputeTestClass(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.cache_dir = tempfile.mkdtemp()
+        cls.cache_settings = override_settings(CACHES={
+            'default': {
+                'BACKEND': 'core.cache_backends.FileCache',
+                'LOCATION': cls.cache_dir,
+            }
+        })
+        cls.cache_settings.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.cache_settings.disable()
+        shutil.rmtree(cls.cache_dir, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_file_cache_add_is_exclusive(self):
+        """
+        Файловый кэш добавляет ключ только один раз.
+        """
+        self.assertTrue(cache.add('lock', 1))
+        self.assertFalse(cache.add('lock', 2))
+        self.assertEqual(cache.get('lock'), 1)
+
+    def test_cold_key_is_computed_once(self):
+        """
+        Одновременные промахи по одному ключу вычисляют значение один раз.
+        """
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return 'value'
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(
+                lambda _: get_or_compute('hot', compute, 60), range(8)
+            ))
+        self.assertEqual(results, ['value'] * 8)
+        self.assertEqual(len(calls), 1)
+
+    def test_value_is_recomputed_before_expiry(self):
+        """
+        Ключ близко к истечению пересчитывается заранее,
+        свежий ключ отдается из кэша.
+        """
+        cache.set('fresh', ('cached', 0.001, time.time() + 60), 60)
+        cache.set('expiring', ('cached', 100, time.time() + 1), 60)
+        with mock.patch('core.cache.random.random', return_value=0.5):
+            self.assertEqual(
+                get_or_compute('fresh', lambda: 'new', 60), 'cached'
+            )
+            self.assertEqual(
+                get_or_compute('expiring', lambda: 'new', 60), 'new'
+            )
+
+    def test_stale_value_is_served_while_locked(self):
+        """
+        Пока другой процесс пересчитывает ключ, отдается старое значение.
+        """
+        cache.set('expiring', ('cached', 100, time.time() + 1), 60)
+        cache.add('expiring:lock', 1)
+        with mock.patch('core.cache.random.random', return_value=0.5):
+            self.assertEqual(
+                get_or_compute('expiring', lambda: 'new', 60), 'cached'
+            )
+
+
+@override_settings(REPLICA_DATABASES=['replica1', 'replica2'])
+class ReplicaRoutingTestClass(SimpleTestCase):
+    def setUp(self):
+        routers.reset_writes()
+        self.router = routers.ReplicaRouter()
+        self.factory = RequestFactory()
+
+    def read_alias(self, request):
+        """Ответ миддлвары с базой, выбранной для чтения."""
+        def view(request):
+            return HttpResponse(self.router.db_for_read(Post))
+        return ReplicaRoutingMiddleware(view)(request)
+
+    def test_reads_go_to_replicas(self):
+        """
+        Чтение идет на реплики только внутри use_replicas(),
+        запись и чтение после нее — в default.
+        """
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+        with routers.use_replicas():
+            self.assertIn(
+                self.router.db_for_read(Post), settings.REPLICA_DATABASES
+            )
+            self.assertEqual(self.router.db_for_write(Post), 'default')
+            self.assertEqual(self.router.db_for_read(Post), 'default')
+        self.assertFalse(self.router.allow_migrate('replica1', 'posts'))
+
+    def test_cached_values_are_read_from_primary(self):
+        """
+        Значение для общего кэша считается по default даже внутри
+        use_replicas(), а после блока чтение снова идет на реплику.
+        """
+        cache.delete('replica-routing')
+        with routers.use_replicas():
+            alias = get_or_compute(
+                'replica-routing',
+                lambda: self.router.db_for_read(Post), 60,
+            )
+            self.assertIn(
+                self.router.db_for_read(Post), settings.REPLICA_DATABASES
+            )
+        self.assertEqual(alias, 'default')
+
+    def test_reads_stick_to_primary_after_write(self):
+        """
+        После записи пользователь какое-то время читает из default.
+        """
+        response = self.read_alias(self.factory.get('/'))
+        self.assertIn(response.content.decode(), settings.REPLICA_DATABASES)
+        self.assertNotIn('use_primary', response.cookies)
+
+        def write(request):
+            self.router.db_for_write(Post)
+            return HttpResponse()
+        response = ReplicaRoutingMiddleware(write)(self.factory.post('/'))
+        cookie = response.cookies['use_primary']
+        self.assertEqual(
+            cookie['max-age'], settings.REPLICA_STICKY_SECONDS
+        )
+
+        request = self.factory.get('/')
+        request.COOKIES['use_primary'] = cookie.value
+        self.assertEqual(self.read_alias(request).content, b'default')
+        self.assertEqual(
+            self.read_alias(self.factory.post('/')).content, b'default'
+        )
+
+
+class ConnectionHealthTestClass(SimpleTestCase):
+    def setUp(self):
+        registry.reset()
+
+    def connection(self, usable):
+        return mock.Mock(
+            alias='default',
+            connection=object(),
+            in_atomic_block=False,
+            settings_dict={'CONN_HEALTH_CHECKS': True},
+            is_usable=mock.Mock(return_value=usable),
+        )
+
+    def test_broken_connection_is_closed(self):
+        """
+        Перед запросом оборванное соединение закрывается,
+        живое используется повторно.
+        """
+        broken, alive = self.connection(False), self.connection(True)
+        with mock.patch('core.signals.connections') as connections:
+            connections.all.return_value = [broken, alive]
+            request_started.send(sender=self.__class__)
+        broken.close.assert_called_once_with()
+        alive.close.assert_not_called()
+        text = registry.prometheus()
+        for event in ('unusable', 'reused'):
+            self.assertIn(
+                'yatube_db_connections_total'
+                f'{{alias="default",event="{event}"}} 1', text
+            )
+
+
+class SqliteTuningTestClass(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.name = os.path.join(directory, 'tuned.sqlite3')
+        self.wrapper = SqliteWrapper({
+            **settings.DATABASES['default'],
+            'NAME': self.name,
+            'OPTIONS': {
+                'init_command': 'PRAGMA journal_mode = WAL;'
+                                'PRAGMA busy_timeout = 1234',
+                'transaction_mode': 'IMMEDIATE',
+            },
+        }, alias='tuned')
+        self.addCleanup(self.wrapper.close)
+
+    def test_pragmas_applied_to_new_connection(self):
+        """
+        Команды из init_command выполняются на каждом соединении.
+        """
+        with self.wrapper.cursor() as cursor:
+            for pragma, expected in (
+                ('journal_mode', 'wal'), ('busy_timeout', 1234)
+            ):
+                cursor.execute(f'PRAGMA {pragma}')
+                self.assertEqual(cursor.fetchone()[0], expected)
+
+    def test_transaction_takes_write_lock_at_start(self):
+        """
+        Транзакция в режиме IMMEDIATE сразу берет блокировку на запись.
+        """
+        self.wrapper.ensure_connection()
+        self.wrapper._start_transaction_under_autocommit()
+        other = sqlite3.connect(self.name, timeout=0)
+        try:
+            with self.assertRaisesMessage(
+                sqlite3.OperationalError, 'database is locked'
+            ):
+                other.execute('BEGIN IMMEDIATE')
+        finally:
+            other.close()
+            self.wrapper.connection.rollback()
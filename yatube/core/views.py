@@ -1,5 +1,12 @@
+import hmac
+
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse
 from django.shortcuts import render
 
+from .metrics import registry
+
 
 def page_not_found(request, exception):
     return render(
@@ -10,10 +17,12 @@ def page_not_found(request, exception):
     )
 
 
-def csrf_failure(request, reason=''):
+def csrf_failure(request, reason='', exception=None):
+    # Служит и CSRF_FAILURE_VIEW, и handler403.
     return render(
         request,
-        'core/403csrf.html'
+        'core/403csrf.html',
+        status=403
     )
 
 
@@ -23,3 +32,24 @@ def server_error(request):
         'core/500.html',
         status=500
     )
+
+
+def _has_metrics_token(request):
+    """
+    Заголовок Authorization: Bearer <METRICS_TOKEN> от сборщика метрик.
+    Адресу клиента не верим: за прокси у всех запросов 127.0.0.1.
+    """
+    token = settings.METRICS_TOKEN
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    return bool(token) and hmac.compare_digest(
+        header.encode(), f'Bearer {token}'.encode()
+    )
+
+
+def metrics(request):
+    if not (request.user.is_staff or _has_metrics_token(request)):
+        raise PermissionDenied
+    return HttpResponse(
+        registry.prometheus(),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
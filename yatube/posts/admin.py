@@ -1,9 +1,166 @@
+import csv
+from functools import partial
+from itertools import islice
+
 from django.contrib import admin
+from django.contrib.admin.widgets import RelatedFieldWidgetWrapper
+from django.core.exceptions import PermissionDenied
+from django.forms import ModelChoiceField, Select
+from django.forms.utils import flatatt
+from django.http import StreamingHttpResponse
+from django.urls import path
+from django.utils import timezone
+from django.utils.html import format_html, format_html_join
 
+from . import search
 from .models import Comment, Follow, Group, Post
+from .paginator import EstimatedCountPaginator
+
+
+class IndexedSearchMixin:
+    """
+    Поиск в админке по обратному индексу вместо LIKE '%...%': каждое
+    слово запроса — подзапрос к индексу без ограничения числа строк,
+    так что пагинация идет по всем совпадениям. Числа и стоп-слова
+    в индекс не попадают: числа дополнительно ищутся через LIKE,
+    а запрос только из них и стоп-слов — обычным поиском админки.
+    """
+
+    def get_search_results(self, request, queryset, search_term):
+        indexed = set(search.terms(search_term))
+        if not indexed:
+            return super().get_search_results(
+                request, queryset, search_term
+            )
+        for term in indexed:
+            queryset = queryset.filter(pk__in=self.indexed_ids(term))
+        numbers = ' '.join(
+            word for word in search.WORD.findall(search_term)
+            if word.isdigit()
+        )
+        if numbers:
+            queryset, _ = super().get_search_results(
+                request, queryset, numbers
+            )
+        return queryset, False
+
+
+class _Echo:
+    """Псевдофайл для csv.writer: строка возвращается, а не пишется."""
+
+    def write(self, value):
+        return value
+
+
+class CsvExportMixin:
+    """
+    Выгрузка в CSV: действие для выбранных строк и ссылка export/
+    для всего списка с текущими фильтрами и поиском. Строки читаются
+    через values_list().iterator(), на PostgreSQL — серверным курсором,
+    и сразу уходят клиенту, поэтому память не растет с размером таблицы.
+    """
+    export_fields = ()
+    export_chunk_size = 2000
+    change_list_template = 'admin/posts/export_change_list.html'
+    actions = ('export_csv',)
+
+    def get_urls(self):
+        info = self.model._meta.app_label, self.model._meta.model_name
+        return [
+            path('export/', self.admin_site.admin_view(self.export_view),
+                 name='%s_%s_export' % info),
+        ] + super().get_urls()
+
+    def export_view(self, request):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        changelist = self.get_changelist_instance(request)
+        return self.export_response(changelist.get_queryset(request))
+
+    def export_csv(self, request, queryset):
+        return self.export_response(queryset)
 
+    export_csv.short_description = 'Выгрузить выбранные в CSV'
+    export_csv.allowed_permissions = ('view',)
 
-class PostAdmin(admin.ModelAdmin):
+    def export_rows(self, queryset):
+        """Строки CSV пачками по export_chunk_size."""
+        writer = csv.writer(_Echo())
+        yield writer.writerow(self.export_fields)
+        rows = queryset.order_by('pk').values_list(
+            *self.export_fields
+        ).iterator(chunk_size=self.export_chunk_size)
+        chunk = list(islice(rows, self.export_chunk_size))
+        while chunk:
+            yield ''.join(map(writer.writerow, chunk))
+            chunk = list(islice(rows, self.export_chunk_size))
+
+    def export_response(self, queryset):
+        response = StreamingHttpResponse(
+            self.export_rows(queryset), content_type='text/csv'
+        )
+        filename = '%s-%s.csv' % (
+            self.model._meta.model_name, timezone.now().strftime('%Y%m%d')
+        )
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+
+class ChangelistSelect(Select):
+    """
+    Выпадающий список для list_editable. Он рисуется в каждой строке,
+    поэтому варианты собираются строкой, а не шаблоном на каждый.
+    """
+
+    def render(self, name, value, attrs=None, renderer=None):
+        widget = self.get_context(name, value, attrs)['widget']
+        options = format_html_join('', '<option value="{}"{}>{}</option>', (
+            (option['value'], ' selected' if option['selected'] else '',
+             option['label'])
+            for _, group, _ in widget['optgroups'] for option in group
+        ))
+        return format_html(
+            '<select name="{}"{}>{}</select>',
+            widget['name'], flatatt(widget['attrs']), options,
+        )
+
+
+class LargeTableMixin:
+    """
+    Быстрый список для больших таблиц: связанные объекты подтягиваются
+    одним запросом, вместо COUNT(*) по всей таблице берется оценка,
+    а внешние ключи редактируются по id, без выпадающих списков.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    date_hierarchy = 'pub_date'
+
+    def get_changelist_formset(self, request, **kwargs):
+        kwargs.setdefault('formfield_callback', partial(
+            self.formfield_for_changelist, request=request
+        ))
+        return super().get_changelist_formset(request, **kwargs)
+
+    def formfield_for_changelist(self, db_field, request, **kwargs):
+        """
+        Поле list_editable: варианты выбираются раз на страницу, а не
+        в каждой строке, и рисуются без шаблонов и без ссылок
+        на добавление и правку объекта.
+        """
+        formfield = self.formfield_for_dbfield(db_field, request, **kwargs)
+        if isinstance(formfield, ModelChoiceField):
+            widget = formfield.widget
+            if isinstance(widget, RelatedFieldWidgetWrapper):
+                widget = widget.widget
+            if type(widget) is Select:
+                widget = ChangelistSelect(attrs=widget.attrs)
+            formfield.widget = widget
+            formfield.choices = list(formfield.choices)
+        return formfield
+
+
+class PostAdmin(LargeTableMixin, CsvExportMixin, IndexedSearchMixin,
+                admin.ModelAdmin):
     list_display = (
         'pk',
         'text',
@@ -12,9 +169,15 @@ class PostAdmin(admin.ModelAdmin):
         'group'
     )
     list_editable = ('group',)
+    list_select_related = ('author', 'group')
+    raw_id_fields = ('author',)
     search_fields = ('text',)
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
+    indexed_ids = staticmethod(search.post_ids)
+    export_fields = (
+        'pk', 'text', 'pub_date', 'author__username', 'group__slug', 'image'
+    )
 
 
 class GroupAdmin(admin.ModelAdmin):
@@ -29,7 +192,8 @@ class GroupAdmin(admin.ModelAdmin):
     empty_value_display = '-пусто-'
 
 
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(LargeTableMixin, CsvExportMixin, IndexedSearchMixin,
+                   admin.ModelAdmin):
     list_display = (
         'pk',
         'author',
@@ -37,9 +201,13 @@ class CommentAdmin(admin.ModelAdmin):
         'pub_date',
         'post',
     )
-    search_fields = ('author', 'text',)
+    list_select_related = ('author', 'post')
+    raw_id_fields = ('author', 'post')
+    search_fields = ('text',)
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
+    indexed_ids = staticmethod(search.comment_ids)
+    export_fields = ('pk', 'post', 'author__username', 'text', 'pub_date')
 
 
 class FollowAdmin(admin.ModelAdmin):
@@ -47,6 +215,8 @@ class FollowAdmin(admin.ModelAdmin):
         'user',
         'author',
     )
+    list_select_related = ('user', 'author')
+    raw_id_fields = ('user', 'author')
 
 
 admin.site.register(Group, GroupAdmin)
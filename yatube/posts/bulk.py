@@ -0,0 +1,205 @@
+"""
+Массовый импорт и экспорт постов.
+
+Посты читаются и пишутся потоком, по строке на пост в JSON Lines или
+CSV, поэтому память не зависит от размера файла. Импорт вставляет посты
+пачками через bulk_create мимо сигналов: счетчики меняются одним UPDATE
+на автора и группу в пачке, поисковый индекс строится по id пачки,
+а ленты подписок достраиваются после загрузки.
+"""
+import csv
+import json
+import os
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import counters, feeds, search, timeline
+from .feed_cache import bump_generation
+from .models import Follow, Group, Post, User
+
+FIELDS = ('id', 'text', 'pub_date', 'author', 'group', 'image')
+FORMATS = ('jsonl', 'csv')
+
+
+def detect_format(path):
+    return 'csv' if path.lower().endswith('.csv') else 'jsonl'
+
+
+def read_records(stream, fmt):
+    """Словари постов из потока, по одному."""
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def write_records(stream, fmt, records):
+    """Пишет словари постов в поток. Возвращает их число."""
+    total = 0
+    if fmt == 'csv':
+        writer = csv.DictWriter(stream, FIELDS)
+        writer.writeheader()
+        write = writer.writerow
+    else:
+        def write(record):
+            stream.write(json.dumps(record, ensure_ascii=False) + '\n')
+    for total, record in enumerate(records, 1):
+        write(record)
+    return total
+
+
+def export_records(posts, chunk_size=2000):
+    """Посты выборки в виде словарей, без создания моделей."""
+    rows = posts.order_by('pk').values_list(
+        'pk', 'text', 'pub_date', 'author__username', 'group__slug', 'image'
+    )
+    for pk, text, pub_date, author, group, image in rows.iterator(
+        chunk_size=chunk_size
+    ):
+        yield {
+            'id': pk,
+            'text': text,
+            'pub_date': pub_date.isoformat(),
+            'author': author,
+            'group': group or '',
+            'image': image or '',
+        }
+
+
+def _pub_date(value):
+    pub_date = parse_datetime(value or '')
+    if pub_date is None:
+        return timezone.now()
+    if timezone.is_naive(pub_date):
+        return timezone.make_aware(pub_date)
+    return pub_date
+
+
+def _insert(posts):
+    """
+    Вставляет посты и возвращает их id. PostgreSQL отдает id из
+    bulk_create. SQLite — нет, но пишет по одной транзакции за раз:
+    внутри нашей транзакции последние id таблицы — только что
+    вставленные посты, чужих между ними быть не может.
+
+    auto_now_add при вставке затирает даты из файла, поэтому они
+    возвращаются постам одним bulk_update.
+    """
+    dates = [post.pub_date for post in posts]
+    Post.objects.bulk_create(posts)
+    if all(post.pk is not None for post in posts):
+        pks = [post.pk for post in posts]
+    else:
+        pks = sorted(
+            Post.objects.order_by('-pk').values_list('pk', flat=True)[
+                :len(posts)
+            ]
+        )
+    for post, pk, pub_date in zip(posts, pks, dates):
+        post.pk = pk
+        post.pub_date = pub_date
+    Post.objects.bulk_update(posts, ['pub_date'])
+    return pks
+
+
+class Importer:
+    """
+    Загружает посты пачками по batch_size. Авторы и группы ищутся
+    по словарям username -> id и slug -> id, загруженным один раз.
+    Картинки из images_dir копируются в хранилище image_workers потоками.
+    """
+
+    def __init__(self, batch_size=1000, images_dir=None, image_workers=4,
+                 create_missing=False):
+        self.batch_size = batch_size
+        self.images_dir = images_dir
+        self.image_workers = image_workers
+        self.create_missing = create_missing
+        self.authors = dict(User.objects.values_list('username', 'pk'))
+        self.groups = dict(Group.objects.values_list('slug', 'pk'))
+        self.stats = Counter()
+        self.touched_authors = set()
+
+    def run(self, records):
+        """Загружает посты. Возвращает счетчик загруженных и пропущенных."""
+        records = iter(records)
+        with ThreadPoolExecutor(max_workers=self.image_workers) as executor:
+            batch = list(islice(records, self.batch_size))
+            while batch:
+                self.import_batch(batch, executor)
+                batch = list(islice(records, self.batch_size))
+        self.finish()
+        return self.stats
+
+    def import_batch(self, records, executor):
+        posts = [post for post in map(self.build, records) if post]
+        images = list(executor.map(
+            self.copy_image, [post.image.name for post in posts]
+        ))
+        for post, image in zip(posts, images):
+            if image is None:
+                self.stats['missing_images'] += 1
+            post.image = image or ''
+        if not posts:
+            return
+        with transaction.atomic():
+            pks = _insert(posts)
+            authors = Counter(post.author_id for post in posts)
+            for author_id, total in authors.items():
+                counters.change_user(author_id, 'post_count', total)
+            groups = Counter(post.group_id for post in posts)
+            for group_id, total in groups.items():
+                counters.change_group(group_id, total)
+        self.touched_authors.update(authors)
+        self.stats['imported'] += len(posts)
+        search.index_posts(Post.objects.filter(pk__in=pks), self.batch_size)
+
+    def build(self, record):
+        author_id = self.author_id(record.get('author'))
+        if not record.get('text') or author_id is None:
+            self.stats['skipped'] += 1
+            return None
+        return Post(
+            text=record['text'],
+            pub_date=_pub_date(record.get('pub_date')),
+            author_id=author_id,
+            group_id=self.group_id(record.get('group')),
+            image=record.get('image') or '',
+        )
+
+    def author_id(self, username):
+        if username and username not in self.authors and self.create_missing:
+            self.authors[username] = User.objects.create(username=username).pk
+        return self.authors.get(username)
+
+    def group_id(self, slug):
+        if slug and slug not in self.groups and self.create_missing:
+            self.groups[slug] = Group.objects.create(slug=slug, title=slug).pk
+        return self.groups.get(slug)
+
+    def copy_image(self, name):
+        if not name or not self.images_dir:
+            return name
+        source = os.path.join(self.images_dir, name)
+        if not os.path.isfile(source):
+            return None
+        with open(source, 'rb') as image:
+            return default_storage.save(name, File(image))
+
+    def finish(self):
+        """Добавляет новые посты в ленты подписок."""
+        for follow in Follow.objects.filter(
+            author_id__in=self.touched_authors, pull=False
+        ):
+            timeline.backfill(follow)
+        bump_generation()
+        feeds.touch_all()
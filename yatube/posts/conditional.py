@@ -0,0 +1,99 @@
+"""
+Условные GET-запросы для страниц поста, профиля и группы.
+
+ETag считается одним легким запросом до вызова представления:
+если клиент прислал совпадающий ETag, Django отвечает 304 без
+выборки ленты и отрисовки шаблона.
+
+ETag собирается только из состояния самого объекта (счетчики, имена,
+дата последнего изменения его постов), подписки читателя и
+пользователя: гость и вошедший получают разные страницы. Запись
+в другом месте сайта его не меняет. Last-Modified не отдается:
+одна дата не отражает подписки, имена и вход пользователя, и ответ
+на один If-Modified-Since был бы устаревшим 304.
+"""
+import hashlib
+
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.views.decorators.http import condition
+
+from .models import Comment, Follow, Group, Post, User
+
+
+def _latest(model, field, date_field='pub_date'):
+    """Подзапрос: самая поздняя date_field у записей model строки."""
+    return Subquery(
+        model.objects.filter(**{field: OuterRef('pk')})
+        .order_by(f'-{date_field}').values(date_field)[:1]
+    )
+
+
+def post_state(request, post_id):
+    row = Post.objects.filter(pk=post_id).annotate(
+        last_comment=_latest(Comment, 'post')
+    ).values_list(
+        'updated', 'last_comment', 'comment_count', 'group__title',
+        'author__first_name', 'author__last_name',
+        'author__stats__post_count',
+    ).first()
+    return row
+
+
+def profile_state(request, username):
+    users = User.objects.filter(username=username).annotate(
+        last_post=_latest(Post, 'author', 'updated')
+    )
+    fields = [
+        'last_post', 'first_name', 'last_name',
+        'stats__post_count', 'stats__follower_count',
+        'stats__following_count',
+    ]
+    if request.user.is_authenticated:
+        users = users.annotate(follow=Subquery(
+            Follow.objects.filter(
+                user=request.user, author=OuterRef('pk')
+            ).values('pk')[:1]
+        ))
+        fields.append('follow')
+    row = users.values_list(*fields).first()
+    return row
+
+
+def group_state(request, slug):
+    groups = Group.objects.filter(slug=slug).annotate(
+        last_post=_latest(Post, 'group', 'updated')
+    )
+    fields = ['last_post', 'title', 'description', 'post_count']
+    if request.user.is_authenticated:
+        # В ленте группы отмечены авторы, на которых подписан
+        # читатель: подписка и отписка меняют последний id и число.
+        follows = Follow.objects.filter(user=request.user).values('user')
+        groups = groups.annotate(
+            last_follow=Subquery(
+                follows.annotate(last=Max('pk')).values('last')
+            ),
+            follow_count=Subquery(
+                follows.annotate(total=Count('pk')).values('total')
+            ),
+        )
+        fields += ['last_follow', 'follow_count']
+    row = groups.values_list(*fields).first()
+    return row
+
+
+def _etag(request, view_name, values):
+    if values is None:
+        # Объекта нет: пусть представление само ответит 404.
+        return None
+    key = (view_name, values, request.user.pk)
+    return hashlib.sha1(repr(key).encode()).hexdigest()
+
+
+def conditional(state):
+    """
+    Декоратор представления: state(request, **kwargs) возвращает
+    значения для ETag или None.
+    """
+    return condition(etag_func=lambda request, **kwargs: _etag(
+        request, state.__name__, state(request, **kwargs)
+    ))
@@ -0,0 +1,85 @@
+"""
+Денормализованные счетчики постов, комментариев и подписок.
+
+Счетчики меняются атомарным UPDATE ... SET n = n + 1 из сигналов,
+поэтому попадают в ту же транзакцию, что и сама запись.
+Команда rebuild_counters пересчитывает их по исходным таблицам.
+"""
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Now
+
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+
+def change(queryset, field, delta, **values):
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gt': 0})
+    return queryset.update(**{field: F(field) + delta}, **values)
+
+
+def change_user(user_id, field, delta):
+    return change(UserStats.objects.filter(user_id=user_id), field, delta)
+
+
+def change_group(group_id, delta):
+    if group_id is None:
+        return 0
+    return change(Group.objects.filter(pk=group_id), 'post_count', delta)
+
+
+def change_post(post_id, delta):
+    return change(
+        Post.objects.filter(pk=post_id), 'comment_count', delta,
+        updated=Now(),
+    )
+
+
+def _count(model, field):
+    """Подзапрос: число строк model, у которых field ссылается на строку."""
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef('pk')}).order_by()
+            .values(field).annotate(total=Count('pk')).values('total'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def expected_counters():
+    """
+    Счетчики и их истинные значения: (модель, поле, выражение).
+    """
+    return (
+        (Post, 'comment_count', _count(Comment, 'post')),
+        (Group, 'post_count', _count(Post, 'group')),
+        (UserStats, 'post_count', _count(Post, 'author')),
+        (UserStats, 'comment_count', _count(Comment, 'author')),
+        (UserStats, 'follower_count', _count(Follow, 'author')),
+        (UserStats, 'following_count', _count(Follow, 'user')),
+    )
+
+
+def rebuild(check=False):
+    """
+    Сверяет счетчики с исходными таблицами и, если check=False,
+    исправляет расхождения. Возвращает число расхождений по каждому
+    счетчику.
+    """
+    missing = User.objects.filter(stats__isnull=True)
+    mismatches = {'UserStats.missing': missing.count()}
+    if not check:
+        UserStats.objects.bulk_create(
+            [UserStats(user=user) for user in missing.only('pk')],
+            ignore_conflicts=True,
+        )
+    for model, field, expected in expected_counters():
+        stale = model.objects.annotate(expected=expected).exclude(
+            **{field: F('expected')}
+        )
+        mismatches[f'{model.__name__}.{field}'] = stale.count()
+        if not check:
+            model.objects.filter(
+                pk__in=stale.values('pk')
+            ).update(**{field: expected})
+    return mismatches
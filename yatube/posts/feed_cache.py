@@ -0,0 +1,67 @@
+"""
+Версионный кэш отрисованных лент.
+
+Ключ фрагмента включает номер поколения, который увеличивается при
+любой записи в Post, Group или User. Старые фрагменты после этого
+просто перестают читаться, поэтому их можно хранить часами. Номер
+лежит в таблице FeedGeneration, поэтому запись в любом процессе,
+в том числе в management-команде, сбрасывает ленты во всех.
+"""
+import hashlib
+
+from django.conf import settings
+from django.db.models import F
+
+from .models import FeedGeneration
+from .paginator import decode_cursor
+
+
+def generation():
+    """
+    Текущее поколение — одно чтение строки из базы. В кэше его
+    не держим: процессы сервера и команды видят один и тот же номер.
+    """
+    value = FeedGeneration.objects.filter(pk=1).values_list(
+        'value', flat=True
+    ).first()
+    return value or 0
+
+
+def bump_generation():
+    if not FeedGeneration.objects.filter(pk=1).update(value=F('value') + 1):
+        FeedGeneration.objects.get_or_create(pk=1, defaults={'value': 1})
+
+
+def _position(request):
+    """
+    Страница ленты из ?cursor= или ?page=. Сырой параметр в ключ
+    не попадает: поврежденный курсор — это первая страница, как и
+    у паджинатора, а номер приводится к числу.
+    """
+    cursor = request.GET.get('cursor')
+    if cursor:
+        decoded = decode_cursor(cursor)
+        if decoded is not None:
+            return repr(decoded)
+    # Номер страницы; у паджинатора «горячего» им служит и курсор.
+    try:
+        return str(max(int(cursor or request.GET.get('page') or 1), 1))
+    except ValueError:
+        return '1'
+
+
+def feed_cache(request, view_name, *parts):
+    """
+    Контекст для {% cache feed_cache_timeout ... feed_cache_key %}:
+    ключ зависит от ленты, страницы и текущего поколения.
+    Тот же ключ служит для кэша строк страницы в pagination().
+    Части ключа хэшируются: в них бывают имена пользователей
+    с любыми символами.
+    """
+    position = _position(request)
+    name = ':'.join(map(str, (view_name, *parts, position)))
+    key = f'{hashlib.md5(name.encode()).hexdigest()}:{generation()}'
+    return {
+        'feed_cache_key': key,
+        'feed_cache_timeout': settings.FEED_CACHE_TIMEOUT,
+    }
@@ -0,0 +1,178 @@
+"""
+Atom-ленты сайта, групп и авторов.
+
+Готовый документ ленты хранится в кэше вместе с ETag и Last-Modified.
+Ключ документа включает версию ленты, а версию меняют сигналы, когда
+у группы или автора появляется новый пост (или пост правят и удаляют),
+а после массовой загрузки постов — у всех лент сразу. Версии лежат
+в таблице FeedVersion, а не в кэше: запись в одном процессе сервера
+или в команде сбрасывает документ во всех. Поэтому опрос ленты —
+один запрос версий и чтение кэша, а клиент с актуальной копией
+получает 304.
+"""
+import hashlib
+
+from django.conf import settings
+from django.contrib.syndication.views import Feed
+from django.core.cache import cache
+from django.db.models import F, Q
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.feedgenerator import Atom1Feed
+from django.utils.http import parse_http_date_safe
+
+from core.routers import use_primary
+
+from .models import FeedVersion, Group, Post, User
+
+SITE = 'site'
+GROUP = 'group'
+AUTHOR = 'author'
+# Версия всех лент сразу — для массовой загрузки мимо сигналов.
+EVERY = 'every'
+
+
+def _versions(kind, name):
+    """Версии всех лент сразу и ленты kind/name — одним запросом."""
+    versions = dict(FeedVersion.objects.filter(
+        Q(kind=EVERY, name='') | Q(kind=kind, name=name)
+    ).values_list('kind', 'version'))
+    return versions.get(EVERY, 0), versions.get(kind, 0)
+
+
+def touch(kind, name=''):
+    """Новая версия ленты: старый документ больше не читается."""
+    versions = FeedVersion.objects.filter(kind=kind, name=name)
+    if not versions.update(version=F('version') + 1):
+        _, created = versions.get_or_create(
+            kind=kind, name=name, defaults={'version': 1}
+        )
+        if not created:
+            versions.update(version=F('version') + 1)
+
+
+def touch_all():
+    touch(EVERY)
+
+
+def touch_post(post):
+    """Обновляет ленты, в которые попадает пост."""
+    touch(SITE)
+    touch(AUTHOR, post.author.username)
+    if post.group is not None:
+        touch(GROUP, post.group.slug)
+
+
+class PostFeed(Feed):
+    feed_type = Atom1Feed
+
+    def items(self, obj):
+        return self.posts(obj).for_feed()[:settings.ATOM_FEED_ITEMS]
+
+    def posts(self, obj):
+        return Post.objects.all()
+
+    def item_title(self, item):
+        return item.text[:50]
+
+    def item_description(self, item):
+        return item.text
+
+    def item_link(self, item):
+        return reverse('posts:post_detail', args=[item.pk])
+
+    def item_author_name(self, item):
+        return item.author.get_full_name() or item.author.username
+
+    def item_pubdate(self, item):
+        return item.pub_date
+
+
+class SiteFeed(PostFeed):
+    title = 'Yatube: последние записи'
+    subtitle = 'Новые посты всех авторов'
+
+    def link(self):
+        return reverse('posts:index')
+
+
+class GroupFeed(PostFeed):
+    def get_object(self, request, slug):
+        return get_object_or_404(Group, slug=slug)
+
+    def posts(self, group):
+        return group.posts.all()
+
+    def title(self, group):
+        return f'Yatube: {group.title}'
+
+    def subtitle(self, group):
+        return group.description or ''
+
+    def link(self, group):
+        return reverse('posts:group_list', args=[group.slug])
+
+
+class AuthorFeed(PostFeed):
+    def get_object(self, request, username):
+        return get_object_or_404(User, username=username)
+
+    def posts(self, author):
+        return author.posts.all()
+
+    def title(self, author):
+        return f'Yatube: {author.get_full_name() or author.username}'
+
+    def link(self, author):
+        return reverse('posts:profile', args=[author.username])
+
+
+def _document(feed, kind, request, name):
+    """
+    Документ ленты из кэша; собирается заново после смены версии.
+    Ссылки в документе абсолютные, поэтому в ключе — схема и хост.
+    """
+    every, own = _versions(kind, name)
+    key = (
+        f'posts:atom:{request.scheme}:{request.get_host()}:{kind}:{name}:'
+        f'{every}:{own}'
+    )
+    document = cache.get(key)
+    if document is None:
+        # Документ кэшируется для всех — читаем из основной базы.
+        with use_primary():
+            response = feed(request, *([name] if name else []))
+        content = response.content
+        document = {
+            'content': content,
+            'content_type': response['Content-Type'],
+            'last_modified': response.get('Last-Modified'),
+            'etag': '"%s"' % hashlib.sha1(content).hexdigest(),
+        }
+        cache.set(key, document, settings.FEED_CACHE_TIMEOUT)
+    return document
+
+
+def serve(feed, kind, request, name=''):
+    document = _document(feed, kind, request, name)
+    last_modified = document['last_modified']
+    response = get_conditional_response(
+        request,
+        etag=document['etag'],
+        last_modified=last_modified and parse_http_date_safe(last_modified),
+    )
+    if response is None:
+        response = HttpResponse(
+            document['content'], content_type=document['content_type']
+        )
+    response['ETag'] = document['etag']
+    if last_modified:
+        response['Last-Modified'] = last_modified
+    return response
+
+
+site_feed = SiteFeed()
+group_feed = GroupFeed()
+author_feed = AuthorFeed()
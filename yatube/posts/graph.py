@@ -0,0 +1,143 @@
+"""
+Граф подписок.
+
+Для каждого пользователя в кэше лежат множества id авторов, на которых
+он подписан, и взаимных подписок; сигналы Follow сбрасывают их у обеих
+сторон. Поэтому проверка «на кого из этих авторов подписан читатель»
+для целой страницы ленты или списка подписок — одно чтение кэша, а не
+запрос на каждого автора. Отметки могут отставать на
+GRAPH_CACHE_TIMEOUT, если кэш не общий; кнопка подписки в профиле
+проверяется по базе.
+Подписчиков у популярного автора слишком много для кэша — их списки
+листаются по индексу. Рекомендации «возможно, вы знакомы» считает
+заранее rebuild_suggestions() (команда rebuild_suggestions).
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+
+from core.cache import get_or_compute
+
+from .models import Follow, Suggestion
+
+
+def _following_key(user_id):
+    return f'posts:graph:following:{user_id}'
+
+
+def _mutual_key(user_id):
+    return f'posts:graph:mutual:{user_id}'
+
+
+def following_ids(user_id):
+    """Id авторов, на которых подписан пользователь."""
+    return get_or_compute(
+        _following_key(user_id),
+        lambda: frozenset(
+            Follow.objects.filter(user_id=user_id).values_list(
+                'author_id', flat=True
+            )
+        ),
+        settings.GRAPH_CACHE_TIMEOUT,
+    )
+
+
+def mutual_ids(user_id):
+    """Id пользователей, с которыми подписка взаимная."""
+    return get_or_compute(
+        _mutual_key(user_id),
+        lambda: frozenset(
+            Follow.objects.filter(
+                author_id=user_id, user__following__user_id=user_id
+            ).values_list('user_id', flat=True)
+        ),
+        settings.GRAPH_CACHE_TIMEOUT,
+    )
+
+
+def followed_among(user, author_ids):
+    """На кого из author_ids подписан user — одним чтением кэша."""
+    if not user.is_authenticated:
+        return frozenset()
+    return following_ids(user.pk).intersection(author_ids)
+
+
+def is_following(user, author_id):
+    """
+    Точная проверка по базе — для кнопки подписки. Кэш графа
+    в памяти процесса сбрасывается только там, где прошла подписка,
+    и в других процессах отстает до GRAPH_CACHE_TIMEOUT.
+    """
+    return user.is_authenticated and Follow.objects.filter(
+        user=user, author_id=author_id
+    ).exists()
+
+
+def forget(follow):
+    """Сбрасывает кэш обеих сторон подписки."""
+    cache.delete_many([
+        _following_key(follow.user_id),
+        _mutual_key(follow.user_id),
+        _mutual_key(follow.author_id),
+    ])
+
+
+def followers(user):
+    """Подписки на пользователя, новые первыми."""
+    return Follow.objects.filter(author=user).select_related('user')
+
+
+def following(user):
+    """Подписки пользователя, новые первыми."""
+    return Follow.objects.filter(user=user).select_related('author')
+
+
+def suggestions(user, limit=None):
+    """
+    Рекомендованные авторы, лучшие первыми. Те, на кого пользователь
+    подписался после пересчета, пропускаются.
+    """
+    return Suggestion.objects.filter(user=user).exclude(
+        author__following__user=user
+    ).select_related('author').order_by(
+        '-score'
+    )[:limit or settings.SUGGESTIONS_PER_USER]
+
+
+def candidates(user_id):
+    """
+    Друзья друзей: авторы, на которых подписаны авторы пользователя,
+    кроме него самого и тех, на кого он уже подписан.
+    """
+    return Follow.objects.filter(
+        user__following__user_id=user_id
+    ).exclude(author_id=user_id).exclude(
+        author__following__user_id=user_id
+    ).values('author_id').annotate(score=Count('pk')).order_by(
+        '-score', 'author_id'
+    )[:settings.SUGGESTIONS_PER_USER]
+
+
+def rebuild_suggestions():
+    """Пересчитывает рекомендации всех, у кого есть подписки."""
+    readers = Follow.objects.values('user_id')
+    Suggestion.objects.exclude(user_id__in=readers).delete()
+    users = list(
+        readers.order_by('user_id').values_list('user_id', flat=True)
+        .distinct()
+    )
+    total = 0
+    for user_id in users:
+        rows = [
+            Suggestion(
+                user_id=user_id, author_id=row['author_id'],
+                score=row['score'],
+            )
+            for row in candidates(user_id)
+        ]
+        with transaction.atomic():
+            Suggestion.objects.filter(user_id=user_id).delete()
+            Suggestion.objects.bulk_create(rows)
+        total += len(rows)
+    return total
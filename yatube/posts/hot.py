@@ -0,0 +1,103 @@
+"""
+Лента «горячего».
+
+Рейтинг поста — число комментариев за последние HOT_WINDOW_HOURS часов
+плюс логарифм числа подписчиков автора, поделенные на
+(возраст в часах + 2) ** HOT_GRAVITY. Считать его при каждом запросе
+дорого, поэтому rebuild() раз в несколько минут (команда
+rebuild_hot_posts) записывает HOT_SIZE лучших постов в таблицу HotPost,
+а лента читает страницу диапазоном по ее первичному ключу.
+"""
+import heapq
+import math
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .models import Comment, HotPost, Post
+from .paginator import CursorPaginator
+
+
+def score(comments, followers, age_hours):
+    return (comments + math.log1p(followers)) / (
+        max(age_hours, 0) + 2
+    ) ** settings.HOT_GRAVITY
+
+
+def version():
+    """
+    Номер последней пересборки — часть ключа кэша ленты. Берется
+    из таблицы, а не из кэша: rebuild_hot_posts работает в отдельном
+    процессе, а локальный кэш у каждого процесса свой.
+    """
+    rebuilt_at = HotPost.objects.filter(rank=1).values_list(
+        'rebuilt_at', flat=True
+    ).first()
+    return int(rebuilt_at.timestamp() * 10 ** 6) if rebuilt_at else 0
+
+
+def rebuild(now=None):
+    """Пересчитывает рейтинг и заменяет содержимое HotPost."""
+    now = now or timezone.now()
+    since = now - timedelta(hours=settings.HOT_WINDOW_HOURS)
+    recent = Comment.objects.filter(pub_date__gte=since).order_by()
+    comments = dict(
+        recent.values_list('post').annotate(total=Count('pk'))
+    )
+    candidates = Post.objects.filter(
+        Q(pub_date__gte=since) | Q(pk__in=recent.values('post'))
+    ).order_by().values_list(
+        'pk', 'pub_date', 'author__stats__follower_count'
+    )
+    top = heapq.nlargest(
+        settings.HOT_SIZE,
+        (
+            (
+                score(
+                    comments.get(pk, 0), followers or 0,
+                    (now - pub_date).total_seconds() / 3600,
+                ),
+                pk,
+            )
+            for pk, pub_date, followers in candidates.iterator()
+        ),
+    )
+    rebuilt_at = timezone.now()
+    with transaction.atomic():
+        HotPost.objects.all().delete()
+        HotPost.objects.bulk_create(
+            HotPost(rank=rank, post_id=pk, score=value, rebuilt_at=rebuilt_at)
+            for rank, (value, pk) in enumerate(top, 1)
+        )
+    return len(top)
+
+
+class HotPaginator(CursorPaginator):
+    """
+    Паджинатор ленты «горячего»: страница N — посты с rank от
+    (N - 1) * per_page + 1, одна выборка по первичному ключу HotPost.
+    Курсор — просто номер страницы.
+    """
+
+    def get_ordering(self):
+        return ['hot_rank__rank']
+
+    def fetch_page(self, number):
+        number = self.page_number(number)
+        bottom = self.page_bottom(number)
+        if bottom is None:
+            # Дальше любого места в рейтинге — пустая страница.
+            return [], number, False
+        rows = list(self.object_list.filter(
+            hot_rank__rank__gt=bottom
+        )[:self.per_page + 1])
+        return rows[:self.per_page], number, len(rows) > self.per_page
+
+    def fetch_cursor(self, token):
+        return self.fetch_page(token)
+
+    def _cursor(self, row, number, direction=None):
+        return number
@@ -0,0 +1,232 @@
+import json
+import subprocess
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.urls import reverse
+from django.utils import timezone
+
+from core import benchmark
+from core.benchmark import Scenario
+from posts.models import Group, User
+from posts.urls import urlpatterns
+
+SAMPLE = 20
+WRITES = ('post_create', 'add_comment', 'profile_follow', 'profile_unfollow')
+COLUMNS = (
+    'p50', 'p95', 'p99', 'ttfb_p95', 'rps', 'queries', 'errors'
+)
+
+
+def _urls(name, values, key):
+    return [reverse(f'posts:{name}', kwargs={key: value}) for value in values]
+
+
+def _api_urls(name, values, key):
+    return [
+        reverse(f'api:v1:{name}', kwargs={key: value}) for value in values
+    ]
+
+
+def scenarios(prefix):
+    """
+    Сценарии для всех адресов posts/urls.py на данных seed_posts
+    и для чтения тех же данных через API — для сравнения с HTML.
+    """
+    users = list(
+        User.objects.filter(username__startswith=f'{prefix}-user-')
+        .order_by('pk')[:SAMPLE]
+    )
+    if len(users) < 2 or not users[0].posts.exists():
+        raise CommandError(
+            f'Нет данных с префиксом {prefix}: запустите seed_posts.'
+        )
+    author, reader = users[0], users[1]
+    names = [user.username for user in users]
+    posts = list(author.posts.values_list('pk', flat=True)[:SAMPLE])
+    groups = Group.objects.filter(slug__startswith=f'{prefix}-group-')
+    slugs = list(groups.values_list('slug', flat=True)[:SAMPLE])
+    return [
+        Scenario('index', paths=['/', '/?page=2', '/?page=50']),
+        Scenario('group_list', paths=_urls('group_list', slugs, 'slug')),
+        Scenario('profile', paths=_urls('profile', names, 'username')),
+        Scenario('feed', paths=[reverse('posts:feed')]),
+        Scenario('group_feed', paths=_urls('group_feed', slugs, 'slug')),
+        Scenario(
+            'profile_feed', paths=_urls('profile_feed', names, 'username')
+        ),
+        Scenario('followers', paths=_urls('followers', names, 'username')),
+        Scenario('following', paths=_urls('following', names, 'username')),
+        Scenario('post_detail', paths=_urls('post_detail', posts, 'post_id')),
+        Scenario(
+            'post_comments', paths=_urls('post_comments', posts, 'post_id')
+        ),
+        Scenario(
+            'post_edit', paths=_urls('post_edit', posts, 'post_id'),
+            user=author,
+        ),
+        Scenario('hot', paths=[
+            reverse('posts:hot'), f'{reverse("posts:hot")}?page=2'
+        ]),
+        Scenario('search', paths=[
+            f'{reverse("posts:search")}?q={query}'
+            for query in ('котик', 'красивый вечер', 'поезд море горы')
+        ]),
+        Scenario(
+            'follow_index', paths=[reverse('posts:follow_index')],
+            user=reader,
+        ),
+        Scenario(
+            'post_create', 'post', [reverse('posts:post_create')],
+            {'text': 'Пост из нагрузочного прогона'}, reader,
+        ),
+        Scenario(
+            'add_comment', 'post', _urls('add_comment', posts, 'post_id'),
+            {'text': 'Комментарий из нагрузочного прогона'}, reader,
+        ),
+        Scenario(
+            'profile_follow',
+            paths=_urls('profile_follow', names[2:], 'username'),
+            user=reader,
+        ),
+        Scenario(
+            'profile_unfollow',
+            paths=_urls('profile_unfollow', names[2:], 'username'),
+            user=reader,
+        ),
+        Scenario('api:post_list', paths=[
+            reverse('api:v1:post_list'),
+            f'{reverse("api:v1:post_list")}?page=2',
+        ]),
+        Scenario(
+            'api:group_posts', paths=_api_urls('group_posts', slugs, 'slug')
+        ),
+        Scenario(
+            'api:profile_posts',
+            paths=_api_urls('profile_posts', names, 'username'),
+        ),
+        Scenario(
+            'api:post_detail', paths=_api_urls('post_detail', posts, 'post_id')
+        ),
+        Scenario('api:post_batch', paths=[
+            f'{reverse("api:v1:post_batch")}?ids={",".join(map(str, posts))}'
+        ]),
+        Scenario(
+            'api:post_comments',
+            paths=_api_urls('post_comments', posts, 'post_id'),
+        ),
+        Scenario('api:hot', paths=[reverse('api:v1:hot')]),
+        Scenario(
+            'api:follow_feed', paths=[reverse('api:v1:follow_feed')],
+            user=reader,
+        ),
+    ]
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный прогон всех страниц posts: перцентили времени ответа, '
+        'RPS и число SQL-запросов на страницу.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prefix', default='bench')
+        parser.add_argument('--requests', type=int, default=100)
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument(
+            '--only', nargs='+', metavar='NAME',
+            help='Прогнать только эти адреса.',
+        )
+        parser.add_argument(
+            '--skip-writes', action='store_true',
+            help='Не прогонять адреса, изменяющие данные.',
+        )
+        parser.add_argument(
+            '--mixed', action='store_true',
+            help='Прогнать адреса одновременно, а не по очереди: '
+                 'пропускная способность чтения при параллельной записи.',
+        )
+        parser.add_argument('--output', help='Сохранить результат в JSON.')
+        parser.add_argument(
+            '--compare', metavar='JSON',
+            help='Сравнить с сохраненным прогоном.',
+        )
+        parser.add_argument(
+            '--tolerance', type=float, default=20,
+            help='Допустимое ухудшение p95 и числа запросов, в процентах.',
+        )
+
+    def selected(self, options):
+        selected = scenarios(options['prefix'])
+        missing = {
+            pattern.name for pattern in urlpatterns
+        } - {scenario.name for scenario in selected}
+        if missing:
+            raise CommandError(f'Нет сценариев для: {", ".join(missing)}')
+        if options['only']:
+            selected = [s for s in selected if s.name in options['only']]
+        if options['skip_writes']:
+            selected = [s for s in selected if s.name not in WRITES]
+        return selected
+
+    def report(self, results):
+        self.stdout.write(
+            f'{"view":<18}' + ''.join(f'{column:>10}' for column in COLUMNS)
+        )
+        for name, summary in results.items():
+            self.stdout.write(f'{name:<18}' + ''.join(
+                f'{summary[column]:>10}' for column in COLUMNS
+            ))
+
+    def check_regressions(self, results, path, tolerance):
+        with open(path) as baseline_file:
+            baseline = json.load(baseline_file)['results']
+        regressions = [
+            (metric, *regression)
+            for metric in ('p95', 'queries')
+            for regression in benchmark.compare(
+                results, baseline, tolerance, metric
+            )
+        ]
+        for metric, name, before, after in regressions:
+            self.stderr.write(f'{name}: {metric} {before} -> {after}')
+        if regressions:
+            raise CommandError('Прогон хуже базового.')
+        self.stdout.write(self.style.SUCCESS('Регрессий нет.'))
+
+    def handle(self, *args, **options):
+        run = benchmark.run_mixed if options['mixed'] else benchmark.run
+        results = run(
+            self.selected(options),
+            requests=options['requests'],
+            concurrency=options['concurrency'],
+            warmup=options['warmup'],
+        )
+        self.report(results)
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump({
+                    'commit': _commit(),
+                    'created': timezone.now().isoformat(),
+                    'database': connection.vendor,
+                    'database_options': connection.settings_dict['OPTIONS'],
+                    'mixed': options['mixed'],
+                    'requests': options['requests'],
+                    'concurrency': options['concurrency'],
+                    'results': results,
+                }, output, ensure_ascii=False, indent=2)
+        if options['compare']:
+            self.check_regressions(
+                results, options['compare'], options['tolerance']
+            )
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from posts import bulk
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Выгружает посты в JSON Lines или CSV.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default='-',
+            help='Файл для выгрузки, по умолчанию stdout.',
+        )
+        parser.add_argument('--format', choices=bulk.FORMATS)
+        parser.add_argument('--author', help='Только посты этого автора.')
+        parser.add_argument('--group', help='Только посты этой группы.')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        posts = Post.objects.all()
+        if options['author']:
+            posts = posts.filter(author__username=options['author'])
+        if options['group']:
+            posts = posts.filter(group__slug=options['group'])
+        path = options['path']
+        fmt = options['format'] or bulk.detect_format(path)
+        records = bulk.export_records(posts, options['chunk_size'])
+        if path == '-':
+            total = bulk.write_records(self.stdout, fmt, records)
+        else:
+            with open(path, 'w', newline='', encoding='utf-8') as output:
+                total = bulk.write_records(output, fmt, records)
+        self.stderr.write(f'Выгружено постов: {total}')
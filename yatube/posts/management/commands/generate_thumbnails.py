@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from posts.feed_cache import bump_generation
+from posts.models import Post
+from posts.thumbnails import generate_thumbnails, touch_posts
+
+
+class Command(BaseCommand):
+    help = 'Создает миниатюры для картинок уже опубликованных постов.'
+
+    def handle(self, *args, **options):
+        images = Post.objects.exclude(image='').values_list(
+            'image', flat=True
+        )
+        total = 0
+        for image_name in images.iterator():
+            try:
+                generate_thumbnails(image_name)
+            except Exception as error:
+                self.stderr.write(f'{image_name}: {error}')
+                continue
+            touch_posts(image_name)
+            total += 1
+        # Закэшированные ленты еще показывают заглушки.
+        bump_generation()
+        self.stdout.write(self.style.SUCCESS(f'Обработано картинок: {total}'))
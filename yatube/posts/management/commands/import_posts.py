@@ -0,0 +1,47 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from posts import bulk
+
+
+class Command(BaseCommand):
+    help = 'Загружает посты из JSON Lines или CSV.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', help='Файл с постами, «-» — читать из stdin.'
+        )
+        parser.add_argument('--format', choices=bulk.FORMATS)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--images-dir',
+            help='Каталог, из которого копируются картинки постов.',
+        )
+        parser.add_argument('--image-workers', type=int, default=4)
+        parser.add_argument(
+            '--create-missing', action='store_true',
+            help='Создавать неизвестных авторов и группы.',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        importer = bulk.Importer(
+            batch_size=options['batch_size'],
+            images_dir=options['images_dir'],
+            image_workers=options['image_workers'],
+            create_missing=options['create_missing'],
+        )
+        fmt = options['format'] or bulk.detect_format(path)
+        if path == '-':
+            stats = importer.run(bulk.read_records(sys.stdin, fmt))
+        else:
+            with open(path, newline='', encoding='utf-8') as source:
+                stats = importer.run(bulk.read_records(source, fmt))
+        for key in ('imported', 'skipped', 'missing_images'):
+            self.stdout.write(f'{key}: {stats[key]}')
+        if options['images_dir']:
+            self.stdout.write(
+                'Миниатюры новых картинок: manage.py generate_thumbnails'
+            )
+        self.stdout.write(self.style.SUCCESS('Посты загружены.'))
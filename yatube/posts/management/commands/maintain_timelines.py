@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import timeline
+
+
+class Command(BaseCommand):
+    help = 'Обрезает ленты подписок и возвращает рассылку авторам.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=0,
+            help='Повторять обслуживание раз в столько секунд.',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            trimmed, switched = timeline.maintain()
+            self.stdout.write(
+                f'Обрезано лент: {trimmed}. '
+                f'Авторов снова с рассылкой: {switched}.'
+            )
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счетчики постов, комментариев и подписок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только сверить счетчики, ничего не исправляя.',
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            mismatches = counters.rebuild(check=options['check'])
+        for counter, stale in mismatches.items():
+            self.stdout.write(f'{counter}: {stale}')
+        if options['check'] and any(mismatches.values()):
+            raise CommandError('Счетчики расходятся с данными.')
+        if not options['check']:
+            self.stdout.write(self.style.SUCCESS('Счетчики пересчитаны.'))
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import hot
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает рейтинг ленты «горячего».'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=0,
+            help='Повторять пересчет раз в столько секунд.',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            ranked = hot.rebuild()
+            self.stdout.write(f'В рейтинге постов: {ranked}.')
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
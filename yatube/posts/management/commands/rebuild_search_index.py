@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = 'Строит поисковый индекс постов и комментариев заново.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько записей индекса вставлять за один запрос.',
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            total = search.rebuild(options['batch_size'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Поисковый индекс построен: {total} записей.')
+        )
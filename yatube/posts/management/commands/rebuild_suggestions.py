@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import graph
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает рекомендации «возможно, вы знакомы».'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=0,
+            help='Повторять пересчет раз в столько секунд.',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            total = graph.rebuild_suggestions()
+            self.stdout.write(f'Рекомендаций: {total}.')
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from posts import seed
+from posts.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу пользователями, группами, постами, комментариями '
+        'и подписками для нагрузочных прогонов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--groups', type=int, default=10)
+        parser.add_argument('--posts', type=int, default=5000)
+        parser.add_argument('--comments', type=int, default=10000)
+        parser.add_argument(
+            '--follows', type=int, default=20,
+            help='Сколько раз каждый пользователь выбирает автора.',
+        )
+        parser.add_argument(
+            '--images', type=float, default=0.1,
+            help='Доля постов с картинкой.',
+        )
+        parser.add_argument(
+            '--prefix', default='bench',
+            help='Префикс имен пользователей и адресов групп.',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        if options['users'] < 2:
+            raise CommandError('Нужно хотя бы два пользователя.')
+        if User.objects.filter(username__startswith=f'{prefix}-').exists():
+            raise CommandError(
+                f'Данные с префиксом {prefix} уже есть, выберите другой.'
+            )
+        with transaction.atomic():
+            created = seed.seed(
+                users=options['users'],
+                groups=options['groups'],
+                posts=options['posts'],
+                comments=options['comments'],
+                follows=options['follows'],
+                images=options['images'],
+                prefix=prefix,
+                random_seed=options['seed'],
+            )
+        for kind, total in created.items():
+            self.stdout.write(f'{kind}: {total}')
+        self.stdout.write(self.style.SUCCESS('Данные созданы.'))
@@ -0,0 +1,166 @@
+# Generated by Django 2.2.16 on 2026-10-17 06:26
+
+import re
+from collections import Counter
+from itertools import chain
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Копия posts.search и posts.stemmer на момент миграции: индекс
+# заполняется так, как его строил код этой версии, и миграция не
+# меняется вместе с живым модулем.
+
+WORD = re.compile(r'\w+')
+SATURATION = 1.2
+COMMENT_WEIGHT = 0.5
+TERM_MAX_LENGTH = 64
+
+STOP_WORDS = frozenset((
+    'а', 'без', 'бы', 'был', 'была', 'были', 'было', 'быть', 'в', 'вам',
+    'вас', 'во', 'вот', 'все', 'всё', 'вы', 'да', 'для', 'до', 'его', 'ее',
+    'её', 'если', 'есть', 'еще', 'ещё', 'же', 'за', 'и', 'из', 'или', 'им',
+    'их', 'к', 'как', 'ко', 'когда', 'ли', 'мне', 'мы', 'на', 'над', 'не',
+    'нет', 'ни', 'но', 'ну', 'о', 'об', 'он', 'она', 'они', 'оно', 'от',
+    'по', 'под', 'при', 'с', 'со', 'так', 'там', 'то', 'тоже', 'только',
+    'ты', 'у', 'уже', 'что', 'чтобы', 'это', 'я',
+))
+
+VOWELS = 'аеиоуыэюя'
+
+PERFECTIVE_GERUND = re.compile(
+    r'(?:(?<=[ая])(?:в|вши|вшись)|ив|ивши|ившись|ыв|ывши|ывшись)$'
+)
+ADJECTIVE = (
+    r'(?:ее|ие|ые|ое|ими|ыми|ей|ий|ый|ой|ем|им|ым|ом|его|ого|ему|ому'
+    r'|их|ых|ую|юю|ая|яя|ою|ею)'
+)
+PARTICIPLE = r'(?:(?<=[ая])(?:ем|нн|вш|ющ|щ)|ивш|ывш|ующ)'
+ADJECTIVAL = re.compile(f'{PARTICIPLE}?{ADJECTIVE}$')
+REFLEXIVE = re.compile(r'(?:ся|сь)$')
+VERB = re.compile(
+    r'(?:(?<=[ая])(?:ла|на|ете|йте|ли|й|л|ем|н|ло|но|ет|ют|ны|ть|ешь|нно)'
+    r'|ила|ыла|ена|ейте|уйте|ите|или|ыли|ей|уй|ил|ыл|им|ым|ен|ило|ыло'
+    r'|ено|ят|ует|уют|ит|ыт|ены|ить|ыть|ишь|ую|ю)$'
+)
+NOUN = re.compile(
+    r'(?:а|ев|ов|ие|ье|е|иями|ями|ами|еи|ии|и|ией|ей|ой|ий|й|иям|ям'
+    r'|ием|ем|ам|ом|о|у|ах|иях|ях|ы|ь|ию|ью|ю|ия|ья|я)$'
+)
+SUPERLATIVE = re.compile(r'(?:ейше|ейш)$')
+DERIVATIONAL = re.compile(r'(?:ост|ость)$')
+
+
+def _region_start(word, start):
+    """Начало области после первой согласной, идущей за гласной."""
+    for i in range(start + 1, len(word)):
+        if word[i - 1] in VOWELS and word[i] not in VOWELS:
+            return i + 1
+    return len(word)
+
+
+def stem(word):
+    word = word.lower().replace('ё', 'е')
+    rv_start = next(
+        (i + 1 for i, letter in enumerate(word) if letter in VOWELS), None
+    )
+    if rv_start is None:
+        return word
+    r2_start = _region_start(word, _region_start(word, 0))
+    prefix, rv = word[:rv_start], word[rv_start:]
+
+    match = PERFECTIVE_GERUND.search(rv)
+    if match:
+        rv = rv[:match.start()]
+    else:
+        rv = REFLEXIVE.sub('', rv)
+        for pattern in (ADJECTIVAL, VERB, NOUN):
+            match = pattern.search(rv)
+            if match:
+                rv = rv[:match.start()]
+                break
+
+    if rv.endswith('и'):
+        rv = rv[:-1]
+
+    match = DERIVATIONAL.search(rv)
+    if match and rv_start + match.start() >= r2_start:
+        rv = rv[:match.start()]
+
+    match = SUPERLATIVE.search(rv)
+    if match:
+        rv = rv[:match.start()]
+    if rv.endswith('нн'):
+        rv = rv[:-1]
+    elif not match and rv.endswith('ь'):
+        rv = rv[:-1]
+    return prefix + rv
+
+
+def terms(text):
+    return [
+        stem(word)[:TERM_MAX_LENGTH]
+        for word in WORD.findall(text.lower())
+        if word not in STOP_WORDS and not word.isdigit()
+    ]
+
+
+def fill_index(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    SearchEntry = apps.get_model('posts', 'SearchEntry')
+
+    documents = chain(
+        (
+            (post.text, post.pk, None, 1.0)
+            for post in Post.objects.only('text').iterator()
+        ),
+        (
+            (comment.text, comment.post_id, comment.pk, COMMENT_WEIGHT)
+            for comment in Comment.objects.only('text', 'post').iterator()
+        ),
+    )
+    batch = []
+    for text, post_id, comment_id, factor in documents:
+        batch.extend(
+            SearchEntry(
+                term=term,
+                post_id=post_id,
+                comment_id=comment_id,
+                weight=factor * count / (count + SATURATION),
+            )
+            for term, count in Counter(terms(text)).items()
+        )
+        if len(batch) >= 1000:
+            SearchEntry.objects.bulk_create(batch)
+            batch = []
+    SearchEntry.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0004_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64, verbose_name='Основа слова')),
+                ('weight', models.FloatField(verbose_name='Вес')),
+                ('comment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='search_entries', to='posts.Comment', verbose_name='Комментарий')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_entries', to='posts.Post', verbose_name='Пост')),
+            ],
+            options={
+                'verbose_name': 'Запись поискового индекса',
+                'verbose_name_plural': 'Записи поискового индекса',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='searchentry',
+            index=models.Index(fields=['term', 'post', 'comment'], name='search_term_idx'),
+        ),
+        migrations.RunPython(fill_index, migrations.RunPython.noop),
+    ]
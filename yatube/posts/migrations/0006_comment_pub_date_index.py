@@ -0,0 +1,21 @@
+# Generated by Django 2.2.16 on 2026-10-17 06:53
+
+from django.db import migrations, models
+
+from core.operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY нельзя выполнять внутри транзакции.
+    atomic = False
+
+    dependencies = [
+        ('posts', '0005_search_index'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='comment',
+            index=models.Index(fields=['pub_date', 'id'], name='comment_pub_date_idx'),
+        ),
+    ]
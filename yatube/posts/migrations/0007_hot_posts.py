@@ -0,0 +1,26 @@
+# Generated by Django 2.2.16 on 2026-10-17 07:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0006_comment_pub_date_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HotPost',
+            fields=[
+                ('rank', models.PositiveIntegerField(primary_key=True, serialize=False, verbose_name='Место')),
+                ('score', models.FloatField(verbose_name='Рейтинг')),
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='hot_rank', to='posts.Post', verbose_name='Пост')),
+            ],
+            options={
+                'verbose_name': 'Горячий пост',
+                'verbose_name_plural': 'Горячие посты',
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 2.2.16 on 2026-10-17 08:04
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_suggestions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hotpost',
+            name='rebuilt_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Пересчитан'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 2.2.16 on 2026-10-17 08:38
+
+from django.db import migrations, models
+
+
+def create_generation(apps, schema_editor):
+    apps.get_model('posts', 'FeedGeneration').objects.create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0010_post_updated'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedGeneration',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.BigIntegerField(default=0, verbose_name='Поколение')),
+            ],
+            options={
+                'verbose_name': 'Поколение кэша лент',
+                'verbose_name_plural': 'Поколения кэша лент',
+            },
+        ),
+        migrations.RunPython(create_generation, migrations.RunPython.noop),
+    ]
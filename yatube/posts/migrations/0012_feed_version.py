@@ -0,0 +1,30 @@
+# Generated by Django 2.2.16 on 2026-10-17 08:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_feed_generation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedVersion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=10, verbose_name='Вид ленты')),
+                ('name', models.CharField(blank=True, max_length=150, verbose_name='Группа или автор')),
+                ('version', models.BigIntegerField(default=0, verbose_name='Версия')),
+            ],
+            options={
+                'verbose_name': 'Версия ленты',
+                'verbose_name_plural': 'Версии лент',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='feedversion',
+            constraint=models.UniqueConstraint(fields=('kind', 'name'), name='unique_feed_version'),
+        ),
+    ]
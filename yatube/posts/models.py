@@ -1,5 +1,6 @@
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.utils import timezone
 
 from core.models import CreatedModel
 
@@ -10,6 +11,11 @@ class Group(models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(max_length=200, unique=True)
     description = models.TextField(null=True, blank=True)
+    post_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Число постов',
+    )
 
     class Meta:
         verbose_name = 'Группа'
@@ -19,6 +25,26 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """
+        Выборка для ленты: автор и группа подтягиваются одним JOIN,
+        в запрос попадают только поля, нужные шаблону post_list.html
+        и ответам API.
+        """
+        return self.select_related('author', 'group').only(
+            'text',
+            'pub_date',
+            'image',
+            'comment_count',
+            'author__username',
+            'author__first_name',
+            'author__last_name',
+            'group__slug',
+            'group__title',
+        )
+
+
 class Post(CreatedModel):
     text = models.TextField(
         verbose_name='Текст поста',
@@ -45,16 +71,62 @@ class Post(CreatedModel):
         upload_to='posts/',
         blank=True
     )
+    comment_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Число комментариев',
+    )
+    # Меняется и при новом комментарии или готовой миниатюре:
+    # по нему страницы считают свои ETag и Last-Modified.
+    updated = models.DateTimeField('Дата изменения', auto_now=True)
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ['-pub_date']
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = [
+            models.Index(
+                fields=['pub_date', 'id'],
+                name='post_pub_date_idx'
+            ),
+            models.Index(
+                fields=['author', 'pub_date', 'id'],
+                name='post_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=['group', 'pub_date', 'id'],
+                name='post_group_pub_date_idx'
+            ),
+            models.Index(
+                fields=['author', 'updated'],
+                name='post_author_updated_idx'
+            ),
+            models.Index(
+                fields=['group', 'updated'],
+                name='post_group_updated_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
 
+class CommentQuerySet(models.QuerySet):
+    def for_list(self):
+        """
+        Выборка для списка комментариев: авторы подтягиваются тем же
+        запросом, без отдельного запроса на каждый комментарий.
+        """
+        return self.select_related('author').only(
+            'text',
+            'pub_date',
+            'post',
+            'author__username',
+        )
+
+
 class Comment(CreatedModel):
     post = models.ForeignKey(
         Post,
@@ -73,10 +145,22 @@ class Comment(CreatedModel):
         help_text='Напишите комментарий к посту'
     )
 
+    objects = CommentQuerySet.as_manager()
+
     class Meta:
         ordering = ['-pub_date']
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = [
+            models.Index(
+                fields=['post', 'pub_date', 'id'],
+                name='comment_post_pub_date_idx'
+            ),
+            models.Index(
+                fields=['pub_date', 'id'],
+                name='comment_pub_date_idx'
+            ),
+        ]
 
 
 class Follow(models.Model):
@@ -92,6 +176,17 @@ class Follow(models.Model):
         related_name='following',
         verbose_name='Автор',
     )
+    pull = models.BooleanField(
+        default=False,
+        verbose_name='Чтение без рассылки',
+        help_text='Посты автора не рассылаются, а читаются при запросе',
+    )
+    pulled_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Прочитано до',
+        help_text='Дата последнего поста автора, добавленного в ленту',
+    )
 
     class Meta:
         verbose_name = 'Подписка'
@@ -102,3 +197,192 @@ class Follow(models.Model):
                 name='unique_user'
             )
         ]
+
+
+class TimelineEntry(models.Model):
+    """Пост в материализованной ленте подписок пользователя."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Пользователь',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост',
+    )
+    pub_date = models.DateTimeField('Дата создания поста')
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_timeline_entry'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', 'pub_date', 'post'],
+                name='timeline_user_feed_idx'
+            )
+        ]
+
+
+class UserStats(models.Model):
+    """Счетчики пользователя, которые иначе считались бы COUNT(*)."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь',
+    )
+    post_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Число постов',
+    )
+    comment_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Число комментариев',
+    )
+    follower_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Число подписчиков',
+    )
+    following_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Число подписок',
+    )
+
+    class Meta:
+        verbose_name = 'Счетчики пользователя'
+        verbose_name_plural = 'Счетчики пользователей'
+
+
+class SearchEntry(models.Model):
+    """
+    Строка обратного индекса: основа слова и пост или комментарий,
+    в котором она встречается.
+    """
+    term = models.CharField('Основа слова', max_length=64)
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='search_entries',
+        verbose_name='Пост',
+    )
+    comment = models.ForeignKey(
+        Comment,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='search_entries',
+        verbose_name='Комментарий',
+    )
+    weight = models.FloatField('Вес')
+
+    class Meta:
+        verbose_name = 'Запись поискового индекса'
+        verbose_name_plural = 'Записи поискового индекса'
+        indexes = [
+            models.Index(
+                fields=['term', 'post', 'comment'],
+                name='search_term_idx'
+            ),
+        ]
+
+
+class Suggestion(models.Model):
+    """
+    Автор, которого стоит предложить пользователю: на него подписаны
+    те, кого пользователь читает. score — сколько таких подписок.
+    Таблицу пересобирает graph.rebuild_suggestions().
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='suggestions',
+        verbose_name='Пользователь',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='suggested_to',
+        verbose_name='Автор',
+    )
+    score = models.PositiveIntegerField('Общих подписок')
+
+    class Meta:
+        verbose_name = 'Рекомендация'
+        verbose_name_plural = 'Рекомендации'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'],
+                name='unique_suggestion'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-score'],
+                name='suggestion_user_score_idx'
+            )
+        ]
+
+
+class HotPost(models.Model):
+    """
+    Место поста в рейтинге «горячего». Таблицу целиком пересобирает
+    hot.rebuild(), страница ленты — диапазон значений rank.
+    """
+    rank = models.PositiveIntegerField('Место', primary_key=True)
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='hot_rank',
+        verbose_name='Пост',
+    )
+    score = models.FloatField('Рейтинг')
+    # Время пересборки — версия ленты, общая для всех процессов.
+    rebuilt_at = models.DateTimeField('Пересчитан', default=timezone.now)
+
+    class Meta:
+        verbose_name = 'Горячий пост'
+        verbose_name_plural = 'Горячие посты'
+
+
+class FeedGeneration(models.Model):
+    """
+    Поколение кэша лент — одна строка. Хранится в базе, а не в кэше:
+    локальный кэш у каждого процесса свой, а запись из одного процесса
+    должна сбрасывать ленты во всех.
+    """
+    value = models.BigIntegerField('Поколение', default=0)
+
+    class Meta:
+        verbose_name = 'Поколение кэша лент'
+        verbose_name_plural = 'Поколения кэша лент'
+
+
+class FeedVersion(models.Model):
+    """
+    Версия Atom-ленты сайта, группы или автора. Сигналы увеличивают ее
+    при новом посте, правке и удалении; документ ленты в кэше с другой
+    версией больше не читается.
+    """
+    kind = models.CharField('Вид ленты', max_length=10)
+    name = models.CharField('Группа или автор', max_length=150, blank=True)
+    version = models.BigIntegerField('Версия', default=0)
+
+    class Meta:
+        verbose_name = 'Версия ленты'
+        verbose_name_plural = 'Версии лент'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['kind', 'name'],
+                name='unique_feed_version'
+            )
+        ]
@@ -0,0 +1,248 @@
+import base64
+import binascii
+import json
+from math import ceil
+
+from django.core.paginator import Page, Paginator
+from django.db import connections, router
+from django.db.models import Max, Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+FORWARD = 'next'
+BACKWARD = 'prev'
+# Наибольшее целое базы (bigint): id, OFFSET и места в рейтинге
+# больше него в запрос не передать.
+MAX_KEY = 2 ** 63 - 1
+
+
+def encode_cursor(pub_date, pk, number, direction=FORWARD):
+    """
+    Упаковывает ключ (pub_date, id) в непрозрачный токен.
+    pub_date равен None у паджинаторов только по id.
+    """
+    if pub_date is not None:
+        pub_date = pub_date.isoformat()
+    payload = json.dumps(
+        [direction, pub_date, pk, number],
+        separators=(',', ':'),
+    ).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """
+    Распаковывает токен курсора.
+    Возвращает None, если токен поврежден.
+    """
+    try:
+        padding = '=' * (-len(token) % 4)
+        direction, date, pk, number = json.loads(
+            base64.urlsafe_b64decode(token + padding)
+        )
+        pub_date = parse_datetime(date) if date is not None else None
+        pk, number = int(pk), int(number)
+    except (binascii.Error, TypeError, ValueError):
+        return None
+    if direction not in (FORWARD, BACKWARD) or abs(pk) > MAX_KEY:
+        return None
+    if date is not None and pub_date is None:
+        return None
+    return direction, pub_date, pk, max(number, 1)
+
+
+class CursorPaginator(Paginator):
+    """
+    Паджинатор по ключу (pub_date, id).
+
+    Страницы выбираются условием на ключ вместо OFFSET, а общее число
+    записей не считается: достаточно знать, есть ли следующая страница.
+    """
+    date_field = 'pub_date'
+    key_field = 'pk'
+
+    def __init__(self, object_list, per_page, **kwargs):
+        super().__init__(
+            object_list.order_by(*self.get_ordering()), per_page, **kwargs
+        )
+        self.number = 1
+        self.has_more = False
+
+    def get_ordering(self):
+        """Порядок ленты: от новых записей к старым по ключу."""
+        return [f'-{field}' for field in self.fields]
+
+    @property
+    def fields(self):
+        """Поля ключа: дата, если она есть, и id."""
+        return [
+            field for field in (self.date_field, self.key_field) if field
+        ]
+
+    @property
+    def num_pages(self):
+        return self.number + 1 if self.has_more else self.number
+
+    def get_page(self, number):
+        """Страница по номеру — для старых ссылок вида ?page=N."""
+        return self.build(*self.fetch_page(number))
+
+    def get_cursor_page(self, token):
+        """Страница по токену из параметра ?cursor=."""
+        return self.build(*self.fetch_cursor(token))
+
+    def fetch(self, request):
+        """
+        Выбирает страницу по параметрам запроса.
+        Возвращает (строки, номер, есть ли следующая) для build().
+        """
+        cursor = request.GET.get('cursor')
+        if cursor:
+            return self.fetch_cursor(cursor)
+        return self.fetch_page(request.GET.get('page'))
+
+    def page_number(self, number):
+        """Номер из ?page=; мусор — первая страница."""
+        try:
+            return max(int(number), 1)
+        except (TypeError, ValueError):
+            return 1
+
+    def page_bottom(self, number):
+        """
+        Сколько строк перед страницей или None, если такую страницу
+        не выбрать одним запросом: число не помещается в базу.
+        """
+        bottom = (number - 1) * self.per_page
+        if bottom + self.per_page + 1 > MAX_KEY:
+            return None
+        return bottom
+
+    def fetch_page(self, number):
+        number = self.page_number(number)
+        bottom = self.page_bottom(number)
+        rows = []
+        if bottom is not None:
+            rows = self._slice(bottom, bottom + self.per_page + 1)
+        if not rows and number > 1:
+            # Номер за пределами ленты: как и Paginator, отдаем последнюю.
+            number = max(ceil(self._count() / self.per_page), 1)
+            bottom = (number - 1) * self.per_page
+            rows = self._slice(bottom, bottom + self.per_page + 1)
+        return rows[:self.per_page], number, len(rows) > self.per_page
+
+    def fetch_cursor(self, token):
+        cursor = decode_cursor(token)
+        if cursor is None:
+            return self.fetch_page(1)
+        direction, pub_date, pk, number = cursor
+        if (pub_date is None) != (self.date_field is None):
+            return self.fetch_page(1)
+        if direction == FORWARD:
+            rows = self._around(pub_date, pk, 'lt', self.per_page + 1)
+            return rows[:self.per_page], number, len(rows) > self.per_page
+
+        rows = self._around(pub_date, pk, 'gt', self.per_page + 1)
+        if len(rows) < self.per_page + 1:
+            # Дошли до начала ленты — это первая страница.
+            return self.fetch_page(1)
+        rows = rows[:self.per_page]
+        rows.reverse()
+        return rows, max(number, 2), True
+
+    def build(self, rows, number, has_more):
+        """Собирает Page из результата fetch()."""
+        self.number = number
+        self.has_more = has_more
+        page = Page(self.resolve(rows), number, self)
+        page.next_cursor = page.previous_cursor = None
+        if rows:
+            page.next_cursor = self._cursor(rows[-1], number + 1)
+            page.previous_cursor = self._cursor(
+                rows[0], number - 1, BACKWARD
+            )
+        return page
+
+    def resolve(self, rows):
+        """Превращает строки выборки в объекты страницы."""
+        return rows
+
+    def _slice(self, start, stop):
+        """Строки ленты с start по stop."""
+        return list(self.object_list[start:stop])
+
+    def _count(self):
+        return self.object_list.count()
+
+    def _around(self, pub_date, pk, lookup, limit):
+        """
+        limit строк после ключа (lookup='lt') или перед ним ('gt');
+        во втором случае — от ближайшей к ключу.
+        """
+        rows = self._keyset(pub_date, pk, lookup)
+        if lookup == 'gt':
+            rows = rows.order_by(*self.fields)
+        return list(rows[:limit])
+
+    def _keyset(self, pub_date, pk, lookup, queryset=None):
+        if queryset is None:
+            queryset = self.object_list
+        date, key = self.date_field, self.key_field
+        if date is None:
+            return queryset.filter(**{f'{key}__{lookup}': pk})
+        return queryset.filter(
+            **{f'{date}__{lookup}e': pub_date}
+        ).filter(
+            Q(**{f'{date}__{lookup}': pub_date})
+            | Q(**{f'{key}__{lookup}': pk})
+        )
+
+    def _cursor(self, row, number, direction=FORWARD):
+        pub_date = getattr(row, self.date_field) if self.date_field else None
+        return encode_cursor(
+            pub_date, getattr(row, self.key_field), number, direction
+        )
+
+
+class KeyPaginator(CursorPaginator):
+    """
+    Паджинатор только по id, от новых записей к старым, — для таблиц
+    без даты, например подписок.
+    """
+    date_field = None
+
+
+def estimate_count(model):
+    """
+    Примерное число строк таблицы без COUNT(*): на PostgreSQL — из
+    статистики планировщика, на остальных базах — наибольший id.
+    """
+    connection = connections[router.db_for_read(model)]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE relname = %s',
+                [model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        if row and row[0] > 0:
+            return int(row[0])
+    return model._default_manager.aggregate(last=Max('pk'))['last'] or 0
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Паджинатор для админки больших таблиц. Если список не отфильтрован
+    и в таблице больше threshold строк, число строк оценивается вместо
+    COUNT(*) по всей таблице; последние страницы могут оказаться пустыми.
+    """
+    threshold = 100000
+
+    @cached_property
+    def count(self):
+        if self.object_list.query.where:
+            return super().count
+        estimate = estimate_count(self.object_list.model)
+        if estimate < self.threshold:
+            return super().count
+        return estimate
@@ -0,0 +1,193 @@
+"""
+Полнотекстовый поиск по постам и комментариям.
+
+Текст разбивается на слова, слова приводятся к основе стеммером
+Snowball, и для каждой основы в SearchEntry хранится вес вхождения.
+Индекс обновляется сигналами при сохранении поста или комментария,
+а команда rebuild_search_index строит его заново.
+
+Результаты ранжируются по числу совпавших слов запроса, затем по
+сумме весов, умноженных на IDF основы: редкие слова важнее частых.
+"""
+import math
+import re
+from collections import Counter
+from itertools import chain, islice
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, Count, F, FloatField, Max, Sum, When
+
+from .models import Comment, Post, SearchEntry
+from .stemmer import stem
+
+WORD = re.compile(r'\w+')
+
+# Насыщение частоты: десятое повторение слова почти ничего не добавляет.
+SATURATION = 1.2
+# Совпадение в комментарии весит меньше, чем в тексте самого поста.
+COMMENT_WEIGHT = 0.5
+
+STOP_WORDS = frozenset((
+    'а', 'без', 'бы', 'был', 'была', 'были', 'было', 'быть', 'в', 'вам',
+    'вас', 'во', 'вот', 'все', 'всё', 'вы', 'да', 'для', 'до', 'его', 'ее',
+    'её', 'если', 'есть', 'еще', 'ещё', 'же', 'за', 'и', 'из', 'или', 'им',
+    'их', 'к', 'как', 'ко', 'когда', 'ли', 'мне', 'мы', 'на', 'над', 'не',
+    'нет', 'ни', 'но', 'ну', 'о', 'об', 'он', 'она', 'они', 'оно', 'от',
+    'по', 'под', 'при', 'с', 'со', 'так', 'там', 'то', 'тоже', 'только',
+    'ты', 'у', 'уже', 'что', 'чтобы', 'это', 'я',
+))
+
+
+def terms(text):
+    """Основы слов текста без стоп-слов, с повторами."""
+    max_length = SearchEntry._meta.get_field('term').max_length
+    return [
+        stem(word)[:max_length]
+        for word in WORD.findall(text.lower())
+        if word not in STOP_WORDS and not word.isdigit()
+    ]
+
+
+def _entries(text, post_id, comment_id=None, factor=1.0):
+    """Строки индекса (term, post_id, comment_id, weight) для текста."""
+    return [
+        (term, post_id, comment_id, factor * count / (count + SATURATION))
+        for term, count in Counter(terms(text)).items()
+    ]
+
+
+def _insert(rows):
+    """
+    Вставляет строки индекса одним executemany: на миллионах строк
+    bulk_create тратит больше времени на модели, чем на саму вставку.
+    """
+    if not rows:
+        return
+    quote = connection.ops.quote_name
+    columns = ', '.join(
+        quote(SearchEntry._meta.get_field(name).column)
+        for name in ('term', 'post', 'comment', 'weight')
+    )
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {quote(SearchEntry._meta.db_table)} ({columns}) '
+            f'VALUES (%s, %s, %s, %s)',
+            rows,
+        )
+
+
+def index_post(post):
+    SearchEntry.objects.filter(post=post, comment__isnull=True).delete()
+    _insert(_entries(post.text, post.pk))
+
+
+def index_comment(comment):
+    SearchEntry.objects.filter(comment=comment).delete()
+    _insert(
+        _entries(comment.text, comment.post_id, comment.pk, COMMENT_WEIGHT)
+    )
+
+
+def _post_entries(posts):
+    for post in posts.order_by().only('text').iterator():
+        yield from _entries(post.text, post.pk)
+
+
+def _comment_entries(comments):
+    for comment in comments.order_by().only('text', 'post').iterator():
+        yield from _entries(
+            comment.text, comment.post_id, comment.pk, COMMENT_WEIGHT
+        )
+
+
+def _bulk_index(entries, batch_size):
+    total = 0
+    batch = list(islice(entries, batch_size))
+    while batch:
+        _insert(batch)
+        total += len(batch)
+        batch = list(islice(entries, batch_size))
+    return total
+
+
+def index_posts(posts, batch_size=1000):
+    """
+    Индексирует посты из выборки, вставленные мимо сигналов.
+    Возвращает число записей индекса.
+    """
+    return _bulk_index(_post_entries(posts), batch_size)
+
+
+def rebuild(batch_size=1000):
+    """Строит индекс заново. Возвращает число записей индекса."""
+    SearchEntry.objects.all().delete()
+    return _bulk_index(
+        chain(
+            _post_entries(Post.objects.all()),
+            _comment_entries(Comment.objects.all()),
+        ),
+        batch_size,
+    )
+
+
+def _idf(query_terms):
+    """
+    IDF основ запроса. За число документов берется наибольший id поста:
+    это чтение одной строки индекса вместо COUNT(*) по таблице.
+    """
+    frequencies = dict(
+        SearchEntry.objects.filter(term__in=query_terms).order_by()
+        .values('term').annotate(total=Count('pk'))
+        .values_list('term', 'total')
+    )
+    documents = Post.objects.aggregate(last=Max('pk'))['last'] or 0
+    return {
+        term: math.log(1 + max(documents, total) / total)
+        for term, total in frequencies.items()
+    }
+
+
+def _rank(query, group_by, limit, **filters):
+    query_terms = sorted(set(terms(query)))
+    idf = _idf(query_terms)
+    if not idf:
+        return []
+    score = Sum(
+        F('weight') * Case(
+            *[When(term=term, then=value) for term, value in idf.items()],
+            output_field=FloatField(),
+        ),
+        output_field=FloatField(),
+    )
+    return list(
+        SearchEntry.objects.filter(term__in=idf, **filters).order_by()
+        .values(group_by)
+        .annotate(matched=Count('term', distinct=True), score=score)
+        .order_by('-matched', '-score', f'-{group_by}')
+        .values_list(group_by, flat=True)[:limit]
+    )
+
+
+def search_posts(query, limit=None):
+    """
+    Посты, в тексте или комментариях которых есть слова запроса,
+    от самых подходящих к менее подходящим.
+    """
+    ids = _rank(query, 'post_id', limit or settings.SEARCH_RESULTS)
+    posts = Post.objects.for_feed().in_bulk(ids)
+    return [posts[pk] for pk in ids if pk in posts]
+
+
+def post_ids(term):
+    """Подзапрос id постов, в тексте которых есть основа term."""
+    return SearchEntry.objects.filter(
+        term=term, comment__isnull=True
+    ).values('post_id')
+
+
+def comment_ids(term):
+    """Подзапрос id комментариев, в тексте которых есть основа term."""
+    return SearchEntry.objects.filter(
+        term=term, comment__isnull=False
+    ).values('comment_id')
@@ -0,0 +1,135 @@
+"""
+Генератор тестового набора данных для нагрузочных прогонов.
+
+Данные похожи на настоящие: у немногих авторов большая часть постов
+и подписчиков, посты распределены по году, часть из них с картинками.
+Записи вставляются пачками через bulk_create, мимо сигналов, поэтому
+счетчики, ленты подписок, поисковый индекс, рейтинг «горячего»
+и рекомендации строятся в конце.
+"""
+import io
+import random
+from datetime import timedelta
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from PIL import Image
+
+from . import counters, feeds, graph, hot, search, timeline
+from .feed_cache import bump_generation
+from .models import Comment, Follow, Group, Post, User
+from .thumbnails import generate_thumbnails
+
+WORDS = (
+    'вечер', 'диспетчер', 'город', 'река', 'котик', 'собака', 'поезд',
+    'море', 'книга', 'лес', 'дождь', 'солнце', 'кофе', 'работа', 'друг',
+    'дорога', 'музыка', 'фильм', 'горы', 'зима', 'лето', 'праздник',
+    'красивый', 'новый', 'старый', 'быстрый', 'тихий', 'смешной',
+    'гуляли', 'читаю', 'смотрели', 'пишу', 'ждем', 'нашел', 'люблю',
+)
+IMAGE_COUNT = 5
+
+
+def _text(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+
+def _popular(rng, items):
+    """Случайный элемент; первые элементы выпадают намного чаще."""
+    return items[min(int(rng.paretovariate(1.2)) - 1, len(items) - 1)]
+
+
+def _images(prefix):
+    names = []
+    for number in range(IMAGE_COUNT):
+        buffer = io.BytesIO()
+        color = (number * 50 % 256, 120, 200)
+        Image.new('RGB', (1200, 400), color).save(buffer, 'PNG')
+        name = default_storage.save(
+            f'posts/{prefix}-{number}.png', ContentFile(buffer.getvalue())
+        )
+        generate_thumbnails(name)
+        names.append(name)
+    return names
+
+
+def seed(users=200, groups=10, posts=5000, comments=10000, follows=20,
+         images=0.1, prefix='bench', random_seed=0):
+    """
+    Создает пользователей, группы, посты, комментарии и подписки.
+    Возвращает число созданных записей каждого вида.
+    """
+    rng = random.Random(random_seed)
+    now = timezone.now()
+
+    User.objects.bulk_create(
+        [User(username=f'{prefix}-user-{i}', first_name='Автор',
+              last_name=str(i)) for i in range(users)],
+    )
+    # Фильтры по созданным записям — подзапросом, а не списком id:
+    # у SQLite есть предел числа параметров запроса.
+    seeded = User.objects.filter(username__startswith=f'{prefix}-user-')
+    authors = list(seeded.order_by('pk'))
+    Group.objects.bulk_create(
+        [Group(title=f'Группа {i}', slug=f'{prefix}-group-{i}',
+               description=_text(rng, 12)) for i in range(groups)],
+    )
+    group_list = list(Group.objects.filter(
+        slug__startswith=f'{prefix}-group-'
+    ).order_by('pk'))
+    image_names = _images(prefix) if images else []
+
+    Post.objects.bulk_create(
+        [Post(
+            author=_popular(rng, authors),
+            group=rng.choice(group_list) if rng.random() < 0.7 else None,
+            text=_text(rng, rng.randint(5, 60)),
+            image=rng.choice(image_names)
+            if image_names and rng.random() < images else '',
+        ) for _ in range(posts)],
+    )
+    # pub_date заполняется auto_now_add, поэтому даты раскидываются
+    # по году отдельным UPDATE.
+    post_list = list(
+        Post.objects.filter(author__in=seeded).only('pk').order_by('pk')
+    )
+    for post in post_list:
+        post.pub_date = now - timedelta(
+            minutes=rng.randint(0, 60 * 24 * 365)
+        )
+    Post.objects.bulk_update(post_list, ['pub_date'])
+    post_ids = [post.pk for post in post_list]
+    Comment.objects.bulk_create(
+        [Comment(
+            post_id=_popular(rng, post_ids),
+            author=rng.choice(authors),
+            text=_text(rng, rng.randint(3, 20)),
+        ) for _ in range(comments if post_ids else 0)],
+    )
+
+    pairs = {
+        (user.pk, _popular(rng, authors).pk)
+        for user in authors for _ in range(follows)
+    }
+    Follow.objects.bulk_create(
+        [Follow(user_id=user, author_id=author)
+         for user, author in pairs if user != author],
+        ignore_conflicts=True,
+    )
+    for follow in Follow.objects.filter(user__in=seeded):
+        timeline.backfill(follow)
+
+    counters.rebuild()
+    search.rebuild()
+    hot.rebuild()
+    graph.rebuild_suggestions()
+    bump_generation()
+    feeds.touch_all()
+    return {
+        'users': len(authors),
+        'groups': len(group_list),
+        'posts': len(post_ids),
+        'comments': Comment.objects.filter(post__author__in=seeded).count(),
+        'follows': Follow.objects.filter(user__in=seeded).count(),
+    }
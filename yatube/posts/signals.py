@@ -0,0 +1,156 @@
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import counters, feeds, graph, search, timeline
+from .feed_cache import bump_generation
+from .models import Comment, Follow, Group, Post, UserStats
+from .thumbnails import queue_thumbnails
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def create_user_stats(sender, instance, created, **kwargs):
+    if created:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(pre_save, sender=Post)
+def move_post_between_groups(sender, instance, **kwargs):
+    if instance._state.adding:
+        return
+    old_group_id, instance._saved_image = Post.objects.filter(
+        pk=instance.pk
+    ).values_list('group_id', 'image').first() or (None, None)
+    if old_group_id != instance.group_id:
+        counters.change_group(old_group_id, -1)
+        counters.change_group(instance.group_id, 1)
+        old_slug = Group.objects.filter(pk=old_group_id).values_list(
+            'slug', flat=True
+        ).first()
+        if old_slug is not None:
+            feeds.touch(feeds.GROUP, old_slug)
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, **kwargs):
+    if created:
+        counters.change_user(instance.author_id, 'post_count', 1)
+        counters.change_group(instance.group_id, 1)
+        timeline.fan_out(instance)
+
+
+@receiver(post_save, sender=Post)
+def thumbnail_post_image(sender, instance, created, **kwargs):
+    # Миниатюры ставятся в очередь при любом сохранении новой картинки:
+    # из форм, API, админки или кода.
+    if created or instance.image.name != instance._saved_image:
+        queue_thumbnails(instance)
+
+
+@receiver(post_delete, sender=Post)
+def forget_post(sender, instance, **kwargs):
+    counters.change_user(instance.author_id, 'post_count', -1)
+    counters.change_group(instance.group_id, -1)
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, **kwargs):
+    if created:
+        counters.change_user(instance.author_id, 'comment_count', 1)
+        counters.change_post(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def forget_comment(sender, instance, **kwargs):
+    counters.change_user(instance.author_id, 'comment_count', -1)
+    counters.change_post(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, **kwargs):
+    if created:
+        counters.change_user(instance.author_id, 'follower_count', 1)
+        counters.change_user(instance.user_id, 'following_count', 1)
+        timeline.backfill(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def prune_timeline(sender, instance, **kwargs):
+    counters.change_user(instance.author_id, 'follower_count', -1)
+    counters.change_user(instance.user_id, 'following_count', -1)
+    timeline.prune(instance)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def forget_follow_graph(sender, instance, **kwargs):
+    graph.forget(instance)
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or 'text' in update_fields:
+        search.index_post(instance)
+
+
+@receiver(post_save, sender=Comment)
+def index_comment(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or 'text' in update_fields:
+        search.index_comment(instance)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def invalidate_feed_cache(sender, update_fields=None, **kwargs):
+    # Вход пользователя обновляет только last_login — ленты не меняются.
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    bump_generation()
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def refresh_atom_feeds(sender, instance, **kwargs):
+    feeds.touch_post(instance)
+
+
+@receiver(pre_save, sender=Group)
+def forget_renamed_group_feed(sender, instance, **kwargs):
+    # Лента по старому адресу должна отвечать 404, а не кэшем.
+    if instance.pk is None:
+        return
+    slug = Group.objects.filter(pk=instance.pk).values_list(
+        'slug', flat=True
+    ).first()
+    if slug is not None and slug != instance.slug:
+        feeds.touch(feeds.GROUP, slug)
+
+
+@receiver(post_save, sender=Group)
+def refresh_group_feed(sender, instance, **kwargs):
+    feeds.touch(feeds.GROUP, instance.slug)
+
+
+@receiver(pre_save, sender=settings.AUTH_USER_MODEL)
+def forget_renamed_author_feed(sender, instance, update_fields=None,
+                               **kwargs):
+    if instance.pk is None or (
+        update_fields and 'username' not in update_fields
+    ):
+        return
+    username = sender.objects.filter(pk=instance.pk).values_list(
+        'username', flat=True
+    ).first()
+    if username is not None and username != instance.username:
+        feeds.touch(feeds.AUTHOR, username)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def refresh_author_feed(sender, instance, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    feeds.touch(feeds.AUTHOR, instance.username)
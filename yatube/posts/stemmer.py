@@ -0,0 +1,81 @@
+"""
+Стеммер Snowball для русского языка.
+
+Реализация алгоритма https://snowballstem.org/algorithms/russian/stemmer.html
+без внешних зависимостей. Окончания ищутся регулярными выражениями:
+re.search находит самое левое совпадение, то есть самое длинное из
+подходящих окончаний, как того требует алгоритм.
+"""
+import re
+from functools import lru_cache
+
+VOWELS = 'аеиоуыэюя'
+
+PERFECTIVE_GERUND = re.compile(
+    r'(?:(?<=[ая])(?:в|вши|вшись)|ив|ивши|ившись|ыв|ывши|ывшись)$'
+)
+ADJECTIVE = (
+    r'(?:ее|ие|ые|ое|ими|ыми|ей|ий|ый|ой|ем|им|ым|ом|его|ого|ему|ому'
+    r'|их|ых|ую|юю|ая|яя|ою|ею)'
+)
+PARTICIPLE = r'(?:(?<=[ая])(?:ем|нн|вш|ющ|щ)|ивш|ывш|ующ)'
+ADJECTIVAL = re.compile(f'{PARTICIPLE}?{ADJECTIVE}$')
+REFLEXIVE = re.compile(r'(?:ся|сь)$')
+VERB = re.compile(
+    r'(?:(?<=[ая])(?:ла|на|ете|йте|ли|й|л|ем|н|ло|но|ет|ют|ны|ть|ешь|нно)'
+    r'|ила|ыла|ена|ейте|уйте|ите|или|ыли|ей|уй|ил|ыл|им|ым|ен|ило|ыло'
+    r'|ено|ят|ует|уют|ит|ыт|ены|ить|ыть|ишь|ую|ю)$'
+)
+NOUN = re.compile(
+    r'(?:а|ев|ов|ие|ье|е|иями|ями|ами|еи|ии|и|ией|ей|ой|ий|й|иям|ям'
+    r'|ием|ем|ам|ом|о|у|ах|иях|ях|ы|ь|ию|ью|ю|ия|ья|я)$'
+)
+SUPERLATIVE = re.compile(r'(?:ейше|ейш)$')
+DERIVATIONAL = re.compile(r'(?:ост|ость)$')
+
+
+def _region_start(word, start):
+    """Начало области после первой согласной, идущей за гласной."""
+    for i in range(start + 1, len(word)):
+        if word[i - 1] in VOWELS and word[i] not in VOWELS:
+            return i + 1
+    return len(word)
+
+
+@lru_cache(maxsize=100000)
+def stem(word):
+    word = word.lower().replace('ё', 'е')
+    rv_start = next(
+        (i + 1 for i, letter in enumerate(word) if letter in VOWELS), None
+    )
+    if rv_start is None:
+        return word
+    r2_start = _region_start(word, _region_start(word, 0))
+    prefix, rv = word[:rv_start], word[rv_start:]
+
+    match = PERFECTIVE_GERUND.search(rv)
+    if match:
+        rv = rv[:match.start()]
+    else:
+        rv = REFLEXIVE.sub('', rv)
+        for pattern in (ADJECTIVAL, VERB, NOUN):
+            match = pattern.search(rv)
+            if match:
+                rv = rv[:match.start()]
+                break
+
+    if rv.endswith('и'):
+        rv = rv[:-1]
+
+    match = DERIVATIONAL.search(rv)
+    if match and rv_start + match.start() >= r2_start:
+        rv = rv[:match.start()]
+
+    match = SUPERLATIVE.search(rv)
+    if match:
+        rv = rv[:match.start()]
+    if rv.endswith('нн'):
+        rv = rv[:-1]
+    elif not match and rv.endswith('ь'):
+        rv = rv[:-1]
+    return prefix + rv
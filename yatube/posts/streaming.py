@@ -0,0 +1,113 @@
+"""
+Потоковая отрисовка лент.
+
+render() собирает страницу целиком, и первый байт уходит только после
+выборки ленты и отрисовки всех постов. При FEED_STREAMING страница
+отдается частями: сначала все до ленты (шапка и заголовок), потом
+посты по одному, по мере отрисовки, и в конце паджинатор и подвал.
+Лента выбирается уже после отправки шапки.
+"""
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.http import StreamingHttpResponse
+from django.shortcuts import render
+from django.template import RequestContext
+from django.template.loader import get_template, render_to_string
+
+from core.metrics import template_timer
+
+from . import graph
+
+
+def follow_marks(request, page_obj):
+    """
+    Авторы постов страницы, на которых подписан читатель. Набор
+    входит в ключ кэша статьи: у читателей с разными подписками
+    разные копии, у гостей — одна общая.
+    """
+    followed = graph.followed_among(
+        request.user, {post.author_id for post in page_obj}
+    )
+    return {
+        'followed': followed,
+        'followed_key': ','.join(map(str, sorted(followed))),
+    }
+
+
+def render_feed(request, template_name, context, page, mark_followed=False,
+                **options):
+    """
+    Отрисовывает страницу ленты. page — функция, которая выбирает
+    страницу ленты; options — параметры шаблона post_list.html.
+    mark_followed — отметить посты авторов, на которых подписан читатель.
+    """
+    if not settings.FEED_STREAMING:
+        page_obj = page()
+        context = {**context, 'page_obj': page_obj}
+        if mark_followed:
+            context.update(follow_marks(request, page_obj))
+        return render(request, template_name, context)
+    return StreamingHttpResponse(_stream(
+        request, template_name, context, page, mark_followed, options
+    ))
+
+
+def _stream(request, template_name, context, page, mark_followed, options):
+    # Шаблон страницы отрисовывается с меткой на месте ленты.
+    marker = uuid.uuid4().hex
+    head, tail = render_to_string(
+        template_name, {**context, 'feed_stream': marker}, request
+    ).split(marker)
+    yield head
+    page_obj = page()
+    if mark_followed:
+        marks = follow_marks(request, page_obj)
+        context = {**context, **marks}
+        options = {**options, 'followed': marks['followed']}
+    yield from _article(request, page_obj, context, options)
+    yield render_to_string(
+        'posts/includes/paginator.html', {'page_obj': page_obj}, request
+    )
+    yield tail
+
+
+def _article(request, page_obj, context, options):
+    """
+    Посты страницы. Готовая статья берется из того же кэша фрагментов,
+    что и у {% cache ... article feed_cache_key %} в шаблонах.
+    """
+    cache_key = context.get('feed_cache_key')
+    if cache_key is not None:
+        fragment_key = make_template_fragment_key(
+            'article', [cache_key, context.get('followed_key', '')]
+        )
+        article = cache.get(fragment_key)
+        if article is not None:
+            yield article
+            return
+    parts = []
+    for chunk in _posts(request, page_obj, options):
+        parts.append(chunk)
+        yield chunk
+    if cache_key is not None:
+        cache.set(
+            fragment_key, ''.join(parts), context['feed_cache_timeout']
+        )
+
+
+def _posts(request, page_obj, options):
+    # Один контекст на все посты: контекстные процессоры выполняются
+    # один раз, а не при отрисовке каждого поста.
+    template = get_template('posts/includes/post.html').template
+    context = RequestContext(request, options)
+    yield '<article>'
+    with context.bind_template(template):
+        for number, post in enumerate(page_obj):
+            if number:
+                yield '<hr>'
+            with template_timer(), context.push(post=post):
+                yield template.render(context)
+    yield '</article>'
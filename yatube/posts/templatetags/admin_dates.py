@@ -0,0 +1,73 @@
+import copy
+from datetime import date
+
+from django import template
+from django.contrib.admin.templatetags.admin_list import date_hierarchy
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+register = template.Library()
+
+
+def _periods(first, last, kind):
+    """Все годы, месяцы или дни от first до last включительно."""
+    if kind == 'year':
+        return [date(year, 1, 1) for year in range(first.year, last.year + 1)]
+    if kind == 'month':
+        return [
+            date(month // 12, month % 12 + 1, 1) for month in range(
+                first.year * 12 + first.month - 1,
+                last.year * 12 + last.month,
+            )
+        ]
+    return [
+        date.fromordinal(day)
+        for day in range(first.toordinal(), last.toordinal() + 1)
+    ]
+
+
+class IndexedDates:
+    """
+    Замена cl.queryset для иерархии дат. Django ищет даты через
+    SELECT DISTINCT по всей таблице; здесь берутся только первая
+    и последняя дата по индексу, а между ними перечисляются все
+    периоды подряд, в том числе пустые.
+    """
+
+    def __init__(self, queryset, field_name):
+        self.queryset = queryset
+        self.field_name = field_name
+
+    def _edge(self, ordering):
+        return self.queryset.order_by(ordering).values_list(
+            self.field_name, flat=True
+        ).first()
+
+    @cached_property
+    def edges(self):
+        return {
+            'first': self._edge(self.field_name),
+            'last': self._edge(f'-{self.field_name}'),
+        }
+
+    def aggregate(self, **kwargs):
+        return self.edges
+
+    def dates(self, field_name, kind):
+        edges = self.edges
+        if edges['first'] is None:
+            return []
+        first, last = (
+            timezone.localtime(edges[edge]).date()
+            if timezone.is_aware(edges[edge]) else edges[edge].date()
+            for edge in ('first', 'last')
+        )
+        return _periods(first, last, kind)
+
+
+@register.inclusion_tag('admin/date_hierarchy.html')
+def indexed_date_hierarchy(cl):
+    """Тег date_hierarchy админки без полного прохода по таблице."""
+    changelist = copy.copy(cl)
+    changelist.queryset = IndexedDates(cl.queryset, cl.date_hierarchy)
+    return date_hierarchy(changelist)
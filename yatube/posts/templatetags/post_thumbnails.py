@@ -0,0 +1,16 @@
+from django import template
+
+from ..thumbnails import get_ready_thumbnail
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_thumbnail(image, geometry):
+    """
+    Готовая миниатюра картинки поста или None, пока она в очереди.
+    Параметры размера берутся из settings.POST_THUMBNAILS.
+    """
+    if not image:
+        return None
+    return get_ready_thumbnail(image, geometry)
@@ -81,6 +81,7 @@ class PostFormTests(TestCase):
         self.assertEqual(last_post.text, form_data['text'])
         self.assertEqual(last_post.group.id, form_data['group'])
         self.assertEqual(last_post.author, PostFormTests.author)
+        self.assertEqual(last_post.image.name, 'posts/small.gif')
 
     def test_post_edit_form(self):
         """
@@ -1,7 +1,16 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
 
-from ..models import Group, Post
+from .. import counters, search
+from ..models import Comment, Follow, Group, Post, UserStats
 
 User = get_user_model()
 
@@ -62,3 +71,179 @@ class PostModelTest(TestCase):
                     post._meta.get_field(field).help_text,
                     expected_value
                 )
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+
+    def assertCounters(self, post_count, comment_count, follower_count):
+        stats = UserStats.objects.get(user=CountersTest.user)
+        group = Group.objects.get(pk=CountersTest.group.pk)
+        self.assertEqual(stats.post_count, post_count)
+        self.assertEqual(group.post_count, post_count)
+        self.assertEqual(stats.comment_count, comment_count)
+        self.assertEqual(stats.follower_count, follower_count)
+
+    def test_counters_follow_writes_and_deletes(self):
+        """Счетчики меняются вместе с постами, комментариями, подписками."""
+        post = Post.objects.create(
+            author=CountersTest.user,
+            text='Тестовая запись',
+            group=CountersTest.group,
+        )
+        Comment.objects.create(
+            post=post, author=CountersTest.user, text='Комментарий'
+        )
+        follow = Follow.objects.create(
+            user=CountersTest.reader, author=CountersTest.user
+        )
+        self.assertCounters(1, 1, 1)
+        self.assertEqual(Post.objects.get(pk=post.pk).comment_count, 1)
+        follow.delete()
+        post.delete()
+        self.assertCounters(0, 0, 0)
+
+    def test_rebuild_counters_command(self):
+        """Команда rebuild_counters находит и исправляет расхождения."""
+        Post.objects.create(
+            author=CountersTest.user,
+            text='Тестовая запись',
+            group=CountersTest.group,
+        )
+        UserStats.objects.filter(user=CountersTest.user).update(
+            post_count=5
+        )
+        with self.assertRaises(CommandError):
+            call_command('rebuild_counters', check=True, stdout=StringIO())
+        call_command('rebuild_counters', stdout=StringIO())
+        call_command('rebuild_counters', check=True, stdout=StringIO())
+        self.assertCounters(1, 0, 0)
+
+
+class ImportExportTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.group = Group.objects.create(title='Группа', slug='test-slug')
+        cls.media = tempfile.mkdtemp()
+        cls.images = tempfile.mkdtemp()
+        os.makedirs(os.path.join(cls.images, 'posts'))
+        with open(os.path.join(cls.images, 'posts', 'cat.gif'), 'wb') as f:
+            f.write(b'GIF89a')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.media, ignore_errors=True)
+        shutil.rmtree(cls.images, ignore_errors=True)
+        super().tearDownClass()
+
+    def export(self, fmt, **options):
+        output = StringIO()
+        call_command(
+            'export_posts', format=fmt, stdout=output, stderr=StringIO(),
+            **options
+        )
+        return output.getvalue()
+
+    def import_posts(self, fmt, data, **options):
+        path = os.path.join(ImportExportTest.media, f'posts.{fmt}')
+        with open(path, 'w', encoding='utf-8') as source:
+            source.write(data)
+        output = StringIO()
+        with override_settings(MEDIA_ROOT=ImportExportTest.media):
+            call_command('import_posts', path, stdout=output, **options)
+        return output.getvalue()
+
+    def test_round_trip(self):
+        """
+        Выгрузка и загрузка сохраняют текст, дату, автора и группу.
+        """
+        post = Post.objects.create(
+            author=ImportExportTest.author,
+            text='Котики и собаки',
+            group=ImportExportTest.group,
+        )
+        fields = ('text', 'pub_date', 'author', 'group')
+        expected = Post.objects.values_list(*fields).get()
+        for fmt in ('jsonl', 'csv'):
+            with self.subTest(fmt=fmt):
+                data = self.export(fmt)
+                Post.objects.all().delete()
+                self.assertIn('imported: 1', self.import_posts(fmt, data))
+                self.assertEqual(
+                    Post.objects.values_list(*fields).get(), expected
+                )
+        self.assertFalse(any(counters.rebuild(check=True).values()))
+        imported = Post.objects.get()
+        self.assertNotEqual(imported.pk, post.pk)
+        self.assertEqual(search.search_posts('котик'), [imported])
+        self.assertTrue(
+            ImportExportTest.reader.timeline.filter(post=imported).exists()
+        )
+
+    def test_import_keeps_dates_and_touches_only_its_posts(self):
+        """
+        Импорт сохраняет даты из файла, не меняя auto_now_add у модели,
+        и индексирует только свои посты.
+        """
+        # Пост, вставленный мимо сигналов и поискового индекса.
+        Post.objects.bulk_create([Post(
+            author=ImportExportTest.author, text='Котики без индекса'
+        )])
+        data = '\n'.join(json.dumps(record) for record in (
+            {'text': 'Старые котики', 'author': 'auth',
+             'pub_date': '2020-01-02T03:04:05+00:00'},
+            {'text': 'Старая запись', 'author': 'auth',
+             'pub_date': '2019-05-06T00:00:00+00:00'},
+        ))
+        self.import_posts('jsonl', data)
+        imported = Post.objects.get(text='Старые котики')
+        self.assertEqual(imported.pub_date.year, 2020)
+        self.assertEqual(
+            Post.objects.get(text='Старая запись').pub_date.year, 2019
+        )
+        self.assertTrue(Post._meta.get_field('pub_date').auto_now_add)
+        fresh = Post.objects.create(
+            author=ImportExportTest.author, text='Новый пост'
+        )
+        self.assertEqual(fresh.pub_date.date(), timezone.now().date())
+        self.assertEqual(search.search_posts('котик'), [imported])
+
+    def test_unknown_authors_and_images(self):
+        """
+        Неизвестные авторы пропускаются или создаются, картинки
+        копируются из каталога.
+        """
+        data = '\n'.join(json.dumps(record) for record in (
+            {'text': 'Первый', 'author': 'ghost', 'group': 'new-group'},
+            {'text': 'Второй', 'author': 'auth', 'image': 'posts/cat.gif'},
+            {'text': 'Третий', 'author': 'auth', 'image': 'posts/no.gif'},
+        ))
+        output = self.import_posts(
+            'jsonl', data, images_dir=ImportExportTest.images
+        )
+        self.assertIn('imported: 2', output)
+        self.assertIn('skipped: 1', output)
+        self.assertIn('missing_images: 1', output)
+        image = Post.objects.get(text='Второй').image
+        self.assertTrue(
+            os.path.isfile(os.path.join(ImportExportTest.media, image.name))
+        )
+        self.assertIn('imported: 1', self.import_posts(
+            'jsonl', data.splitlines()[0], create_missing=True
+        ))
+        self.assertEqual(
+            Post.objects.get(text='Первый').group.slug, 'new-group'
+        )
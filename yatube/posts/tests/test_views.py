@@ -1,15 +1,42 @@
+import csv
+import json
+import os
+import re
 import shutil
 import tempfile
+import time
+from datetime import timedelta
+from http import HTTPStatus
+from io import StringIO
+from unittest import mock, skipUnless
 
 from django import forms
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase, override_settings
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
 
-from ..models import Follow, Group, Post
+from core import benchmark
+
+from .. import (counters, feed_cache, feeds, graph, hot, search, thumbnails,
+                timeline)
+from ..admin import ChangelistSelect, PostAdmin
+from ..models import (Comment, Follow, Group, HotPost, Post, Suggestion,
+                      TimelineEntry)
+from ..paginator import (EstimatedCountPaginator, decode_cursor,
+                         encode_cursor)
+from ..seed import seed
+from ..stemmer import stem
+from ..thumbnails import generate_thumbnails
+from ..urls import urlpatterns
 
 User = get_user_model()
 
@@ -77,6 +104,85 @@ class PaginatorTests(TestCase):
                     post_count
                 )
 
+    def test_paginator_cursor_navigation(self):
+        """
+        Курсорные ссылки проходят ленту без пропусков и повторов.
+        """
+        url = reverse('posts:index')
+        first_page = self.authorized_client.get(url).context['page_obj']
+        second_page = self.authorized_client.get(
+            url, {'cursor': first_page.next_cursor}
+        ).context['page_obj']
+        self.assertEqual(len(second_page), self.post_per_page['second'])
+        self.assertFalse(second_page.has_next())
+        self.assertEqual(
+            [post.pk for post in list(first_page) + list(second_page)],
+            list(Post.objects.order_by('-pub_date', '-pk').values_list(
+                'pk', flat=True
+            ))
+        )
+        previous_page = self.authorized_client.get(
+            url, {'cursor': second_page.previous_cursor}
+        ).context['page_obj']
+        self.assertEqual(list(previous_page), list(first_page))
+        self.assertFalse(previous_page.has_previous())
+
+    def test_out_of_range_page_and_cursor(self):
+        """
+        Огромный номер страницы ведет на последнюю, а курсор с id
+        за пределами bigint считается поврежденным — без ошибки 500.
+        """
+        post = Post.objects.get(pk=0)
+        urls = (
+            reverse('posts:index'),
+            reverse(
+                'posts:group_list', kwargs={'slug': PaginatorTests.group.slug}
+            ),
+            reverse('posts:profile', kwargs={'username': 'TestAuthor'}),
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}),
+            reverse('posts:followers', kwargs={'username': 'TestAuthor'}),
+            reverse('posts:follow_index'),
+        )
+        tokens = [
+            encode_cursor(pub_date, pk, 2, direction)
+            for pub_date in (timezone.now(), None)
+            for pk in (2 ** 64, -2 ** 64)
+            for direction in ('next', 'prev')
+        ]
+        for url in urls:
+            for query in [{'page': 10 ** 20}] + [
+                {'cursor': token} for token in tokens
+            ]:
+                with self.subTest(url=url, query=query):
+                    response = self.authorized_client.get(url, query)
+                    self.assertEqual(response.status_code, HTTPStatus.OK)
+        response = self.authorized_client.get(urls[0], {'page': 10 ** 20})
+        self.assertEqual(response.context['page_obj'].number, 2)
+        self.assertIsNone(decode_cursor(tokens[0]))
+
+    def test_index_cache_is_keyed_on_page(self):
+        """
+        Кэш главной страницы хранит каждую страницу отдельно.
+        """
+        cache.clear()
+        first_page = self.authorized_client.get(reverse('posts:index'))
+        second_page = self.authorized_client.get(
+            reverse('posts:index') + '?page=2'
+        )
+        newest_post = first_page.context['page_obj'][0]
+        self.assertContains(first_page, newest_post.text)
+        self.assertNotContains(second_page, newest_post.text)
+
+    def test_paginator_does_not_count_rows(self):
+        """
+        Паджинатор не выполняет COUNT(*) при выборке страницы.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            self.authorized_client.get(reverse('posts:index') + '?page=2')
+        self.assertFalse(
+            any('COUNT(' in query['sql'] for query in queries)
+        )
+
 
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
 class PostPagesTests(TestCase):
@@ -129,6 +235,10 @@ class PostPagesTests(TestCase):
         super().tearDownClass()
         shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
 
+    def setUp(self):
+        # Откат транзакции теста не откатывает кэш лент.
+        cache.clear()
+
     def test_pages_uses_correct_template(self):
         """URL-адрес использует соответствующий шаблон."""
         templates_page_names = {
@@ -228,6 +338,56 @@ class PostPagesTests(TestCase):
             forms.fields.CharField
         )
 
+    def test_post_image_placeholder_until_thumbnail_is_ready(self):
+        """
+        До готовности миниатюры на странице поста выводится заглушка.
+        """
+        url = reverse(
+            'posts:post_detail',
+            kwargs={'post_id': PostPagesTests.post.pk}
+        )
+        response = PostPagesTests.guest_client.get(url)
+        self.assertContains(response, 'Картинка обрабатывается')
+        self.assertNotContains(response, '<img class="card-img')
+        generate_thumbnails(PostPagesTests.post.image.name)
+        response = PostPagesTests.guest_client.get(url)
+        self.assertNotContains(response, 'Картинка обрабатывается')
+        self.assertContains(response, '<img class="card-img')
+
+    def test_thumbnails_are_queued_on_any_image_save(self):
+        """
+        Миниатюры ставятся в очередь при сохранении картинки из кода,
+        а не только из форм; сохранение без новой картинки их не трогает.
+        """
+        post = PostPagesTests.post
+        with mock.patch('posts.signals.queue_thumbnails') as queue:
+            post.text = 'Новый текст'
+            post.save()
+            queue.assert_not_called()
+            post.image = 'posts/other.gif'
+            post.save()
+            queue.assert_called_once_with(post)
+
+    @override_settings(THUMBNAIL_WORKERS=0)
+    def test_inline_thumbnails_keep_request_connections(self):
+        """
+        Без пула потоков миниатюры создаются в потоке запроса,
+        и его соединения с базой не закрываются.
+        """
+        with mock.patch('posts.thumbnails.generate_thumbnails') as generate, \
+                mock.patch('posts.thumbnails.connections') as connections:
+            thumbnails._submit(PostPagesTests.post.image.name)
+        generate.assert_called_once_with(PostPagesTests.post.image.name)
+        connections.close_all.assert_not_called()
+
+    def test_generate_thumbnails_command_refreshes_feeds(self):
+        """
+        После создания миниатюр закэшированные ленты пересобираются.
+        """
+        before = feed_cache.generation()
+        call_command('generate_thumbnails', stdout=StringIO())
+        self.assertNotEqual(feed_cache.generation(), before)
+
     def test_post_create_page_contains_create_form(self):
         """
         На страницу с созданием поста передается форма создания.
@@ -309,24 +469,38 @@ class PostPagesTests(TestCase):
             reverse('posts:index')
         )
         cached_content = response.content
-        Post.objects.all().delete()
+        # Запись в обход сигналов не сбрасывает кэш.
+        Post.objects.filter(pk=PostPagesTests.post.pk).update(
+            text='Измененный пост'
+        )
         response = PostPagesTests.authorized_client.get(
             reverse('posts:index')
         )
-        content_deleted = response.content
-        self.assertEqual(
-            cached_content,
-            content_deleted
-        )
+        self.assertEqual(cached_content, response.content)
         cache.clear()
         response = PostPagesTests.authorized_client.get(
             reverse('posts:index')
         )
-        cache_cleared = response.content
-        self.assertNotEqual(
-            cached_content,
-            cache_cleared
+        self.assertNotEqual(cached_content, response.content)
+
+    def test_data_cache_index_page_is_invalidated_on_write(self):
+        """
+        Новый пост сразу виден на главной странице, несмотря на кэш.
+        """
+        PostPagesTests.authorized_client.get(reverse('posts:index'))
+        post = Post.objects.create(
+            author=PostPagesTests.author,
+            text='Пост после кэширования',
+        )
+        response = PostPagesTests.authorized_client.get(
+            reverse('posts:index')
+        )
+        self.assertContains(response, post.text)
+        post.delete()
+        response = PostPagesTests.authorized_client.get(
+            reverse('posts:index')
         )
+        self.assertNotContains(response, post.text)
 
     def test_authorized_user_is_follow_the_author(self):
         """
@@ -403,3 +577,1336 @@ class PostPagesTests(TestCase):
             reverse('posts:follow_index')
         )
         self.assertEqual(len(response.context['page_obj']), posts_count - 1)
+
+
+class FeedQueriesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.authorized_client = Client()
+        cls.authorized_client.force_login(cls.user)
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        # Каждый пост — от своего автора, чтобы N+1 был заметен.
+        for i in range(settings.POST_PER_PAGE + 3):
+            author = User.objects.create_user(username=f'TestAuthor{i}')
+            Follow.objects.create(user=cls.user, author=author)
+            Post.objects.create(
+                author=author,
+                text=f'Тестовый пост #{i}',
+                group=cls.group,
+            )
+        cls.author = author
+
+    def setUp(self):
+        cache.clear()
+
+    def test_feed_pages_have_fixed_query_budget(self):
+        """
+        Число запросов на страницу ленты не зависит от числа постов.
+        """
+        # Два запроса на сессию и пользователя, один на ленту, плюс
+        # выборка группы или автора; на профиле еще проверка подписки,
+        # в подписках — авторы без рассылки, записи ленты и их посты.
+        # Группа и профиль еще считают валидаторы для условного GET.
+        # Первая страница еще читает подписки читателя в кэш графа
+        # для отметок «вы подписаны», остальные берут их из кэша.
+        # Кэшируемые ленты читают поколение кэша из FeedGeneration.
+        budgets = {
+            reverse('posts:index'): 5,
+            reverse('posts:index') + '?page=2': 4,
+            reverse(
+                'posts:group_list',
+                kwargs={'slug': FeedQueriesTests.group.slug}
+            ): 6,
+            reverse(
+                'posts:profile',
+                kwargs={'username': FeedQueriesTests.author.username}
+            ): 7,
+            # Лента и блок «возможно, вы знакомы».
+            reverse('posts:follow_index'): 6,
+            # Версия рейтинга читается из HotPost.
+            reverse('posts:hot'): 5,
+        }
+        hot.rebuild()
+        for url, budget in budgets.items():
+            with self.subTest(url=url):
+                with self.assertNumQueries(budget):
+                    self.authorized_client.get(url)
+
+
+class FeedCacheKeyTests(TestCase):
+    def key(self, query):
+        request = RequestFactory().get('/', query)
+        return feed_cache.feed_cache(request, 'profile', 'имя с пробелом')[
+            'feed_cache_key'
+        ]
+
+    def test_key_does_not_contain_raw_query(self):
+        """
+        Мусор в ?cursor= и ?page= не порождает новых ключей кэша,
+        а ключ безопасен для memcached при любом имени.
+        """
+        first = self.key({})
+        for query in ({'cursor': 'x' * 300}, {'page': 'abc'},
+                      {'page': '-5'}, {'cursor': '1'}):
+            with self.subTest(query=query):
+                self.assertEqual(self.key(query), first)
+        self.assertNotEqual(self.key({'page': '2'}), first)
+        token = encode_cursor(timezone.now(), 5, 2)
+        self.assertEqual(
+            self.key({'cursor': token}), self.key({'cursor': token + '=='})
+        )
+        self.assertRegex(first, r'^[0-9a-f]{32}:\d+$')
+
+    def test_generation_is_shared_between_processes(self):
+        """
+        Поколение хранится в базе: пустой кэш другого процесса видит
+        тот же номер, а запись из команды меняет ключ и для сервера.
+        """
+        first = self.key({})
+        cache.clear()
+        self.assertEqual(self.key({}), first)
+        Post.objects.create(
+            author=User.objects.create_user(username='TestAuthor'),
+            text='Пост из другого процесса',
+        )
+        cache.clear()
+        self.assertNotEqual(self.key({}), first)
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.authorized_client = Client()
+        cls.authorized_client.force_login(cls.user)
+        cls.author = User.objects.create_user(username='TestAuthor')
+        cls.old_post = Post.objects.create(
+            author=cls.author,
+            text='Старый пост',
+        )
+
+    def follow(self):
+        self.authorized_client.get(
+            reverse(
+                'posts:profile_follow',
+                kwargs={'username': TimelineTests.author.username}
+            )
+        )
+
+    def test_timeline_is_filled_on_follow_and_post(self):
+        """
+        Подписка заполняет ленту, новые посты рассылаются подписчикам.
+        """
+        self.follow()
+        new_post = Post.objects.create(
+            author=TimelineTests.author,
+            text='Новый пост',
+        )
+        self.assertEqual(
+            set(TimelineTests.user.timeline.values_list('post', flat=True)),
+            {TimelineTests.old_post.pk, new_post.pk}
+        )
+
+    def test_timeline_is_pruned_on_unfollow(self):
+        """
+        Отписка убирает посты автора из ленты.
+        """
+        self.follow()
+        self.authorized_client.get(
+            reverse(
+                'posts:profile_unfollow',
+                kwargs={'username': TimelineTests.author.username}
+            )
+        )
+        self.assertFalse(TimelineTests.user.timeline.exists())
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_popular_author_posts_are_read_on_request(self):
+        """
+        Посты популярного автора не рассылаются, но попадают в ленту.
+        """
+        self.follow()
+        new_post = Post.objects.create(
+            author=TimelineTests.author,
+            text='Новый пост',
+        )
+        self.assertFalse(TimelineEntry.objects.exists())
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            list(response.context['page_obj']),
+            [new_post, TimelineTests.old_post]
+        )
+
+    @override_settings(POST_PER_PAGE=2)
+    def test_follow_feed_merges_pulled_posts_without_writes(self):
+        """
+        Посты авторов без рассылки сливаются с лентой по дате; чтение
+        ленты ничего не пишет и не включает чтение с основной базы.
+        """
+        self.follow()
+        pushed = [TimelineTests.old_post] + [
+            Post.objects.create(author=TimelineTests.author, text=f'#{i}')
+            for i in range(2)
+        ]
+        popular = User.objects.create_user(username='TestPopular')
+        with override_settings(TIMELINE_FANOUT_LIMIT=0):
+            Follow.objects.create(user=TimelineTests.user, author=popular)
+        pulled = [
+            Post.objects.create(author=popular, text=f'Популярный #{i}')
+            for i in range(2)
+        ]
+        expected = sorted(
+            pushed + pulled, key=lambda post: (post.pub_date, post.pk),
+            reverse=True,
+        )
+        url = reverse('posts:follow_index')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.authorized_client.get(url)
+        self.assertFalse([
+            query for query in queries
+            if not query['sql'].startswith(('SELECT', 'SAVEPOINT',
+                                            'RELEASE'))
+        ])
+        self.assertNotIn('use_primary', response.cookies)
+        pages = [list(response.context['page_obj'])]
+        while response.context['page_obj'].has_next():
+            response = self.authorized_client.get(
+                f'{url}?cursor={response.context["page_obj"].next_cursor}'
+            )
+            pages.append(list(response.context['page_obj']))
+        self.assertEqual(sum(pages, []), expected)
+        response = self.authorized_client.get(
+            f'{url}?cursor={response.context["page_obj"].previous_cursor}'
+        )
+        self.assertEqual(list(response.context['page_obj']), pages[-2])
+
+    def test_maintain_trims_long_timelines(self):
+        """
+        Обслуживание обрезает ленты до TIMELINE_LENGTH записей.
+        """
+        self.follow()
+        for i in range(3):
+            Post.objects.create(author=TimelineTests.author, text=f'#{i}')
+        with override_settings(TIMELINE_LENGTH=2):
+            call_command('maintain_timelines', stdout=StringIO())
+        self.assertEqual(TimelineTests.user.timeline.count(), 2)
+
+    def test_maintain_restores_fan_out(self):
+        """
+        Когда у автора снова немного подписчиков, его посты опять
+        рассылаются, а пропущенные попадают в ленту сразу.
+        """
+        with override_settings(TIMELINE_FANOUT_LIMIT=0):
+            self.follow()
+            missed = Post.objects.create(
+                author=TimelineTests.author, text='Пропущенный пост'
+            )
+        follow = Follow.objects.get(user=TimelineTests.user)
+        self.assertTrue(follow.pull)
+        self.assertEqual(timeline.maintain(), (0, 1))
+        follow.refresh_from_db()
+        self.assertFalse(follow.pull)
+        new_post = Post.objects.create(
+            author=TimelineTests.author, text='Новый пост'
+        )
+        self.assertEqual(
+            set(TimelineTests.user.timeline.values_list('post', flat=True)),
+            {TimelineTests.old_post.pk, missed.pk, new_post.pk}
+        )
+
+
+class GraphTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.friend = User.objects.create_user(username='TestFriend')
+        cls.stranger = User.objects.create_user(username='TestStranger')
+        Follow.objects.create(user=cls.user, author=cls.friend)
+        Follow.objects.create(user=cls.friend, author=cls.user)
+        Follow.objects.create(user=cls.friend, author=cls.stranger)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(GraphTests.user)
+
+    def test_following_is_cached_until_follow_changes(self):
+        """
+        Подписки читаются из кэша, подписка и отписка его сбрасывают.
+        Кнопка подписки проверяется по базе.
+        """
+        user, stranger = GraphTests.user, GraphTests.stranger
+        authors = [GraphTests.friend.pk, stranger.pk]
+        self.assertEqual(
+            graph.followed_among(user, authors), {GraphTests.friend.pk}
+        )
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                graph.followed_among(user, authors), {GraphTests.friend.pk}
+            )
+        follow = Follow.objects.create(user=user, author=stranger)
+        self.assertEqual(graph.followed_among(user, authors), set(authors))
+        follow.delete()
+        self.assertEqual(
+            graph.followed_among(user, authors), {GraphTests.friend.pk}
+        )
+        # Подписка из другого процесса: кэш здесь не сброшен.
+        Follow.objects.bulk_create([Follow(user=user, author=stranger)])
+        with self.assertNumQueries(1):
+            self.assertTrue(graph.is_following(user, stranger.pk))
+
+    def test_feeds_mark_followed_authors(self):
+        """
+        В лентах отмечены посты авторов, на которых подписан читатель;
+        гость и другой читатель отметок не получают из общего кэша.
+        """
+        group = Group.objects.create(title='Группа', slug='graph-group')
+        for author in (GraphTests.friend, GraphTests.stranger):
+            Post.objects.create(author=author, text='Пост', group=group)
+        hot.rebuild()
+        group_url = reverse('posts:group_list', kwargs={'slug': group.slug})
+        urls = (reverse('posts:index'), group_url, reverse('posts:hot'))
+        for streaming in (False, True):
+            with self.subTest(streaming=streaming), override_settings(
+                FEED_STREAMING=streaming
+            ):
+                cache.clear()
+                for url in urls:
+                    content = self.authorized_client.get(url).getvalue()
+                    self.assertEqual(
+                        content.decode().count('вы подписаны'), 1
+                    )
+                    response = self.client.get(url)
+                    self.assertNotContains(response, 'вы подписаны')
+        etag = self.authorized_client.get(group_url)['ETag']
+        Follow.objects.create(user=GraphTests.user, author=GraphTests.stranger)
+        response = self.authorized_client.get(
+            group_url, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertContains(response, 'вы подписаны', count=2)
+
+    def test_mutual_follows(self):
+        """
+        Взаимные подписки видны обеим сторонам.
+        """
+        self.assertEqual(
+            graph.mutual_ids(GraphTests.user.pk), {GraphTests.friend.pk}
+        )
+        self.assertEqual(
+            graph.mutual_ids(GraphTests.friend.pk), {GraphTests.user.pk}
+        )
+        self.assertEqual(graph.mutual_ids(GraphTests.stranger.pk), set())
+
+    def test_follow_lists(self):
+        """
+        Списки подписчиков и подписок листаются по id, новые первыми.
+        """
+        readers = [
+            User.objects.create_user(username=f'TestReader{i}')
+            for i in range(3)
+        ]
+        for reader in readers:
+            Follow.objects.create(user=reader, author=GraphTests.stranger)
+        url = reverse(
+            'posts:followers',
+            kwargs={'username': GraphTests.stranger.username}
+        )
+        with override_settings(FOLLOWS_PER_PAGE=2):
+            first = self.authorized_client.get(url)
+            second = self.authorized_client.get(
+                f'{url}?cursor={first.context["page_obj"].next_cursor}'
+            )
+        self.assertEqual(
+            first.context['people'] + second.context['people'],
+            readers[::-1] + [GraphTests.friend]
+        )
+        self.assertEqual(first.context['followed'], set())
+        response = self.authorized_client.get(
+            reverse(
+                'posts:following',
+                kwargs={'username': GraphTests.friend.username}
+            )
+        )
+        self.assertEqual(
+            response.context['people'],
+            [GraphTests.stranger, GraphTests.user]
+        )
+        self.assertEqual(response.context['mutual'], {GraphTests.user.pk})
+
+    def test_suggestions_are_friends_of_friends(self):
+        """
+        Рекомендуются авторы, на которых подписаны авторы пользователя;
+        после подписки рекомендация пропадает.
+        """
+        graph.rebuild_suggestions()
+        self.assertEqual(
+            [s.author for s in graph.suggestions(GraphTests.user)],
+            [GraphTests.stranger]
+        )
+        self.assertFalse(
+            Suggestion.objects.filter(user=GraphTests.stranger).exists()
+        )
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertContains(response, GraphTests.stranger.username)
+        Follow.objects.create(
+            user=GraphTests.user, author=GraphTests.stranger
+        )
+        self.assertFalse(graph.suggestions(GraphTests.user).exists())
+
+
+@override_settings(FEED_STREAMING=True)
+class StreamingTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.author = User.objects.create_user(username='TestAuthor')
+        Follow.objects.create(user=cls.user, author=cls.author)
+        for i in range(settings.POST_PER_PAGE + 3):
+            Post.objects.create(
+                author=cls.author,
+                text=f'Тестовый пост #{i}',
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(StreamingTests.user)
+
+    def test_header_is_sent_before_feed_query(self):
+        """
+        Шапка отдается до выборки ленты, посты и паджинатор — следом.
+        """
+        # До шапки — только чтение поколения кэша.
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('posts:index'))
+            content = iter(response.streaming_content)
+            head = next(content).decode()
+        self.assertIn('<header>', head)
+        self.assertNotIn('Тестовый пост', head)
+        with self.assertNumQueries(1):
+            rest = b''.join(content).decode()
+        posts = re.findall(r'Тестовый пост #(\d+)', rest)
+        self.assertEqual(
+            posts, [str(i) for i in range(settings.POST_PER_PAGE + 2, 2, -1)]
+        )
+        self.assertIn('?cursor=', rest)
+        self.assertTrue(rest.rstrip().endswith('</body>'))
+
+    def test_streamed_article_is_cached(self):
+        """
+        Повторный запрос берет статью и страницу ленты из кэша.
+        """
+        url = reverse(
+            'posts:profile', kwargs={'username': StreamingTests.author}
+        )
+        first = b''.join(self.client.get(url).streaming_content)
+        # Остаются проверка условного GET, выборка профиля
+        # и поколение кэша.
+        with self.assertNumQueries(3):
+            second = b''.join(self.client.get(url).streaming_content)
+        self.assertEqual(first, second)
+
+    def test_follow_index_streams(self):
+        """
+        Лента подписок тоже отдается частями.
+        """
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertTrue(response.streaming)
+        content = b''.join(response.streaming_content).decode()
+        self.assertEqual(
+            content.count('Тестовый пост'), settings.POST_PER_PAGE
+        )
+
+
+class AtomFeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='TestAuthor', first_name='Лев', last_name='Толстой'
+        )
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other-slug',
+            description='Другое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.author,
+            text='Пост в группе',
+            group=cls.group,
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_feeds(self):
+        """
+        Ленты сайта, группы и автора отдаются в формате Atom.
+        """
+        urls = (
+            reverse('posts:feed'),
+            reverse('posts:group_feed', kwargs={'slug': 'test-slug'}),
+            reverse('posts:profile_feed', kwargs={'username': 'TestAuthor'}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertTrue(
+                    response['Content-Type'].startswith(
+                        'application/atom+xml'
+                    )
+                )
+                content = response.content.decode()
+                self.assertIn('Пост в группе', content)
+                self.assertIn('Лев Толстой', content)
+        response = self.client.get(
+            reverse('posts:group_feed', kwargs={'slug': 'missing'})
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_polling_is_served_from_cache(self):
+        """
+        Повторный опрос читает из базы только версии лент, а клиент
+        с актуальной копией получает 304.
+        """
+        url = reverse('posts:group_feed', kwargs={'slug': 'test-slug'})
+        first = self.client.get(url)
+        with self.assertNumQueries(1):
+            second = self.client.get(url)
+        self.assertEqual(first.content, second.content)
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                url, HTTP_IF_NONE_MATCH=first['ETag']
+            )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        response = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified']
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_only_affected_feeds_are_rebuilt(self):
+        """
+        Новый пост обновляет ленты своей группы, автора и сайта,
+        ленты других групп остаются в кэше.
+        """
+        group_url = reverse('posts:group_feed', kwargs={'slug': 'test-slug'})
+        other_url = reverse(
+            'posts:group_feed', kwargs={'slug': 'other-slug'}
+        )
+        urls = (reverse('posts:feed'), group_url, reverse(
+            'posts:profile_feed', kwargs={'username': 'TestAuthor'}
+        ))
+        etags = {url: self.client.get(url)['ETag'] for url in urls}
+        self.client.get(other_url)
+        Post.objects.create(
+            author=AtomFeedTests.author,
+            text='Новый пост',
+            group=AtomFeedTests.group,
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertNotEqual(response['ETag'], etags[url])
+                self.assertIn('Новый пост', response.content.decode())
+        with self.assertNumQueries(1):
+            self.client.get(other_url)
+        # Пост из другого процесса, со своим локальным кэшем.
+        etag = self.client.get(group_url)['ETag']
+        with mock.patch.object(feeds, 'cache', LocMemCache('other', {})):
+            Post.objects.create(
+                author=AtomFeedTests.author, text='Из другого процесса',
+                group=AtomFeedTests.group,
+            )
+        self.assertNotEqual(self.client.get(group_url)['ETag'], etag)
+
+    def test_cached_links_follow_host_and_scheme(self):
+        """Документ в кэше свой для каждой схемы и хоста."""
+        url = reverse('posts:feed')
+        self.client.get(url)
+        response = self.client.get(url, secure=True)
+        self.assertIn('https://testserver/', response.content.decode())
+        response = self.client.get(url, HTTP_HOST='localhost')
+        content = response.content.decode()
+        self.assertIn('http://localhost/', content)
+        self.assertNotIn('testserver', content)
+
+    def test_renamed_feeds_are_not_served_from_cache(self):
+        """После переименования лента по старому адресу — 404."""
+        urls = {
+            'group': reverse(
+                'posts:group_feed', kwargs={'slug': 'test-slug'}
+            ),
+            'author': reverse(
+                'posts:profile_feed', kwargs={'username': 'TestAuthor'}
+            ),
+        }
+        for url in urls.values():
+            self.assertEqual(self.client.get(url).status_code, HTTPStatus.OK)
+        group = Group.objects.get(slug='test-slug')
+        group.slug = 'new-slug'
+        group.save()
+        author = User.objects.get(username='TestAuthor')
+        author.username = 'NewName'
+        author.save()
+        for url in urls.values():
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.client.get(url).status_code, HTTPStatus.NOT_FOUND
+                )
+
+
+class HotTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='TestReader')
+        cls.author = User.objects.create_user(username='TestAuthor')
+        cls.star = User.objects.create_user(username='TestStar')
+        for i in range(30):
+            follower = User.objects.create_user(username=f'TestFan{i}')
+            Follow.objects.create(user=follower, author=cls.star)
+        cls.quiet_post = Post.objects.create(
+            author=cls.author,
+            text='Пост без комментариев',
+        )
+        cls.star_post = Post.objects.create(
+            author=cls.star,
+            text='Пост автора с подписчиками',
+        )
+        cls.discussed_post = Post.objects.create(
+            author=cls.author,
+            text='Обсуждаемый пост',
+        )
+        for i in range(5):
+            Comment.objects.create(
+                post=cls.discussed_post,
+                author=cls.reader,
+                text=f'Комментарий #{i}',
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_hot_feed_ranking(self):
+        """
+        Рейтинг учитывает комментарии и подписчиков автора.
+        """
+        self.assertEqual(hot.rebuild(), 3)
+        response = self.client.get(reverse('posts:hot'))
+        self.assertTemplateUsed(response, 'posts/hot.html')
+        self.assertEqual(
+            list(response.context['page_obj']),
+            [
+                HotTests.discussed_post,
+                HotTests.star_post,
+                HotTests.quiet_post,
+            ]
+        )
+
+    def test_old_posts_cool_down(self):
+        """
+        Старые посты без свежих комментариев выпадают из рейтинга.
+        """
+        later = timezone.now() + timedelta(
+            hours=settings.HOT_WINDOW_HOURS + 1
+        )
+        self.assertEqual(hot.rebuild(now=later), 0)
+        self.assertFalse(HotPost.objects.exists())
+        self.assertGreater(
+            hot.score(5, 0, 1), hot.score(5, 0, 10)
+        )
+
+    def test_version_is_shared_between_processes(self):
+        """
+        Версия рейтинга хранится в базе: пересборку в другом процессе
+        видно и без общего кэша.
+        """
+        hot.rebuild()
+        before = hot.version()
+        cache.clear()
+        self.assertEqual(hot.version(), before)
+        hot.rebuild()
+        self.assertNotEqual(hot.version(), before)
+
+    @override_settings(POST_PER_PAGE=2)
+    def test_hot_feed_pages(self):
+        """
+        Лента читается страницами и обновляется после пересборки.
+        """
+        hot.rebuild()
+        response = self.client.get(reverse('posts:hot'))
+        page = response.context['page_obj']
+        self.assertTrue(page.has_next())
+        response = self.client.get(
+            f'{reverse("posts:hot")}?cursor={page.next_cursor}'
+        )
+        self.assertEqual(
+            list(response.context['page_obj']), [HotTests.quiet_post]
+        )
+        for i in range(6):
+            HotTests.quiet_post.comments.create(
+                author=HotTests.reader, text=f'Свежий комментарий #{i}'
+            )
+        call_command('rebuild_hot_posts', stdout=StringIO())
+        response = self.client.get(reverse('posts:hot'))
+        self.assertIn(HotTests.quiet_post, response.context['page_obj'])
+
+    def test_hot_page_out_of_range(self):
+        """Номер страницы больше bigint — пустая страница, не 500."""
+        hot.rebuild()
+        for query in ({'page': 10 ** 20}, {'cursor': 10 ** 20}):
+            with self.subTest(query=query):
+                response = self.client.get(reverse('posts:hot'), query)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertEqual(list(response.context['page_obj']), [])
+
+
+class CommentPagesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='TestAuthor')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+        # Каждый комментарий — от своего автора, чтобы N+1 был заметен.
+        for i in range(settings.COMMENTS_PER_PAGE + 5):
+            Comment.objects.create(
+                post=cls.post,
+                author=User.objects.create_user(username=f'Reader{i}'),
+                text=f'Комментарий #{i}',
+            )
+
+    def test_post_detail_shows_first_page_of_comments(self):
+        """
+        На странице поста — первая страница комментариев, новые первыми.
+        """
+        # Валидаторы условного GET, пост с автором и группой,
+        # страница комментариев с авторами.
+        with self.assertNumQueries(3):
+            response = self.client.get(
+                reverse(
+                    'posts:post_detail',
+                    kwargs={'post_id': CommentPagesTests.post.pk}
+                )
+            )
+        comments = list(response.context['comments'])
+        self.assertEqual(len(comments), settings.COMMENTS_PER_PAGE)
+        self.assertEqual(comments[0].text, 'Комментарий #24')
+        self.assertTrue(response.context['comments'].has_next())
+        self.assertContains(response, 'data-comments-more')
+
+    def test_next_chunk_of_comments(self):
+        """
+        Ссылка «Показать еще» отдает оставшиеся комментарии.
+        """
+        response = self.client.get(
+            reverse(
+                'posts:post_detail',
+                kwargs={'post_id': CommentPagesTests.post.pk}
+            )
+        )
+        next_url = reverse(
+            'posts:post_comments',
+            kwargs={'post_id': CommentPagesTests.post.pk}
+        ) + '?cursor=' + response.context['comments'].next_cursor
+        response = self.client.get(next_url)
+        self.assertEqual(
+            [comment.text for comment in response.context['comments']],
+            [f'Комментарий #{i}' for i in range(4, -1, -1)]
+        )
+        self.assertNotContains(response, 'data-comments-more')
+
+    def test_comments_pages_without_js(self):
+        """
+        Без JS «Показать еще» ведет на страницу поста со следующей
+        порцией комментариев.
+        """
+        url = reverse(
+            'posts:post_detail', kwargs={'post_id': CommentPagesTests.post.pk}
+        )
+        response = self.client.get(url)
+        cursor = response.context['comments'].next_cursor
+        self.assertContains(
+            response, f'href="{url}?cursor={cursor}#comments"'
+        )
+        response = self.client.get(url, {'cursor': cursor})
+        self.assertEqual(
+            [comment.text for comment in response.context['comments']],
+            [f'Комментарий #{i}' for i in range(4, -1, -1)]
+        )
+        self.assertContains(response, 'Пост')
+
+    def test_comments_of_missing_post(self):
+        """Порция комментариев несуществующего поста — 404."""
+        response = self.client.get(
+            reverse('posts:post_comments', kwargs={'post_id': 0})
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='TestAuthor')
+        cls.reader = User.objects.create_user(username='TestReader')
+        cls.group = Group.objects.create(title='Группа', slug='test-slug')
+        cls.post = Post.objects.create(
+            author=cls.author, text='Пост', group=cls.group
+        )
+        cls.urls = (
+            reverse(
+                'posts:post_detail',
+                kwargs={'post_id': cls.post.pk}
+            ),
+            reverse(
+                'posts:profile',
+                kwargs={'username': cls.author.username}
+            ),
+            reverse(
+                'posts:group_list',
+                kwargs={'slug': cls.group.slug}
+            ),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(ConditionalGetTests.reader)
+
+    def test_unchanged_page_is_not_rendered(self):
+        """
+        Совпавший ETag — 304 одним запросом к базе, без шаблона.
+        """
+        for url in ConditionalGetTests.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                with self.assertNumQueries(1):
+                    cached = self.client.get(
+                        url, HTTP_IF_NONE_MATCH=response['ETag']
+                    )
+                self.assertEqual(cached.status_code, 304)
+                self.assertEqual(cached.templates, [])
+
+    def test_if_modified_since_alone_is_not_trusted(self):
+        """
+        Без ETag дата не дает 304: после подписки и для гостя с датой
+        вошедшего пользователя страница отрисовывается заново.
+        """
+        since = http_date(time.time() + 60)
+        profile = ConditionalGetTests.urls[1]
+        response = self.reader_client.get(profile)
+        self.assertNotIn('Last-Modified', response)
+        Follow.objects.create(
+            user=ConditionalGetTests.reader, author=ConditionalGetTests.author
+        )
+        for client in (self.reader_client, self.client):
+            for url in ConditionalGetTests.urls:
+                with self.subTest(url=url):
+                    response = client.get(url, HTTP_IF_MODIFIED_SINCE=since)
+                    self.assertEqual(response.status_code, 200)
+
+    def test_writes_change_etag(self):
+        """Новый пост меняет ETag всех страниц."""
+        etags = [self.client.get(url)['ETag'] for url in self.urls]
+        Post.objects.create(
+            author=ConditionalGetTests.author,
+            text='Новый пост',
+            group=ConditionalGetTests.group,
+        )
+        for url, etag in zip(ConditionalGetTests.urls, etags):
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_unrelated_writes_keep_etag(self):
+        """
+        Запись в другом месте сайта не меняет валидаторы страниц.
+        """
+        responses = [self.client.get(url) for url in self.urls]
+        other = User.objects.create_user(username='TestOther')
+        Post.objects.create(author=other, text='Чужой пост')
+        Group.objects.create(title='Другая группа', slug='other')
+        for url, response in zip(ConditionalGetTests.urls, responses):
+            with self.subTest(url=url):
+                cached = self.client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag']
+                )
+                self.assertEqual(cached.status_code, 304)
+
+    def test_post_edit_changes_etag(self):
+        """Правка поста меняет ETag его страницы, профиля и группы."""
+        etags = [self.client.get(url)['ETag'] for url in self.urls]
+        post = ConditionalGetTests.post
+        post.text = 'Исправленный пост'
+        post.save()
+        for url, etag in zip(ConditionalGetTests.urls, etags):
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_new_comment_changes_post_etag(self):
+        """Новый комментарий меняет ETag страницы поста."""
+        url = ConditionalGetTests.urls[0]
+        etag = self.client.get(url)['ETag']
+        Comment.objects.create(
+            post=ConditionalGetTests.post,
+            author=ConditionalGetTests.reader,
+            text='Комментарий',
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_guest_and_user_etags_differ(self):
+        """Гость и вошедший пользователь получают разные ETag."""
+        for url in ConditionalGetTests.urls:
+            with self.subTest(url=url):
+                guest_etag = self.client.get(url)['ETag']
+                response = self.reader_client.get(
+                    url, HTTP_IF_NONE_MATCH=guest_etag
+                )
+                self.assertEqual(response.status_code, 200)
+
+    def test_follow_changes_profile_etag(self):
+        """Подписка меняет ETag профиля у подписчика."""
+        url = ConditionalGetTests.urls[1]
+        etag = self.reader_client.get(url)['ETag']
+        Follow.objects.create(
+            user=ConditionalGetTests.reader,
+            author=ConditionalGetTests.author,
+        )
+        response = self.reader_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['following'])
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='TestAuthor')
+        cls.cats = Post.objects.create(
+            author=cls.author,
+            text='Котики спят, котики едят. Котиков много не бывает.',
+        )
+        cls.one_cat = Post.objects.create(
+            author=cls.author,
+            text='Рыжий котик и собаки во дворе.',
+        )
+        cls.dogs = Post.objects.create(
+            author=cls.author,
+            text='Собаки лают.',
+        )
+        cls.comment = Comment.objects.create(
+            post=cls.dogs,
+            author=cls.author,
+            text='А у соседа живет кот Барсик.',
+        )
+
+    def search(self, query):
+        response = self.client.get(reverse('posts:search'), {'q': query})
+        return list(response.context['page_obj'])
+
+    def test_stemmer(self):
+        """Стеммер приводит формы слова к одной основе."""
+        words = {
+            'котики': 'котик',
+            'котиков': 'котик',
+            'красивейшими': 'красив',
+            'путешествовавшими': 'путешествова',
+            'программирование': 'программирован',
+        }
+        for word, expected in words.items():
+            with self.subTest(word=word):
+                self.assertEqual(stem(word), expected)
+
+    def test_search_finds_word_forms_ranked(self):
+        """
+        Поиск находит другие формы слова, частые совпадения выше.
+        """
+        self.assertEqual(
+            self.search('котика'),
+            [SearchTests.cats, SearchTests.one_cat]
+        )
+
+    def test_all_query_words_rank_first(self):
+        """Посты со всеми словами запроса выше постов с одним словом."""
+        self.assertEqual(
+            self.search('котик собака')[0], SearchTests.one_cat
+        )
+
+    def test_search_in_comments(self):
+        """Совпадение в комментарии находит пост."""
+        self.assertEqual(self.search('Барсика'), [SearchTests.dogs])
+
+    def test_index_follows_edits_and_deletes(self):
+        """Индекс обновляется при правке и удалении."""
+        SearchTests.dogs.text = 'Кошки мяукают.'
+        SearchTests.dogs.save()
+        self.assertEqual(self.search('лают'), [])
+        self.assertEqual(self.search('кошка'), [SearchTests.dogs])
+        SearchTests.comment.delete()
+        self.assertEqual(self.search('Барсик'), [])
+
+    def test_empty_query(self):
+        """Пустой запрос и стоп-слова ничего не находят."""
+        self.assertEqual(self.search(''), [])
+        self.assertEqual(self.search('и во'), [])
+
+    def test_admin_search(self):
+        """Поиск в админке идет по индексу постов и комментариев."""
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'собак'}
+        )
+        self.assertEqual(
+            set(response.context['cl'].result_list),
+            {SearchTests.one_cat, SearchTests.dogs}
+        )
+        response = self.client.get(
+            reverse('admin:posts_comment_changelist'), {'q': 'барсик'}
+        )
+        self.assertEqual(
+            list(response.context['cl'].result_list), [SearchTests.comment]
+        )
+
+    def test_admin_search_is_not_truncated(self):
+        """
+        Поиск в админке находит все совпадения, а числа и стоп-слова,
+        которых нет в индексе, ищет как раньше через LIKE.
+        """
+        author = User.objects.create_user(username='Counter')
+        Post.objects.bulk_create([
+            Post(author=author, text=f'Рыбка номер {i}') for i in range(30)
+        ])
+        posts = Post.objects.filter(author=author).order_by('pk')
+        search.index_posts(posts)
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        self.client.force_login(admin)
+        url = reverse('admin:posts_post_changelist')
+        with mock.patch.object(PostAdmin, 'list_per_page', 10):
+            response = self.client.get(url, {'q': 'рыбка', 'p': 2})
+        self.assertEqual(len(response.context['cl'].result_list), 10)
+        for query, expected in (
+            ('номер 17', {posts[17]}),
+            ('17', {posts[17]}),
+            ('и', set(Post.objects.filter(text__icontains='и'))),
+        ):
+            with self.subTest(query=query):
+                response = self.client.get(url, {'q': query})
+                self.assertEqual(
+                    set(response.context['cl'].result_list), expected
+                )
+
+
+class AdminTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='TestAuthor')
+        cls.group = Group.objects.create(title='Группа', slug='test-slug')
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, group=cls.group if i % 2 else None,
+                text=f'Пост, номер {i}'
+            ) for i in range(5)
+        ]
+        Comment.objects.create(
+            post=cls.posts[0], author=cls.author, text='Первый "коммент"'
+        )
+
+    def setUp(self):
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        self.client.force_login(admin)
+
+    def rows(self, response):
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        content = b''.join(response.streaming_content).decode()
+        return list(csv.reader(StringIO(content)))
+
+    def test_changelist_export(self):
+        """Выгрузка списка потоком учитывает фильтры списка."""
+        url = reverse('admin:posts_post_export')
+        response = self.client.get(
+            reverse('admin:posts_post_changelist')
+        )
+        self.assertContains(response, 'export/')
+        rows = self.rows(self.client.get(url))
+        self.assertEqual(rows[0], list(PostAdmin.export_fields))
+        self.assertEqual(
+            [row[1] for row in rows[1:]],
+            [post.text for post in AdminTests.posts]
+        )
+        self.assertEqual(rows[2][3:5], ['TestAuthor', 'test-slug'])
+        rows = self.rows(self.client.get(url, {'group__isnull': 'True'}))
+        self.assertEqual(len(rows), 4)
+
+    def test_export_action(self):
+        """Действие выгружает только выбранные комментарии."""
+        comment = Comment.objects.get()
+        Comment.objects.create(
+            post=AdminTests.posts[1], author=self.author, text='Второй'
+        )
+        response = self.client.post(
+            reverse('admin:posts_comment_changelist'),
+            {'action': 'export_csv', '_selected_action': [comment.pk]},
+        )
+        rows = self.rows(response)
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[1][3], 'Первый "коммент"')
+
+    def changelist(self, model, data=None):
+        url = reverse(f'admin:posts_{model}_changelist')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, data or {})
+        self.assertEqual(response.status_code, 200)
+        return response.context['cl'], len(queries)
+
+    def test_changelist_queries_do_not_grow(self):
+        """Число запросов списка не зависит от числа строк."""
+        models = ('post', 'comment')
+        before = [self.changelist(model)[1] for model in models]
+        for i in range(5):
+            post = Post.objects.create(
+                author=User.objects.create_user(f'user-{i}'),
+                group=Group.objects.create(title='Группа', slug=f'slug-{i}'),
+                text='Еще пост'
+            )
+            Comment.objects.create(
+                post=post, author=self.author, text='Еще коммент'
+            )
+        after = [self.changelist(model)[1] for model in models]
+        self.assertEqual(after, before)
+        response = self.client.get(reverse('admin:posts_post_changelist'))
+        self.assertContains(
+            response, f'<option value="{post.group.pk}" selected>'
+        )
+
+    def test_changelist_group_select(self):
+        """Выбор группы в списке рисуется без шаблонов и экранируется."""
+        group = Group.objects.create(title='<b>Жирная</b>', slug='bold')
+        response = self.client.get(reverse('admin:posts_post_changelist'))
+        cl = response.context['cl']
+        self.assertIsInstance(
+            cl.formset.forms[0].fields['group'].widget, ChangelistSelect
+        )
+        self.assertContains(
+            response,
+            f'<option value="{group.pk}">&lt;b&gt;Жирная&lt;/b&gt;</option>'
+        )
+        self.assertContains(response, '<option value="">---------</option>')
+
+    def test_date_hierarchy_without_table_scan(self):
+        """Иерархия дат строится по крайним датам, без DISTINCT."""
+        post = AdminTests.posts[0]
+        year = post.pub_date.year - 2
+        Post.objects.filter(pk=post.pk).update(
+            pub_date=post.pub_date.replace(year=year)
+        )
+        url = reverse('admin:posts_post_changelist')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertFalse(
+            [query for query in queries if 'DISTINCT' in query['sql']]
+        )
+        for link in (year, year + 1, year + 2):
+            self.assertContains(response, f'?pub_date__year={link}"')
+        response = self.client.get(url, {'pub_date__year': year})
+        self.assertContains(
+            response, f'?pub_date__month={post.pub_date.month}&amp;'
+        )
+
+    def test_changelist_estimated_count(self):
+        """Большая таблица без фильтров считается по оценке."""
+        Post.objects.filter(pk=AdminTests.posts[0].pk).delete()
+        with mock.patch.object(EstimatedCountPaginator, 'threshold', 1):
+            changelist = self.changelist('post')[0]
+            self.assertEqual(
+                changelist.result_count, AdminTests.posts[-1].pk
+            )
+            changelist = self.changelist('post', {'group__isnull': 'True'})[0]
+            self.assertEqual(changelist.result_count, 2)
+        changelist = self.changelist('post')[0]
+        self.assertEqual(changelist.result_count, 4)
+
+    def test_export_requires_staff(self):
+        """Гость не получает выгрузку."""
+        self.client.logout()
+        response = self.client.get(reverse('admin:posts_post_export'))
+        self.assertEqual(response.status_code, 302)
+
+
+class BenchmarkTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        seed(users=5, groups=2, posts=30, comments=20, follows=3, images=0)
+        cls.output_dir = tempfile.mkdtemp()
+        cls.output = os.path.join(cls.output_dir, 'benchmark.json')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.output_dir, ignore_errors=True)
+        super().tearDownClass()
+
+    def benchmark(self, **options):
+        call_command(
+            'benchmark', requests=2, concurrency=1, warmup=0,
+            stdout=StringIO(), **options
+        )
+
+    def test_seed_fills_counters_and_timeline(self):
+        """Сгенерированные данные согласованы со счетчиками и лентами."""
+        self.assertEqual(Post.objects.count(), 30)
+        self.assertTrue(TimelineEntry.objects.exists())
+        self.assertFalse(any(counters.rebuild(check=True).values()))
+
+    def test_benchmark_covers_every_route(self):
+        """Прогон проходит по всем адресам posts и лентам API."""
+        self.benchmark(output=BenchmarkTests.output)
+        with open(BenchmarkTests.output) as output:
+            results = json.load(output)['results']
+        api = {
+            'api:post_list', 'api:group_posts', 'api:profile_posts',
+            'api:post_detail', 'api:post_batch', 'api:post_comments',
+            'api:hot',
+            'api:follow_feed',
+        }
+        self.assertEqual(
+            set(results), {pattern.name for pattern in urlpatterns} | api
+        )
+        for name, summary in results.items():
+            with self.subTest(name=name):
+                self.assertEqual(summary['errors'], 0)
+                self.assertEqual(summary['requests'], 2)
+
+    def test_mixed_run_is_concurrent(self):
+        """Сценарии смешанного прогона выполняются одновременно."""
+        running, overlaps = set(), []
+
+        def request(client, scenario, number):
+            running.add(scenario.name)
+            time.sleep(0.05)
+            overlaps.append(len(running))
+            running.discard(scenario.name)
+            return benchmark.Sample(0.05, 1, 200)
+
+        selected = [
+            benchmark.Scenario('reads', paths=['/']),
+            benchmark.Scenario('writes', 'post', ['/create/']),
+        ]
+        with mock.patch('core.benchmark._request', request):
+            results = benchmark.run_mixed(selected, 3)
+        self.assertEqual(set(results), {'reads', 'writes'})
+        self.assertEqual(results['writes']['requests'], 3)
+        self.assertEqual(max(overlaps), 2)
+
+    def test_benchmark_reports_regressions(self):
+        """Сравнение с более быстрым прогоном завершается ошибкой."""
+        with open(BenchmarkTests.output, 'w') as baseline:
+            json.dump({'results': {'index': {'p95': 0.001}}}, baseline)
+        with self.assertRaises(CommandError):
+            self.benchmark(
+                only=['index'],
+                compare=BenchmarkTests.output,
+                stderr=StringIO(),
+            )
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN из SQLite')
+class FeedQueryPlanTests(TestCase):
+    # Полный проход по таблице (SCAN без индекса) или сортировка
+    # во временном B-дереве.
+    BAD_PLAN = re.compile(r'^SCAN (TABLE )?\w+$|TEMP B-TREE')
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.authorized_client = Client()
+        cls.authorized_client.force_login(cls.user)
+        cls.author = User.objects.create_user(username='TestAuthor')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+        for i in range(settings.POST_PER_PAGE + 3):
+            cls.post = Post.objects.create(
+                author=cls.author,
+                text=f'Тестовый пост #{i}',
+                group=cls.group,
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def assertQueriesUseIndexes(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.authorized_client.get(url)
+        for query in queries:
+            if not query['sql'].startswith('SELECT'):
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN QUERY PLAN ' + query['sql'])
+                plan = [row[-1] for row in cursor.fetchall()]
+            with self.subTest(url=url, sql=query['sql']):
+                self.assertFalse(
+                    any(self.BAD_PLAN.search(step) for step in plan), plan
+                )
+        return response
+
+    def test_feed_queries_use_indexes(self):
+        """
+        Запросы лент и страницы поста не читают таблицу целиком
+        и не сортируют выборку.
+        """
+        urls = (
+            reverse('posts:index'),
+            reverse(
+                'posts:group_list',
+                kwargs={'slug': FeedQueryPlanTests.group.slug}
+            ),
+            reverse(
+                'posts:profile',
+                kwargs={'username': FeedQueryPlanTests.author.username}
+            ),
+            reverse('posts:follow_index'),
+            reverse('posts:hot'),
+        )
+        hot.rebuild()
+        for url in urls:
+            response = self.assertQueriesUseIndexes(url)
+            page = response.context['page_obj']
+            self.assertQueriesUseIndexes(f'{url}?cursor={page.next_cursor}')
+            self.assertQueriesUseIndexes(f'{url}?page=2')
+        self.assertQueriesUseIndexes(
+            reverse(
+                'posts:post_detail',
+                kwargs={'post_id': FeedQueryPlanTests.post.pk}
+            )
+        )
@@ -0,0 +1,108 @@
+"""
+Фоновая подготовка миниатюр картинок постов.
+
+После сохранения поста миниатюры всех размеров из POST_THUMBNAILS
+ставятся в очередь пула потоков. Шаблоны берут только готовые
+миниатюры из хранилища sorl и до их появления показывают заглушку.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models.functions import Now
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+
+from .feed_cache import bump_generation
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_pending = set()
+_lock = threading.Lock()
+
+
+class ReadyThumbnailBackend(ThumbnailBackend):
+    def get_ready_thumbnail(self, file_, geometry_string, **options):
+        """
+        Готовая миниатюра или None. В отличие от get_thumbnail,
+        не читает оригинал и ничего не создает.
+        """
+        source = ImageFile(file_)
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return default.kvstore.get(ImageFile(name, default.storage))
+
+
+backend = ReadyThumbnailBackend()
+
+
+def get_ready_thumbnail(image, geometry):
+    return backend.get_ready_thumbnail(
+        image, geometry, **settings.POST_THUMBNAILS[geometry]
+    )
+
+
+def generate_thumbnails(image_name):
+    """Создает миниатюры всех размеров для одной картинки."""
+    for geometry, options in settings.POST_THUMBNAILS.items():
+        get_thumbnail(image_name, geometry, **options)
+
+
+def touch_posts(image_name):
+    """Посты с готовой картинкой: их страницы больше не с заглушкой."""
+    Post.objects.filter(image=image_name).update(updated=Now())
+
+
+def _generate(image_name):
+    try:
+        generate_thumbnails(image_name)
+        touch_posts(image_name)
+        bump_generation()
+    except Exception:
+        logger.exception('Не удалось создать миниатюры для %s', image_name)
+    finally:
+        with _lock:
+            _pending.discard(image_name)
+
+
+def _generate_in_worker(image_name):
+    try:
+        _generate(image_name)
+    finally:
+        # У фонового потока нет запросов, по которым истекает
+        # CONN_MAX_AGE: соединение между задачами не держим.
+        # В потоке запроса соединения закрывает сам Django.
+        connections.close_all()
+
+
+def _submit(image_name):
+    global _executor
+    with _lock:
+        if image_name in _pending:
+            return
+        _pending.add(image_name)
+        if settings.THUMBNAIL_WORKERS and _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails',
+            )
+    if settings.THUMBNAIL_WORKERS:
+        _executor.submit(_generate_in_worker, image_name)
+    else:
+        _generate(image_name)
+
+
+def queue_thumbnails(post):
+    """Ставит миниатюры картинки поста в очередь после коммита."""
+    if post.image:
+        image_name = post.image.name
+        transaction.on_commit(lambda: _submit(image_name))
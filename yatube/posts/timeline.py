@@ -0,0 +1,238 @@
+"""
+Материализованная лента подписок.
+
+Новый пост рассылается в ленты подписчиков автора, поэтому follow_index
+читает готовый ограниченный список id. Посты авторов с большим числом
+подписчиков не рассылаются: такие подписки помечены флагом Follow.pull,
+а их посты TimelinePaginator читает одним запросом по всем таким
+авторам и сливает с записями ленты. Чтение ленты ничего не пишет.
+
+Рассылка не обрезает ленты: это запрос на каждого подписчика. Ленты
+длиннее TIMELINE_LENGTH обрезает maintain() (команда
+maintain_timelines), она же возвращает рассылку авторам, у которых
+подписчиков снова стало меньше TIMELINE_FANOUT_LIMIT.
+"""
+import heapq
+from functools import partial
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import Count, Exists, F, OuterRef
+
+from .models import Follow, Post, TimelineEntry
+from .paginator import CursorPaginator
+
+
+def has_many_followers(author_id):
+    return Follow.objects.filter(author_id=author_id).values('pk')[
+        settings.TIMELINE_FANOUT_LIMIT:settings.TIMELINE_FANOUT_LIMIT + 1
+    ].exists()
+
+
+def fan_out(post):
+    """Рассылает новый пост в ленты подписчиков автора."""
+    if has_many_followers(post.author_id):
+        Follow.objects.filter(author_id=post.author_id, pull=False).update(
+            pull=True
+        )
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id, pull=False
+    ).values_list('user_id', flat=True)
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+            for user_id in followers
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def backfill(follow):
+    """Заполняет ленту подписчика последними постами нового автора."""
+    if has_many_followers(follow.author_id):
+        Follow.objects.filter(pk=follow.pk).update(pull=True)
+        return
+    posts = Post.objects.filter(author_id=follow.author_id).order_by(
+        '-pub_date'
+    ).values_list('pk', 'pub_date')[:settings.TIMELINE_LENGTH]
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(user_id=follow.user_id, post_id=pk, pub_date=date)
+            for pk, date in posts
+        ],
+        ignore_conflicts=True,
+    )
+    trim(follow.user_id)
+
+
+def prune(follow):
+    """Убирает из ленты посты автора, от которого отписались."""
+    TimelineEntry.objects.filter(
+        user_id=follow.user_id, post__author_id=follow.author_id
+    ).delete()
+
+
+def trim(user_id):
+    """Оставляет в ленте не больше TIMELINE_LENGTH записей."""
+    oldest_kept = TimelineEntry.objects.filter(user_id=user_id).order_by(
+        '-pub_date'
+    ).values_list('pub_date', flat=True)[
+        settings.TIMELINE_LENGTH - 1:settings.TIMELINE_LENGTH
+    ]
+    oldest_kept = list(oldest_kept)
+    if oldest_kept:
+        TimelineEntry.objects.filter(
+            user_id=user_id, pub_date__lt=oldest_kept[0]
+        ).delete()
+
+
+def _pull_follow(follow):
+    """Добавляет в ленту посты автора, вышедшие после pulled_at."""
+    posts = Post.objects.filter(author_id=follow.author_id)
+    if follow.pulled_at is not None:
+        posts = posts.filter(pub_date__gt=follow.pulled_at)
+    posts = list(posts.order_by('-pub_date').values_list(
+        'pk', 'pub_date'
+    )[:settings.TIMELINE_LENGTH])
+    if not posts:
+        return False
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(user_id=follow.user_id, post_id=pk, pub_date=date)
+            for pk, date in posts
+        ],
+        ignore_conflicts=True,
+    )
+    Follow.objects.filter(pk=follow.pk).update(pulled_at=posts[0][1])
+    return True
+
+
+def trim_all():
+    """Обрезает ленты длиннее TIMELINE_LENGTH. Возвращает их число."""
+    users = list(
+        TimelineEntry.objects.order_by().values('user_id').annotate(
+            total=Count('pk')
+        ).filter(total__gt=settings.TIMELINE_LENGTH).values_list(
+            'user_id', flat=True
+        )
+    )
+    for user_id in users:
+        trim(user_id)
+    return len(users)
+
+
+def push_again():
+    """
+    Возвращает рассылку авторам, у которых подписчиков снова немного.
+    Флаг снимается до догрузки: пост, вышедший в это время, разошлет
+    fan_out, а повтор отсечет ignore_conflicts.
+    """
+    authors = list(
+        Follow.objects.filter(pull=True).order_by().values_list(
+            'author_id', flat=True
+        ).distinct()
+    )
+    switched = 0
+    for author_id in authors:
+        if has_many_followers(author_id):
+            continue
+        follows = list(
+            Follow.objects.filter(author_id=author_id, pull=True).only(
+                'user', 'author', 'pulled_at'
+            )
+        )
+        Follow.objects.filter(
+            pk__in=[follow.pk for follow in follows]
+        ).update(pull=False)
+        for follow in follows:
+            if _pull_follow(follow):
+                trim(follow.user_id)
+        switched += 1
+    return switched
+
+
+def maintain():
+    """Обслуживание лент: (обрезано лент, авторов снова с рассылкой)."""
+    return trim_all(), push_again()
+
+
+def timeline_entries(user):
+    """Записи материализованной ленты подписок."""
+    return TimelineEntry.objects.filter(user_id=user.pk).only(
+        'pub_date', 'post'
+    )
+
+
+def pulled_posts(user):
+    """
+    Посты авторов без рассылки, которых еще нет в ленте (в нее они
+    попадают, пока у автора было мало подписчиков), в виде записей:
+    с pub_date и post_id. None, если таких авторов нет.
+    """
+    authors = list(
+        Follow.objects.filter(user_id=user.pk, pull=True).values_list(
+            'author_id', flat=True
+        )
+    )
+    if not authors:
+        return None
+    return Post.objects.filter(author_id__in=authors).annotate(
+        post_id=F('pk'),
+        in_timeline=Exists(TimelineEntry.objects.filter(
+            user_id=user.pk, post_id=OuterRef('pk')
+        )),
+    ).filter(in_timeline=False).only('pub_date')
+
+
+def timeline_paginator(user):
+    """Паджинатор ленты подписок пользователя для pagination()."""
+    return partial(TimelinePaginator, pulled=pulled_posts(user))
+
+
+def _merge(row_lists, limit, descending=True):
+    rows = heapq.merge(
+        *row_lists,
+        key=lambda row: (row.pub_date, row.post_id),
+        reverse=descending,
+    )
+    return list(islice(rows, limit))
+
+
+class TimelinePaginator(CursorPaginator):
+    """
+    Листает записи ленты по индексу (user, pub_date, post)
+    и подгружает посты страницы одним запросом. Посты авторов без
+    рассылки (pulled) листаются тем же ключом и сливаются с записями.
+    """
+    key_field = 'post_id'
+
+    def __init__(self, object_list, per_page, pulled=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.sources = [self.object_list]
+        if pulled is not None:
+            self.sources.append(pulled.order_by('-pub_date', '-pk'))
+
+    def _slice(self, start, stop):
+        return _merge(
+            [list(source[:stop]) for source in self.sources], stop
+        )[start:]
+
+    def _count(self):
+        return sum(source.count() for source in self.sources)
+
+    def _around(self, pub_date, pk, lookup, limit):
+        row_lists = []
+        for source in self.sources:
+            rows = self._keyset(pub_date, pk, lookup, source)
+            if lookup == 'gt':
+                rows = rows.reverse()
+            row_lists.append(list(rows[:limit]))
+        return _merge(row_lists, limit, descending=lookup == 'lt')
+
+    def resolve(self, rows):
+        posts = Post.objects.for_feed().in_bulk(
+            [entry.post_id for entry in rows]
+        )
+        return [posts[entry.post_id] for entry in rows
+                if entry.post_id in posts]
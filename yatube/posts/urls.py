@@ -8,7 +8,31 @@ urlpatterns = [
     path('', views.index, name='index'),
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
     path('profile/<str:username>/', views.profile, name='profile'),
+    path('feed/', views.feed, name='feed'),
+    path('group/<slug:slug>/feed/', views.group_feed, name='group_feed'),
+    path(
+        'profile/<str:username>/followers/',
+        views.followers,
+        name='followers'
+    ),
+    path(
+        'profile/<str:username>/following/',
+        views.following,
+        name='following'
+    ),
+    path(
+        'profile/<str:username>/feed/',
+        views.profile_feed,
+        name='profile_feed'
+    ),
+    path('search/', views.search, name='search'),
+    path('hot/', views.hot, name='hot'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.post_comments,
+        name='post_comments'
+    ),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
     path(
         'posts/<int:post_id>/comment/',
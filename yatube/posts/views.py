@@ -1,65 +1,193 @@
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.db import transaction
 from django.shortcuts import get_object_or_404, redirect, render
 
+from core.cache import get_or_compute
+
+from . import feeds, graph
+from . import hot as hot_posts
+from . import search as post_search
+from .conditional import conditional, group_state, post_state, profile_state
+from .feed_cache import feed_cache
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
+from .models import Comment, Group, Post, User
+from .paginator import CursorPaginator, KeyPaginator
+from .streaming import follow_marks, render_feed
+from .timeline import timeline_entries, timeline_paginator
 
 
-def pagination(request, objects):
-    paginator = Paginator(objects, settings.POST_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    return page_obj
+def pagination(request, objects, paginator_class=CursorPaginator,
+               cache_key=None, per_page=None):
+    paginator = paginator_class(
+        objects, per_page or settings.POST_PER_PAGE
+    )
+    if cache_key is None:
+        return paginator.build(*paginator.fetch(request))
+    page = get_or_compute(
+        f'posts:page:{cache_key}',
+        lambda: paginator.fetch(request),
+        settings.FEED_CACHE_TIMEOUT,
+    )
+    return paginator.build(*page)
 
 
 def index(request):
-    post_list = Post.objects.all()
-    context = {
-        'page_obj': pagination(request, post_list),
-    }
-    return render(request, 'posts/index.html', context)
+    cache_context = feed_cache(request, 'index')
+    return render_feed(
+        request, 'posts/index.html', cache_context,
+        lambda: pagination(
+            request, Post.objects.for_feed(),
+            cache_key=cache_context['feed_cache_key'],
+        ),
+        mark_followed=True, display_group=True, display_author=True,
+    )
 
 
+@conditional(group_state)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    group_list = group.posts.all()
+    group_list = group.posts.for_feed()
+    cache_context = feed_cache(request, 'group_list', group.slug)
+    page_obj = pagination(
+        request, group_list, cache_key=cache_context['feed_cache_key']
+    )
     context = {
-        'page_obj': pagination(request, group_list),
+        'page_obj': page_obj,
         'group': group,
+        **cache_context,
+        **follow_marks(request, page_obj),
     }
     return render(request, 'posts/group_list.html', context)
 
 
+@conditional(profile_state)
 def profile(request, username):
-    user_profile = get_object_or_404(User, username=username)
-    post_list = user_profile.posts.all()
-    following = request.user.is_authenticated and Follow.objects.filter(
-        user=request.user, author=user_profile).exists()
+    user_profile = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+    following = graph.is_following(request.user, user_profile.pk)
+    cache_context = feed_cache(request, 'profile', user_profile.username)
     context = {
-        'page_obj': pagination(request, post_list),
         'user_profile': user_profile,
         'following': following,
+        **cache_context,
+    }
+    return render_feed(
+        request, 'posts/profile.html', context,
+        lambda: pagination(
+            request, user_profile.posts.for_feed(),
+            cache_key=cache_context['feed_cache_key'],
+        ),
+        display_group=True,
+    )
+
+
+def follow_list(request, username, title, side):
+    """Подписчики или подписки пользователя с отметками для читателя."""
+    user_profile = get_object_or_404(User, username=username)
+    follows = getattr(graph, side)(user_profile)
+    page_obj = pagination(
+        request, follows, KeyPaginator, per_page=settings.FOLLOWS_PER_PAGE
+    )
+    people = [
+        follow.user if side == 'followers' else follow.author
+        for follow in page_obj
+    ]
+    context = {
+        'user_profile': user_profile,
+        'title': title,
+        'page_obj': page_obj,
+        'people': people,
+        'followed': graph.followed_among(
+            request.user, [person.pk for person in people]
+        ),
+        'mutual': graph.mutual_ids(user_profile.pk),
+    }
+    return render(request, 'posts/follow_list.html', context)
+
+
+def followers(request, username):
+    return follow_list(request, username, 'Подписчики', 'followers')
+
+
+def following(request, username):
+    return follow_list(request, username, 'Подписки', 'following')
+
+
+def feed(request):
+    return feeds.serve(feeds.site_feed, feeds.SITE, request)
+
+
+def group_feed(request, slug):
+    return feeds.serve(feeds.group_feed, feeds.GROUP, request, slug)
+
+
+def profile_feed(request, username):
+    return feeds.serve(feeds.author_feed, feeds.AUTHOR, request, username)
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    context = {
+        'query': query,
+        'page_obj': post_search.search_posts(query) if query else [],
     }
-    return render(request, 'posts/profile.html', context)
+    return render(request, 'posts/search.html', context)
 
 
+def hot(request):
+    cache_context = feed_cache(request, 'hot', hot_posts.version())
+    page_obj = pagination(
+        request, Post.objects.for_feed(), hot_posts.HotPaginator,
+        cache_key=cache_context['feed_cache_key'],
+    )
+    context = {
+        'page_obj': page_obj,
+        'hot': True,
+        **cache_context,
+        **follow_marks(request, page_obj),
+    }
+    return render(request, 'posts/hot.html', context)
+
+
+@conditional(post_state)
 def post_detail(request, post_id):
-    user_single_post = get_object_or_404(Post, pk=post_id)
-    comments = user_single_post.comments.all().filter(post_id=post_id)
+    user_single_post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), pk=post_id
+    )
     form = CommentForm(request.POST or None)
     context = {
         'user_single_post': user_single_post,
         'form': form,
-        'comments': comments,
+        'comments': comment_page(request, post_id),
+        'post_id': post_id,
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+def comment_page(request, post_id):
+    return pagination(
+        request,
+        Comment.objects.filter(post_id=post_id).for_list(),
+        per_page=settings.COMMENTS_PER_PAGE,
+    )
+
+
+def post_comments(request, post_id):
+    """Следующая порция комментариев для «Показать еще»."""
+    get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    context = {
+        'comments': comment_page(request, post_id),
+        'post_id': post_id,
+    }
+    return render(request, 'posts/includes/comment_list.html', context)
+
+
 @login_required
+@transaction.atomic
 def post_create(request):
-    form = PostForm(request.POST or None)
+    form = PostForm(request.POST or None, files=request.FILES or None)
     if form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
@@ -72,6 +200,7 @@ def post_create(request):
     return render(request, 'posts/create_post.html', context)
 
 
+@transaction.atomic
 def post_edit(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
 
@@ -83,7 +212,7 @@ def post_edit(request, post_id):
         files=request.FILES or None,
         instance=post)
     if form.is_valid():
-        form.save()
+        post = form.save()
         return redirect('posts:post_detail', post_id)
 
     context = {
@@ -95,6 +224,7 @@ def post_edit(request, post_id):
 
 
 @login_required
+@transaction.atomic
 def add_comment(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     form = CommentForm(request.POST or None)
@@ -108,16 +238,22 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    post_list = Post.objects.filter(
-        author__following__user=request.user
-    ).all()
+    entries = timeline_entries(request.user)
+    paginator_class = timeline_paginator(request.user)
     context = {
-        'page_obj': pagination(request, post_list),
+        'suggestions': graph.suggestions(
+            request.user, settings.SUGGESTIONS_SHOWN
+        ),
     }
-    return render(request, 'posts/follow.html', context)
+    return render_feed(
+        request, 'posts/follow.html', context,
+        lambda: pagination(request, entries, paginator_class),
+        display_group=True, display_author=True,
+    )
 
 
 @login_required
+@transaction.atomic
 def profile_follow(request, username):
     user = request.user
     author = get_object_or_404(User, username=username)
@@ -127,7 +263,8 @@ def profile_follow(request, username):
 
 
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
-    author.following.all().delete()
+    author.following.filter(user=request.user).delete()
     return redirect('posts:profile', username=username)
@@ -42,6 +42,7 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -52,6 +53,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.RequestMetricsMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -66,7 +69,7 @@ ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.template_backends.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -87,13 +90,65 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# Соединение с базой живет между запросами потока DB_CONN_MAX_AGE
+# секунд (0 — закрывается после каждого запроса, none — без срока).
+# Перед повторным использованием оно проверяется, если не задано
+# DB_CONN_HEALTH_CHECKS=0. Счетчики соединений — на /metrics/.
+conn_max_age = os.getenv('DB_CONN_MAX_AGE', '60')
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': (
+            None if conn_max_age.lower() == 'none' else int(conn_max_age)
+        ),
+        'CONN_HEALTH_CHECKS': os.getenv('DB_CONN_HEALTH_CHECKS') != '0',
     }
 }
 
+# Боевой режим SQLite включается SQLITE_TUNING=1: журнал WAL, при
+# котором читатели не ждут писателя, ожидание блокировки вместо ошибки
+# «database is locked», кэш страниц и mmap. Транзакции начинаются
+# с BEGIN IMMEDIATE. Сравнить режимы: benchmark --mixed.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'cache_size': -64000,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+if os.getenv('SQLITE_TUNING') == '1':
+    DATABASES['default'].update({
+        'ENGINE': 'core.sqlite',
+        'OPTIONS': {
+            'init_command': ';'.join(
+                f'PRAGMA {name} = {value}'
+                for name, value in SQLITE_PRAGMAS.items()
+            ),
+            'transaction_mode': 'IMMEDIATE',
+        },
+    })
+
+# Реплики для чтения: имена баз через запятую в DATABASE_REPLICAS,
+# с теми же настройками, что у default. Локально это копии файла
+# SQLite, которые обновляет команда sync_replicas. После записи
+# пользователь REPLICA_STICKY_SECONDS читает из основной базы.
+REPLICA_DATABASES = []
+for name in os.getenv('DATABASE_REPLICAS', '').split(','):
+    if name.strip():
+        alias = f'replica{len(REPLICA_DATABASES) + 1}'
+        DATABASES[alias] = {
+            **DATABASES['default'],
+            'NAME': name.strip(),
+            'TEST': {'MIRROR': 'default'},
+        }
+        REPLICA_DATABASES.append(alias)
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', 5))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -143,11 +198,83 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 POST_PER_PAGE = 10
+COMMENTS_PER_PAGE = 20
+
+# Длина материализованной ленты подписок и число подписчиков автора,
+# сверх которого его посты не рассылаются, а читаются при запросе.
+TIMELINE_LENGTH = 1000
+TIMELINE_FANOUT_LIMIT = 10000
+
+# Сколько лучших результатов показывает поиск по постам.
+SEARCH_RESULTS = 30
+
+# Лента «горячего»: за сколько часов учитываются комментарии, сколько
+# постов попадает в рейтинг и как быстро он затухает с возрастом поста.
+HOT_WINDOW_HOURS = 48
+HOT_SIZE = 500
+HOT_GRAVITY = 1.5
+
+# Граф подписок: срок кэша множеств подписок, длина страницы списков
+# подписчиков и число рекомендаций «возможно, вы знакомы».
+GRAPH_CACHE_TIMEOUT = 60 * 10
+FOLLOWS_PER_PAGE = 30
+SUGGESTIONS_PER_USER = 20
+SUGGESTIONS_SHOWN = 5
+
+# Сколько последних постов попадает в Atom-ленты.
+ATOM_FEED_ITEMS = 20
+
+# Сколько постов можно запросить одним вызовом API posts/batch/.
+API_BATCH_SIZE = 100
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
+# Размеры миниатюр картинок постов и число потоков, которые готовят
+# их в фоне (0 — готовить сразу, в потоке запроса).
+POST_THUMBNAILS = {
+    '960x339': {'crop': 'center', 'upscale': True},
+}
+THUMBNAIL_WORKERS = 2
+
+# Время жизни фрагментов лент: они сбрасываются сменой поколения
+# при записи, поэтому срок может быть большим. Поколение хранится
+# в базе (FeedGeneration) и общее для всех процессов, даже при
+# локальном кэше.
+FEED_CACHE_TIMEOUT = 60 * 60 * 4
+
+# FEED_STREAMING=1 — отдавать главную, профиль и подписки частями:
+# шапка уходит до выборки ленты.
+FEED_STREAMING = os.getenv('FEED_STREAMING') == '1'
+
+# Кэш выбирается переменной окружения CACHE_BACKEND:
+# locmem — в памяти процесса (по умолчанию), file — файловый кэш, общий
+# для всех процессов на машине, redis — общий кэш на Redis
+# (нужен пакет django-redis). Адрес задается в CACHE_LOCATION.
+CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'core.cache_backends.MemoryCache',
+    },
+    'file': {
+        'BACKEND': 'core.cache_backends.FileCache',
+        'LOCATION': os.getenv(
+            'CACHE_LOCATION', os.path.join(BASE_DIR, 'cache')
+        ),
+    },
+    'redis': {
+        'BACKEND': 'core.cache_backends.RedisCache',
+        'LOCATION': os.getenv('CACHE_LOCATION', 'redis://127.0.0.1:6379/1'),
+    },
+}
+
 CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+    'default': CACHE_BACKENDS[os.getenv('CACHE_BACKEND', 'locmem')],
 }
+
+# Запросы дольше SLOW_REQUEST_MS пишутся в лог core.middleware вместе
+# с SLOW_REQUEST_QUERIES самыми частыми SQL-запросами. Сводка метрик
+# доступна по /metrics/ сотрудникам и сборщику с заголовком
+# Authorization: Bearer <METRICS_TOKEN>; пустой токен — только сотрудникам.
+SLOW_REQUEST_MS = int(os.getenv('SLOW_REQUEST_MS', 500))
+SLOW_REQUEST_QUERIES = 10
+INTERNAL_IPS = ['127.0.0.1']
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')